@@ -0,0 +1,602 @@
+import json
+import os
+import platform
+import select
+import shutil
+import sqlite3
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import psutil
+
+from fswatch import InotifyWatcher, IN_CLOSE_WRITE, IN_MOVED_TO
+
+# Container extensions OBS can write replays as
+CLIP_EXTENSIONS = ('.mkv', '.mp4', '.mov', '.flv', '.ts', '.m3u8')
+
+# ffmpeg muxer names for remux targets
+REMUX_FORMATS = {'mp4': 'mp4', 'mkv': 'matroska', 'mov': 'mov'}
+
+# Folder for clips saved while no game session was known
+UNSORTED_FOLDER = "Unsorted"
+
+# Journals and concat lists of in-progress merges, inside the output folder
+COALESCE_FOLDER = ".coalesce"
+
+# Seconds to wait after a session ends before merging its clips, so the last saves land first
+COALESCE_DELAY = 30
+
+# Clips overlapping by less than this many seconds are left alone
+MIN_OVERLAP = 1.0
+
+def game_folder_name(game):
+    """Turns a whitelist entry into a safe folder name."""
+    if not game:
+        return UNSORTED_FOLDER
+    name = game.replace('/', '_').replace('\\', '_').strip(' .')
+    return name or UNSORTED_FOLDER
+
+def lower_thread_priority():
+    """Drops the calling thread to nice 19 and the idle I/O class.
+
+    Used as the worker pool initializer: on Linux both settings are per-thread, and
+    ffmpeg processes forked from the worker inherit them.
+    """
+    tid = threading.get_native_id()
+    try:
+        os.setpriority(os.PRIO_PROCESS, tid, 19)
+        psutil.Process(tid).ionice(psutil.IOPRIO_CLASS_IDLE)
+    except (OSError, psutil.Error) as e:
+        print(f"Warning: Could not lower clip worker priority: {e}")
+
+def remux_clip(source_path, target_path):
+    """Stream-copies `source_path` into `target_path` with ffmpeg (no re-encode).
+
+    The output is written next to the target and renamed into place, so a
+    partially written file never carries the final name. Returns True on success.
+    """
+    target_dir, target_name = os.path.split(target_path)
+    stem, ext = os.path.splitext(target_name)
+    muxer = REMUX_FORMATS.get(ext.lstrip('.').lower())
+    partial_path = os.path.join(target_dir, f".{stem}.partial{ext}")
+
+    command = ['ffmpeg', '-nostdin', '-hide_banner', '-loglevel', 'error', '-y',
+               '-i', source_path, '-map', '0', '-c', 'copy']
+    if muxer:
+        command += ['-f', muxer]
+    command.append(partial_path)
+
+    try:
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        os.replace(partial_path, target_path)
+        return True
+    except FileNotFoundError:
+        print("Error: ffmpeg not found, clips will be moved without remuxing.")
+    except subprocess.CalledProcessError as e:
+        print(f"Error remuxing {source_path}: {e.stderr.decode(errors='replace').strip()}")
+    except OSError as e:
+        print(f"Error finalising remuxed clip {target_path}: {e}")
+
+    try:
+        os.remove(partial_path)
+    except OSError:
+        pass
+    return False
+
+def concat_clips(parts, target_path):
+    """Joins `parts`, a list of (path, inpoint) tuples, into `target_path` by stream copy.
+
+    Each part is read from `inpoint` seconds on (ffmpeg's concat demuxer snaps this to
+    the preceding keyframe, so a little footage may repeat at the joins). Like
+    remux_clip, the output only gets its final name once complete. Returns True on success.
+    """
+    target_dir, target_name = os.path.split(target_path)
+    stem, ext = os.path.splitext(target_name)
+    muxer = REMUX_FORMATS.get(ext.lstrip('.').lower())
+    partial_path = os.path.join(target_dir, f".{stem}.partial{ext}")
+    list_path = os.path.join(target_dir, f".{stem}.ffconcat")
+
+    try:
+        with open(list_path, 'w') as f:
+            f.write("ffconcat version 1.0\n")
+            for path, inpoint in parts:
+                escaped = path.replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+                if inpoint > 0:
+                    f.write(f"inpoint {inpoint:.3f}\n")
+    except OSError as e:
+        print(f"Error writing the concat list for {target_path}: {e}")
+        return False
+
+    command = ['ffmpeg', '-nostdin', '-hide_banner', '-loglevel', 'error', '-y',
+               '-f', 'concat', '-safe', '0', '-i', list_path, '-map', '0', '-c', 'copy']
+    if muxer:
+        command += ['-f', muxer]
+    command.append(partial_path)
+
+    success = False
+    try:
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        os.replace(partial_path, target_path)
+        success = True
+    except FileNotFoundError:
+        print("Error: ffmpeg not found, overlapping clips can't be merged.")
+    except subprocess.CalledProcessError as e:
+        print(f"Error merging into {target_path}: {e.stderr.decode(errors='replace').strip()}")
+    except OSError as e:
+        print(f"Error finalising merged clip {target_path}: {e}")
+
+    for path in ([list_path] if success else [list_path, partial_path]):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    return success
+
+def probe_clip(path):
+    """Returns (duration, width, height) of a media file via ffprobe; unknown values are None."""
+    command = ['ffprobe', '-v', 'error', '-select_streams', 'v:0',
+               '-show_entries', 'format=duration:stream=width,height', '-of', 'json', path]
+    try:
+        result = subprocess.run(command, check=True, capture_output=True, text=True, timeout=30)
+        info = json.loads(result.stdout)
+    except (FileNotFoundError, subprocess.CalledProcessError, subprocess.TimeoutExpired, json.JSONDecodeError):
+        return None, None, None
+
+    duration = info.get('format', {}).get('duration')
+    streams = info.get('streams') or [{}]
+    return (float(duration) if duration else None,
+            streams[0].get('width'),
+            streams[0].get('height'))
+
+class ClipIndex:
+    """SQLite index of saved replays for fast listing and filtering.
+
+    Rows are keyed by path and carry an (mtime, size) fingerprint so a startup
+    reconcile only probes files that are new or changed.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS clips (
+            path TEXT PRIMARY KEY,
+            game TEXT,
+            session_id TEXT,
+            timestamp REAL NOT NULL,
+            duration REAL,
+            size INTEGER NOT NULL,
+            width INTEGER,
+            height INTEGER
+        );
+        CREATE INDEX IF NOT EXISTS clips_by_time ON clips (timestamp);
+        CREATE INDEX IF NOT EXISTS clips_by_game_time ON clips (game, timestamp);
+    """
+
+    def __init__(self, db_path, prober=probe_clip):
+        self.db_path = db_path
+        self.prober = prober
+        self.lock = threading.Lock()
+        # Shared between the pipeline workers, guarded by self.lock
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.executescript(self.SCHEMA)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def add(self, path, game, session_id=None, stat=None):
+        """Probes and indexes (or re-indexes) one clip."""
+        try:
+            stat = stat or os.stat(path)
+        except OSError:
+            return
+        duration, width, height = self.prober(path)
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO clips (path, game, session_id, timestamp, duration, size, width, height) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (path, game, session_id, stat.st_mtime, duration, stat.st_size, width, height))
+
+    def remove(self, paths):
+        with self.lock, self.conn:
+            self.conn.executemany("DELETE FROM clips WHERE path = ?", [(path,) for path in paths])
+
+    def session_clips(self, session_id):
+        """Returns the clips saved during one session, oldest first."""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT * FROM clips WHERE session_id = ? ORDER BY timestamp", (session_id,)).fetchall()
+
+    def reconcile(self, clips_dir):
+        """Brings the index in line with the clip folders under `clips_dir`.
+
+        Unchanged files (same mtime and size) are not probed again; rows for files
+        that no longer exist are dropped.
+        """
+        if not os.path.isdir(clips_dir):
+            # Nothing saved yet, or the drive isn't mounted: keep the index as it is
+            print(f"Clip folder {clips_dir} does not exist, skipping the index reconcile")
+            return
+        with self.lock:
+            known = {row['path']: row
+                     for row in self.conn.execute("SELECT path, session_id, timestamp, size FROM clips")}
+
+        seen = set()
+        added = 0
+        for folder in [clips_dir] + [entry.path for entry in os.scandir(clips_dir) if entry.is_dir()]:
+            game = None if folder == clips_dir else os.path.basename(folder)
+            if game == UNSORTED_FOLDER:
+                game = None
+            for entry in os.scandir(folder):
+                if entry.name.startswith('.') or not entry.name.lower().endswith(CLIP_EXTENSIONS):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                seen.add(entry.path)
+                row = known.get(entry.path)
+                if row is None or (row['timestamp'], row['size']) != (stat.st_mtime, stat.st_size):
+                    # A re-probed clip keeps the session it was saved in, which the coalescer needs
+                    self.add(entry.path, game, row['session_id'] if row else None, stat=stat)
+                    added += 1
+
+        removed = [path for path in known if path not in seen and path.startswith(clips_dir)]
+        with self.lock, self.conn:
+            self.conn.executemany("DELETE FROM clips WHERE path = ?", [(path,) for path in removed])
+        print(f"Clip index reconciled: {added} added or updated, {len(removed)} removed")
+
+    def _filters(self, game=None, since=None, until=None):
+        clauses, params = [], []
+        if game is not None:
+            clauses.append("game = ?")
+            params.append(game)
+        if since is not None:
+            clauses.append("timestamp >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("timestamp < ?")
+            params.append(until)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def query(self, game=None, since=None, until=None, limit=50, offset=0):
+        """Returns one page of clips, newest first."""
+        where, params = self._filters(game, since, until)
+        with self.lock:
+            return self.conn.execute(
+                f"SELECT * FROM clips{where} ORDER BY timestamp DESC LIMIT ? OFFSET ?",
+                params + [limit, offset]).fetchall()
+
+    def count(self, game=None, since=None, until=None):
+        where, params = self._filters(game, since, until)
+        with self.lock:
+            return self.conn.execute(f"SELECT COUNT(*) FROM clips{where}", params).fetchone()[0]
+
+    def games(self):
+        """Returns the distinct game names that have clips."""
+        with self.lock:
+            return [row[0] for row in self.conn.execute(
+                "SELECT DISTINCT game FROM clips WHERE game IS NOT NULL ORDER BY game COLLATE NOCASE")]
+
+def overlapping_groups(clips, max_parts, max_duration):
+    """Splits a session's clips (oldest first) into runs of overlapping clips.
+
+    A clip saved at `timestamp` with `duration` covers [timestamp - duration, timestamp].
+    Returns lists of (row, inpoint) where inpoint skips the footage already covered by
+    the previous clips; clips covered entirely get inpoint None. Runs are capped at
+    `max_parts` clips and `max_duration` seconds of merged footage.
+    """
+    groups = []
+    current = []
+    covered_end = None
+    start = None
+    for row in clips:
+        if not row['duration']:
+            # Coverage is unknown, so nothing after this clip can be merged with what came before
+            if len(current) > 1:
+                groups.append(current)
+            current, covered_end = [], None
+            continue
+        clip_start = row['timestamp'] - row['duration']
+        compatible = current and (
+            os.path.splitext(row['path'])[1].lower() == os.path.splitext(current[0][0]['path'])[1].lower()
+            and (row['width'], row['height']) == (current[0][0]['width'], current[0][0]['height']))
+        if (compatible and clip_start < covered_end - MIN_OVERLAP and len(current) < max_parts
+                and max(covered_end, row['timestamp']) - start <= max_duration):
+            if row['timestamp'] <= covered_end:
+                current.append((row, None))
+            else:
+                current.append((row, covered_end - clip_start))
+                covered_end = row['timestamp']
+            continue
+        if len(current) > 1:
+            groups.append(current)
+        current = [(row, 0.0)]
+        covered_end = row['timestamp']
+        start = clip_start
+    if len(current) > 1:
+        groups.append(current)
+    return groups
+
+class ClipCoalescer:
+    """Merges overlapping replay clips from the same session into one file.
+
+    Saving the replay buffer several times in quick succession writes clips that mostly
+    hold the same footage. Overlaps are found from the index (save time and duration),
+    the clips are joined by stream copy and the redundant parts deleted.
+
+    Each merge is journalled first. If the service dies mid-merge, recover() either
+    finishes the cleanup (the merged file was already renamed into place) or discards
+    the partial output, leaving the original clips untouched.
+    """
+
+    def __init__(self, index, output_dir, concatenator=concat_clips, max_parts=8, max_duration=900):
+        self.index = index
+        self.journal_dir = os.path.join(output_dir, COALESCE_FOLDER)
+        self.concatenator = concatenator
+        self.max_parts = max_parts
+        self.max_duration = max_duration
+
+    @classmethod
+    def from_config(cls, config, index, output_dir, **kwargs):
+        """Returns a coalescer for the "clip_pipeline" config section, or None if it is disabled."""
+        settings = config.get('clip_pipeline', {})
+        if not settings.get('coalesce'):
+            return None
+        return cls(index, output_dir,
+                   max_parts=settings.get('coalesce_max_parts', 8),
+                   max_duration=settings.get('coalesce_max_duration', 900),
+                   **kwargs)
+
+    def coalesce_session(self, session_id):
+        """Merges every run of overlapping clips of one session. Returns the merged paths."""
+        clips = [row for row in self.index.session_clips(session_id) if os.path.exists(row['path'])]
+        merged = []
+        for group in overlapping_groups(clips, self.max_parts, self.max_duration):
+            target = self.merge(group)
+            if target:
+                merged.append(target)
+        return merged
+
+    def merge(self, group):
+        first = group[0][0]
+        folder, name = os.path.split(first['path'])
+        stem, ext = os.path.splitext(name)
+        target = os.path.join(folder, f"{stem}-merged{ext}")
+        if os.path.exists(target):
+            # recover() takes an existing target as a finished merge, never risk that
+            print(f"Warning: Not merging clips into existing file {target}")
+            return None
+        parts = [row['path'] for row, _ in group]
+        journal = {'target': target, 'parts': parts, 'game': first['game'], 'session_id': first['session_id'],
+                   'timestamp': max(row['timestamp'] for row, _ in group)}
+        journal_path = os.path.join(self.journal_dir, f"{stem}.json")
+        if not self.write_journal(journal_path, journal):
+            return None
+
+        inputs = [(row['path'], inpoint) for row, inpoint in group if inpoint is not None]
+        if not self.concatenator(inputs, target):
+            self.remove_journal(journal_path)
+            return None
+
+        self.finish(journal)
+        self.remove_journal(journal_path)
+        print(f"Merged {len(parts)} overlapping clips into {target}")
+        return target
+
+    def finish(self, journal):
+        """Deletes the parts of a completed merge and updates the index."""
+        try:
+            # Date the merged clip like its last part, so it sorts where the parts were
+            os.utime(journal['target'], (journal['timestamp'], journal['timestamp']))
+        except OSError:
+            pass
+        for path in journal['parts']:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"Warning: Could not remove merged clip part {path}: {e}")
+        self.index.remove(journal['parts'])
+        self.index.add(journal['target'], journal['game'], journal['session_id'])
+
+    def recover(self):
+        """Completes or rolls back merges interrupted by a crash."""
+        try:
+            names = [name for name in os.listdir(self.journal_dir) if name.endswith('.json')]
+        except FileNotFoundError:
+            return
+        for name in names:
+            journal_path = os.path.join(self.journal_dir, name)
+            try:
+                with open(journal_path, 'r') as f:
+                    journal = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"Warning: Dropping unreadable merge journal {journal_path}: {e}")
+                self.remove_journal(journal_path)
+                continue
+
+            if os.path.exists(journal['target']):
+                print(f"Completing interrupted merge into {journal['target']}")
+                self.finish(journal)
+            else:
+                print(f"Rolling back interrupted merge into {journal['target']}")
+                folder, target_name = os.path.split(journal['target'])
+                stem, ext = os.path.splitext(target_name)
+                for leftover in (f".{stem}.partial{ext}", f".{stem}.ffconcat"):
+                    try:
+                        os.remove(os.path.join(folder, leftover))
+                    except OSError:
+                        pass
+            self.remove_journal(journal_path)
+
+    def write_journal(self, path, journal):
+        tmp_path = f"{path}.tmp"
+        try:
+            os.makedirs(self.journal_dir, exist_ok=True)
+            with open(tmp_path, 'w') as f:
+                json.dump(journal, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+            return True
+        except OSError as e:
+            print(f"Error writing merge journal {path}: {e}")
+            return False
+
+    def remove_journal(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+class ClipPipeline:
+    """Moves finished replay files into per-game folders and remuxes them in the background.
+
+    New files in the OBS output folder are picked up through inotify once OBS closes
+    them, and handed to a small pool of low-priority worker threads.
+    """
+
+    def __init__(self, watch_dir, output_dir=None, remux_to=None, workers=1, remuxer=remux_clip, on_clip=None):
+        self.watch_dir = os.path.expanduser(watch_dir)
+        self.output_dir = os.path.expanduser(output_dir) if output_dir else self.watch_dir
+        self.remux_to = remux_to.lstrip('.').lower() if remux_to else None
+        self.remuxer = remuxer
+        self.on_clip = on_clip
+        self.coalescer = None
+        self.coalesce_timers = []
+        self.current_game = None
+        self.current_session = None
+
+        self.executor = ThreadPoolExecutor(max_workers=max(1, int(workers)),
+                                           thread_name_prefix="clip-worker",
+                                           initializer=lower_thread_priority)
+        self.watcher = None
+        self.thread = None
+        self.stop_read, self.stop_write = os.pipe()
+
+    @classmethod
+    def from_config(cls, config, **kwargs):
+        """Returns a pipeline for the "clip_pipeline" config section, or None if it is disabled."""
+        settings = config.get('clip_pipeline', {})
+        if not settings.get('enabled') or platform.system() != "Linux":
+            return None
+        if not settings.get('watch_dir'):
+            print("Warning: clip_pipeline is enabled but no watch_dir is set.")
+            return None
+        return cls(settings['watch_dir'],
+                   output_dir=settings.get('output_dir'),
+                   remux_to=settings.get('remux_to'),
+                   workers=settings.get('workers', 1),
+                   **kwargs)
+
+    def set_session(self, game, session_id=None):
+        """Attributes clips saved from now on to `game`."""
+        self.current_game = game
+        self.current_session = session_id
+
+    def session_ended(self, session_id):
+        """Merges the session's overlapping clips once its last saves have been processed."""
+        if not self.coalescer or not session_id:
+            return
+        timer = threading.Timer(COALESCE_DELAY, self.executor.submit,
+                                (self.coalescer.coalesce_session, session_id))
+        timer.daemon = True
+        timer.start()
+        self.coalesce_timers = [t for t in self.coalesce_timers if t.is_alive()] + [timer]
+
+    def start(self):
+        """Starts watching the OBS output folder. Returns False if watching isn't possible."""
+        try:
+            self.watcher = InotifyWatcher()
+            self.watcher.add_watch(self.watch_dir, IN_CLOSE_WRITE | IN_MOVED_TO)
+        except OSError as e:
+            print(f"Error: Could not watch {self.watch_dir} for new clips: {e}")
+            if self.watcher:
+                self.watcher.close()
+                self.watcher = None
+            return False
+
+        self.thread = threading.Thread(target=self._watch_loop, name="clip-watcher", daemon=True)
+        self.thread.start()
+        print(f"Clip pipeline watching {self.watch_dir}")
+        return True
+
+    def stop(self):
+        """Stops watching and waits for queued clips to finish."""
+        os.write(self.stop_write, b'x')
+        if self.thread:
+            self.thread.join()
+        for timer in self.coalesce_timers:
+            timer.cancel()
+        self.executor.shutdown(wait=True)
+        if self.watcher:
+            self.watcher.close()
+            self.watcher = None
+
+    def _watch_loop(self):
+        while True:
+            readable, _, _ = select.select([self.watcher, self.stop_read], [], [])
+            if self.stop_read in readable:
+                return
+            for _, _, name in self.watcher.read_events():
+                if name.startswith('.') or not name.lower().endswith(CLIP_EXTENSIONS):
+                    continue
+                self.submit(os.path.join(self.watch_dir, name))
+
+    def submit(self, path, game=None, session_id=None):
+        """Queues a finished clip for processing."""
+        if game is None:
+            game, session_id = self.current_game, self.current_session
+        return self.executor.submit(self.process_clip, path, game, session_id)
+
+    def process_clip(self, path, game, session_id=None):
+        """Moves (and optionally remuxes) one clip into its game folder. Returns the final path."""
+        if not os.path.exists(path):
+            return None
+
+        target_dir = os.path.join(self.output_dir, game_folder_name(game))
+        try:
+            os.makedirs(target_dir, exist_ok=True)
+        except OSError as e:
+            print(f"Error creating clip folder {target_dir}: {e}")
+            return None
+
+        name = os.path.basename(path)
+        final_path = None
+        if self.remux_to:
+            target_path = os.path.join(target_dir, f"{os.path.splitext(name)[0]}.{self.remux_to}")
+            # The index takes the save time from the mtime, which the remux would replace
+            # with the time ffmpeg finished
+            try:
+                saved = os.stat(path)
+            except OSError:
+                saved = None
+            if self.remuxer(path, target_path):
+                if saved:
+                    try:
+                        os.utime(target_path, ns=(saved.st_atime_ns, saved.st_mtime_ns))
+                    except OSError as e:
+                        print(f"Warning: Could not keep the save time of {target_path}: {e}")
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    print(f"Warning: Could not remove the original clip {path}: {e}")
+                final_path = target_path
+
+        if final_path is None:
+            final_path = os.path.join(target_dir, name)
+            try:
+                shutil.move(path, final_path)
+            except (OSError, shutil.Error) as e:
+                print(f"Error moving clip {path}: {e}")
+                return None
+
+        print(f"Clip saved for {game or 'unknown game'}: {final_path}")
+        if self.on_clip:
+            self.on_clip(final_path, game, session_id)
+        return final_path
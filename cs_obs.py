@@ -1,5 +1,5 @@
 import tkinter as tk
-from tkinter import messagebox
+from tkinter import filedialog, messagebox
 import json
 import os
 import subprocess
@@ -11,12 +11,32 @@ import threading
 import warnings
 import platform
 import queue
+import shutil
+import time
+
+from clips import ClipIndex
+from fswatch import InotifyWatcher, IN_CLOSE_WRITE, IN_MODIFY
+from telemetry import SessionStore
 
 # --- Configuration ---
 script_dir = os.path.dirname(os.path.abspath(__file__))
 CONFIG_PATH = os.path.join(script_dir, 'config.json')
 MONITOR_SCRIPT_PATH = os.path.join(script_dir, 'service.py')
 LOG_PATH = os.path.join(script_dir, 'actions.log')
+DB_PATH = os.path.join(script_dir, 'cs_obs.db')
+
+# Resource-limited systemd user slice for the service (see "service_slice" in config.json)
+SERVICE_SLICE = "cs_obs.slice"
+SERVICE_SCOPE_PROPERTIES = ("CPUQuota=10%", "MemoryMax=256M")
+
+# Fallback polling interval (ms) for status and log updates, only used while the window is shown
+STATUS_POLL_MS = 2000
+
+# Watchdog timeout for the headless unit; the service pings it every poll (5 s)
+SERVICE_WATCHDOG_SEC = 30
+
+# Quiet period (ms) after the last edit before config.json is written
+CONFIG_WRITE_DELAY_MS = 500
 
 # Clear log file on startup
 try:
@@ -68,12 +88,28 @@ class ConfigManagerApp(tk.Tk):
         self.resizable(False, False)
 
         self.config = self.load_config()
+        # Edits are written to config.json in one go once they stop coming in
+        self.config_write_timer = None
         self.monitor_process = None
         self.tray_icon = None
         
-        # Queue for thread-safe communication from pystray to Tkinter
+        # Queue for thread-safe communication from pystray to Tkinter. The tray thread wakes
+        # Tk through a self-pipe, so nothing polls the queue while the app sits in the tray.
         self.action_queue = queue.Queue()
-        self._process_action_queue()
+        self.wakeup_read = self.wakeup_write = None
+        if hasattr(self.tk, 'createfilehandler'):
+            self.wakeup_read, self.wakeup_write = os.pipe()
+            os.set_blocking(self.wakeup_read, False)
+            self.tk.createfilehandler(self.wakeup_read, tk.READABLE, self._on_wakeup)
+        else:
+            self._process_action_queue()
+
+        # Status and log updates are event-driven where possible (pidfd / inotify)
+        self.status_timer = None
+        self.log_timer = None
+        self.monitor_pidfd = None
+        self.monitor_pidfd_pid = None
+        self.log_watcher = None
 
         # --- UI Elements ---
         # Frame for game list
@@ -86,7 +122,7 @@ class ConfigManagerApp(tk.Tk):
         scrollbar = tk.Scrollbar(list_container, orient=tk.VERTICAL)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
 
-        self.games_listbox = tk.Listbox(list_container, yscrollcommand=scrollbar.set)
+        self.games_listbox = tk.Listbox(list_container, yscrollcommand=scrollbar.set, selectmode=tk.EXTENDED)
         self.games_listbox.pack(side=tk.LEFT, fill="both", expand=True)
 
         scrollbar.config(command=self.games_listbox.yview)
@@ -104,9 +140,16 @@ class ConfigManagerApp(tk.Tk):
         self.pick_process_button = tk.Button(add_frame, text="Process picker", command=self.show_process_picker)
         self.pick_process_button.pack(side="left", padx=(5, 0))
 
-        self.remove_button = tk.Button(games_frame, text="Remove the selected game", command=self.remove_game)
+        self.remove_button = tk.Button(games_frame, text="Remove the selected games", command=self.remove_game)
         self.remove_button.pack(pady=5, fill="x")
 
+        file_frame = tk.Frame(games_frame)
+        file_frame.pack(fill="x")
+        self.import_button = tk.Button(file_frame, text="Import...", command=self.import_games)
+        self.import_button.pack(side="left", fill="x", expand=True, padx=(0, 5))
+        self.export_button = tk.Button(file_frame, text="Export...", command=self.export_games)
+        self.export_button.pack(side="left", fill="x", expand=True)
+
         # Frame for actions
         action_frame = tk.Frame(self)
         action_frame.pack(padx=10, pady=10, fill="x")
@@ -118,6 +161,15 @@ class ConfigManagerApp(tk.Tk):
         self.toggle_monitor_button = tk.Button(action_frame, text="Start the service", command=self.toggle_monitor)
         self.toggle_monitor_button.pack(side="right")
 
+        self.settings_button = tk.Button(action_frame, text="Settings", command=self.show_settings)
+        self.settings_button.pack(side="right", padx=(0, 5))
+
+        self.clips_button = tk.Button(action_frame, text="Clips", command=self.show_clip_browser)
+        self.clips_button.pack(side="right", padx=(0, 5))
+
+        self.stats_button = tk.Button(action_frame, text="Stats", command=self.show_session_stats)
+        self.stats_button.pack(side="right", padx=(0, 5))
+
         self.status_label = tk.Label(self, text="Status: Unknown", bd=1, relief=tk.SUNKEN, anchor=tk.W)
         self.status_label.pack(side=tk.BOTTOM, fill=tk.X)
 
@@ -161,16 +213,95 @@ class ConfigManagerApp(tk.Tk):
         process_picker = ProcessPicker(self, self.add_game_from_picker)
         process_picker.grab_set()
 
-    def add_game_from_picker(self, process_name):
-        if process_name:
-            current_games = self.games_listbox.get(0, tk.END)
-            if process_name not in current_games:
-                self.games_listbox.insert(tk.END, process_name)
-                self._save_config()
-                if not self.monitor_process:
-                    self.start_monitor()
-            else:
-                messagebox.showinfo("Info", f"'{process_name}' is already in the whitlist.")
+    def show_settings(self):
+        settings = SettingsDialog(self)
+        settings.grab_set()
+
+    def show_clip_browser(self):
+        if not os.path.exists(DB_PATH):
+            messagebox.showinfo("Clips", "No clips have been indexed yet.\nEnable the clip pipeline in config.json to index saved replays.")
+            return
+        ClipBrowser(self)
+
+    def show_session_stats(self):
+        if not os.path.exists(DB_PATH):
+            messagebox.showinfo("Stats", "No sessions have been recorded yet.")
+            return
+        SessionStatsDialog(self)
+
+    def restart_monitor(self):
+        """Restarts the service so it picks up settings that are only applied at startup."""
+        if self.find_monitor_process():
+            self.stop_monitor(show_messages=False)
+            self.start_monitor(show_messages=False)
+
+    def add_game_from_picker(self, process_names):
+        new_games = self.add_games(process_names)
+        if new_games:
+            if not self.monitor_process:
+                self.start_monitor()
+        elif len(process_names) == 1:
+            messagebox.showinfo("Info", f"'{process_names[0]}' is already in the whitlist.")
+        elif process_names:
+            messagebox.showinfo("Info", "The selected processes are already in the whitelist.")
+
+    def add_games(self, names):
+        """Appends the names not yet whitelisted in one batch. Returns the names added."""
+        current_games = set(self.games_listbox.get(0, tk.END))
+        new_games = []
+        for name in names:
+            name = name.strip()
+            if name and name not in current_games:
+                current_games.add(name)
+                new_games.append(name)
+        if new_games:
+            self.games_listbox.insert(tk.END, *new_games)
+            self._save_config()
+        return new_games
+
+    def import_games(self):
+        """Adds the games listed in a text file (one per line) or a JSON list / config file."""
+        path = filedialog.askopenfilename(
+            title="Import whitelist", parent=self,
+            filetypes=[("Whitelists", "*.txt *.json"), ("All files", "*")])
+        if not path:
+            return
+        try:
+            with open(path, 'r') as f:
+                if path.lower().endswith('.json'):
+                    data = json.load(f)
+                    names = data.get('whitelisted_games', []) if isinstance(data, dict) else data
+                else:
+                    names = [line for line in f.read().splitlines() if not line.lstrip().startswith('#')]
+        except (IOError, ValueError) as e:
+            messagebox.showerror("Error", f"Failed to import {path}:\n{e}")
+            return
+        if not isinstance(names, list) or not all(isinstance(name, str) for name in names):
+            messagebox.showerror("Error", f"{path} does not contain a list of game names.")
+            return
+
+        new_games = self.add_games(names)
+        messagebox.showinfo("Import", f"Added {len(new_games)} games ({len(names) - len(new_games)} already listed or empty).")
+        if new_games and not self.monitor_process:
+            self.start_monitor(show_messages=False)
+
+    def export_games(self):
+        """Writes the whitelist to a text file (one game per line) or a JSON list."""
+        path = filedialog.asksaveasfilename(
+            title="Export whitelist", parent=self, defaultextension=".txt",
+            filetypes=[("Text files", "*.txt"), ("JSON files", "*.json")])
+        if not path:
+            return
+        games = list(self.games_listbox.get(0, tk.END))
+        try:
+            with open(path, 'w') as f:
+                if path.lower().endswith('.json'):
+                    json.dump(games, f, indent=4)
+                else:
+                    f.write("".join(f"{game}\n" for game in games))
+        except IOError as e:
+            messagebox.showerror("Error", f"Failed to export the whitelist:\n{e}")
+
     def create_icon_image(self):
         """Creates a PIL image for the tray icon."""
         # Try to load the custom icon file first
@@ -211,8 +342,8 @@ class ConfigManagerApp(tk.Tk):
         # Run the icon in a separate thread
         threading.Thread(target=self.tray_icon.run, daemon=True).start()
 
-    def _process_action_queue(self):
-        """Process actions from the queue (called periodically in main thread)."""
+    def _drain_action_queue(self):
+        """Runs the actions queued by the tray thread (in the main thread)."""
         try:
             while True:
                 action = self.action_queue.get_nowait()
@@ -221,16 +352,39 @@ class ConfigManagerApp(tk.Tk):
                     self._do_toggle_window_visibility()
                 elif action == "quit":
                     self.quit_application()
+                    return
         except queue.Empty:
             pass
+
+    def _process_action_queue(self):
+        """Process actions from the queue (polling fallback where Tk has no file handlers)."""
+        self._drain_action_queue()
         
         # Schedule next check
         self.after(100, self._process_action_queue)
+
+    def _on_wakeup(self, fd, mask):
+        """Called by Tk when the tray thread has written to the self-pipe."""
+        try:
+            while os.read(self.wakeup_read, 512):
+                pass
+        except BlockingIOError:
+            pass
+        self._drain_action_queue()
+
+    def _post_action(self, action):
+        """Queues an action for the main thread and wakes it up (safe to call from any thread)."""
+        self.action_queue.put(action)
+        if self.wakeup_write is not None:
+            try:
+                os.write(self.wakeup_write, b'x')
+            except OSError:
+                pass
     
     def toggle_window_visibility(self, icon=None, item=None):
         """Shows or hides the main window."""
         # Put action in queue for main thread to process
-        self.action_queue.put("toggle_visibility")
+        self._post_action("toggle_visibility")
     
     def _do_toggle_window_visibility(self):
         """Internal method to toggle window visibility (runs in main thread)."""
@@ -244,24 +398,96 @@ class ConfigManagerApp(tk.Tk):
         self.deiconify()
         self.after(10, self.lift) # Bring to front
         self.after(20, self.focus_force)
+        # Catch up on anything that changed while hidden and resume updates
+        self._watch_log_file()
+        self.check_monitor_status()
+        self.update_log_display()
 
     def hide_window(self):
-        """Hides the main window."""
+        """Hides the main window and suspends all UI updates."""
         self.withdraw()
+        for timer in (self.status_timer, self.log_timer):
+            if timer:
+                self.after_cancel(timer)
+        self.status_timer = self.log_timer = None
+        self._unwatch_log_file()
+
+    def is_window_shown(self):
+        return self.state() != 'withdrawn'
+
+    def _watch_log_file(self):
+        """Gets notified through inotify whenever the service writes the action log."""
+        if self.log_watcher or not hasattr(self.tk, 'createfilehandler') or platform.system() != "Linux":
+            return
+        try:
+            self.log_watcher = InotifyWatcher()
+            self.log_watcher.add_watch(script_dir, IN_CLOSE_WRITE | IN_MODIFY)
+        except OSError as e:
+            print(f"Could not watch the log file, falling back to polling: {e}")
+            if self.log_watcher:
+                self.log_watcher.close()
+            self.log_watcher = None
+            return
+        self.tk.createfilehandler(self.log_watcher.fileno(), tk.READABLE, self._on_log_event)
+
+    def _unwatch_log_file(self):
+        if self.log_watcher:
+            self.tk.deletefilehandler(self.log_watcher.fileno())
+            self.log_watcher.close()
+            self.log_watcher = None
+
+    def _on_log_event(self, fd, mask):
+        events = self.log_watcher.read_events()
+        if any(name == os.path.basename(LOG_PATH) for _, _, name in events):
+            self.update_log_display()
+
+    def _watch_monitor_exit(self, proc):
+        """Registers a pidfd for the service process so its exit updates the status immediately.
+
+        Returns False if pidfds aren't available, in which case the caller has to poll.
+        """
+        if self.monitor_pidfd_pid == proc.pid:
+            return True
+        self._unwatch_monitor_exit()
+        if not hasattr(os, 'pidfd_open') or not hasattr(self.tk, 'createfilehandler'):
+            return False
+        try:
+            self.monitor_pidfd = os.pidfd_open(proc.pid)
+        except OSError:
+            return False
+        self.monitor_pidfd_pid = proc.pid
+        self.tk.createfilehandler(self.monitor_pidfd, tk.READABLE, lambda fd, mask: self.check_monitor_status())
+        return True
+
+    def _unwatch_monitor_exit(self):
+        if self.monitor_pidfd is not None:
+            self.tk.deletefilehandler(self.monitor_pidfd)
+            os.close(self.monitor_pidfd)
+            self.monitor_pidfd = None
+            self.monitor_pidfd_pid = None
 
     def quit_application_from_tray(self, icon=None, item=None):
         """A wrapper to call quit_application from the tray menu."""
         # Put action in queue for main thread to process
-        self.action_queue.put("quit")
+        self._post_action("quit")
 
     def quit_application(self):
         """Handles the logic of properly quitting the application."""
+        self._flush_config()
         self.monitor_process = self.find_monitor_process() # Get current status
         if self.monitor_process:
             self.stop_monitor(show_messages=False) # Stop the service silently
         
         if self.tray_icon:
             self.tray_icon.stop()
+
+        self._unwatch_log_file()
+        self._unwatch_monitor_exit()
+        if self.wakeup_read is not None:
+            self.tk.deletefilehandler(self.wakeup_read)
+            os.close(self.wakeup_read)
+            os.close(self.wakeup_write)
+            self.wakeup_read = self.wakeup_write = None
         
         # Clean up the log file on exit
         if os.path.exists(LOG_PATH):
@@ -277,15 +503,34 @@ class ConfigManagerApp(tk.Tk):
         self.destroy()
 
     def _save_config(self):
-        """Saves the current UI state to the config file."""
+        """Takes the current UI state into the config and schedules writing it to disk.
+
+        Every write makes the service reload, so edits made in quick succession are
+        written together once CONFIG_WRITE_DELAY_MS have passed without another one.
+        """
         updated_config = self.config.copy()
         updated_config['whitelisted_games'] = list(self.games_listbox.get(0, tk.END))
+        self.config = updated_config # update internal config state
+
+        if self.config_write_timer:
+            self.after_cancel(self.config_write_timer)
+        self.config_write_timer = self.after(CONFIG_WRITE_DELAY_MS, self._flush_config)
+
+    def _flush_config(self):
+        """Writes pending config changes now, atomically so the service never reads half a file."""
+        if self.config_write_timer is None:
+            return
+        self.after_cancel(self.config_write_timer)
+        self.config_write_timer = None
 
+        tmp_path = f"{CONFIG_PATH}.tmp"
         try:
-            with open(CONFIG_PATH, 'w') as f:
-                json.dump(updated_config, f, indent=4)
-            self.config = updated_config # update internal config state
-        except IOError as e:
+            with open(tmp_path, 'w') as f:
+                json.dump(self.config, f, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, CONFIG_PATH)
+        except (IOError, OSError) as e:
             messagebox.showerror("Error", f"Failed to save config file:\n{e}")
 
     def load_config(self):
@@ -398,30 +643,64 @@ The script will auto-detect Flatpak OBS:
         except (subprocess.CalledProcessError, FileNotFoundError):
             return False
 
-    def create_systemd_service(self):
-        """Creates and enables the systemd service file."""
-        service_path = self.get_service_file_path()
-        service_dir = os.path.dirname(service_path)
+    def get_service_exec_start(self):
+        """Returns the ExecStart line for the current autostart mode."""
+        if self.config.get('headless_service'):
+            return f"ExecStart={sys.executable} {MONITOR_SCRIPT_PATH}"
+        return f"ExecStart={sys.executable} {os.path.abspath(__file__)}"
 
-        if not os.path.exists(service_dir):
-            os.makedirs(service_dir)
-            
-        python_executable = sys.executable
-        script_path = os.path.abspath(__file__)
-        working_dir = os.path.dirname(script_path)
+    def get_service_content(self):
+        """Returns the systemd unit for the current autostart mode.
+
+        The default unit starts the GUI at login. The headless unit runs only the service
+        as Type=notify: it reports readiness once detection is armed and pings the watchdog
+        every tick, so systemd restarts it if the loop stalls.
+        """
+        working_dir = os.path.dirname(os.path.abspath(__file__))
 
-        service_content = f"""[Unit]
+        if not self.config.get('headless_service'):
+            return f"""[Unit]
 Description=CS_OBS: Automatic OBS Launcher
 After=graphical-session.target
 
 [Service]
-ExecStart={python_executable} {script_path}
+{self.get_service_exec_start()}
 WorkingDirectory={working_dir}
 Restart=on-failure
 
 [Install]
 WantedBy=graphical-session.target
 """
+
+        slice_settings = ""
+        if self.config.get('service_slice'):
+            slice_settings = f"Slice={SERVICE_SLICE}\n" + "".join(f"{prop}\n" for prop in SERVICE_SCOPE_PROPERTIES)
+
+        return f"""[Unit]
+Description=CS_OBS: Automatic OBS Launcher (service only)
+After=graphical-session.target
+
+[Service]
+Type=notify
+NotifyAccess=main
+{self.get_service_exec_start()}
+WorkingDirectory={working_dir}
+WatchdogSec={SERVICE_WATCHDOG_SEC}
+Restart=on-failure
+{slice_settings}
+[Install]
+WantedBy=graphical-session.target
+"""
+
+    def create_systemd_service(self):
+        """Creates and enables the systemd service file."""
+        service_path = self.get_service_file_path()
+        service_dir = os.path.dirname(service_path)
+
+        if not os.path.exists(service_dir):
+            os.makedirs(service_dir)
+            
+        service_content = self.get_service_content()
         try:
             with open(service_path, 'w') as f:
                 f.write(service_content)
@@ -491,9 +770,18 @@ WantedBy=graphical-session.target
         if self.find_monitor_process():
             return
 
+        # The service reads config.json on startup, so pending edits must be on disk
+        self._flush_config()
+
+        command = ['python3', MONITOR_SCRIPT_PATH]
+        if platform.system() == "Linux" and self.config.get('service_slice') and shutil.which('systemd-run'):
+            # Run the service in its own scope under a resource-limited slice
+            command = ['systemd-run', '--user', '--scope', '--quiet', f'--slice={SERVICE_SLICE}'] + \
+                [f'--property={prop}' for prop in SERVICE_SCOPE_PROPERTIES] + command
+
         try:
             # Use DEVNULL to detach the process from the GUI's console
-            subprocess.Popen(['python3', MONITOR_SCRIPT_PATH], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
             if show_messages:
                 messagebox.showinfo("Monitor", "The service started.")
         except FileNotFoundError:
@@ -541,14 +829,25 @@ WantedBy=graphical-session.target
 
     def check_monitor_status(self):
         """Checks and updates the monitor status label and button."""
+        if self.status_timer:
+            self.after_cancel(self.status_timer)
+            self.status_timer = None
+
         self.monitor_process = self.find_monitor_process()
         if self.monitor_process:
             self.status_label.config(text=f"Status: the service is RUNNING (PID: {self.monitor_process.pid})", fg="green")
             self.toggle_monitor_button.config(text="Stop the service")
+            watching_exit = self._watch_monitor_exit(self.monitor_process)
         else:
             self.status_label.config(text="Status: the service is NOT RUNNING", fg="red")
             self.toggle_monitor_button.config(text="Start the service")
-        self.after(2000, self.check_monitor_status) # Periodically check
+            self._unwatch_monitor_exit()
+            watching_exit = False
+
+        # Only poll while the window is shown and no exit notification is armed
+        # (e.g. to notice a service started from outside the GUI)
+        if not watching_exit and self.is_window_shown():
+            self.status_timer = self.after(STATUS_POLL_MS, self.check_monitor_status)
 
     def update_log_display(self):
         """Checks for and displays the latest action from the log file."""
@@ -568,7 +867,11 @@ WantedBy=graphical-session.target
             if self.log_label.winfo_viewable():
                 self.log_label.pack_forget()
 
-        self.after(2000, self.update_log_display) # Periodically check
+        if self.log_timer:
+            self.after_cancel(self.log_timer)
+            self.log_timer = None
+        if not self.log_watcher and self.is_window_shown():
+            self.log_timer = self.after(STATUS_POLL_MS, self.update_log_display) # Periodically check
 
     def toggle_monitor(self):
         """Starts or stops the monitoring script."""
@@ -588,9 +891,7 @@ WantedBy=graphical-session.target
             return False
             
         # Get current script paths
-        python_executable = sys.executable
-        script_path = os.path.abspath(__file__)
-        working_dir = os.path.dirname(script_path)
+        working_dir = os.path.dirname(os.path.abspath(__file__))
         
         try:
             # Read the existing service file
@@ -598,7 +899,7 @@ WantedBy=graphical-session.target
                 service_content = f.read()
                 
             # Check if paths in the service file match current paths
-            return (f"ExecStart={python_executable} {script_path}" not in service_content or
+            return (self.get_service_exec_start() not in service_content or
                     f"WorkingDirectory={working_dir}" not in service_content)
                 
         except IOError as e:
@@ -616,9 +917,7 @@ WantedBy=graphical-session.target
             return False
             
         # Get current script paths
-        python_executable = sys.executable
-        script_path = os.path.abspath(__file__)
-        working_dir = os.path.dirname(script_path)
+        working_dir = os.path.dirname(os.path.abspath(__file__))
         
         try:
             # Read the existing service file
@@ -626,22 +925,11 @@ WantedBy=graphical-session.target
                 service_content = f.read()
                 
             # Check if paths in the service file match current paths
-            if (f"ExecStart={python_executable} {script_path}" not in service_content or
+            if (self.get_service_exec_start() not in service_content or
                 f"WorkingDirectory={working_dir}" not in service_content):
                 
                 # Paths don't match, update the service file
-                new_service_content = f"""[Unit]
-Description=CS_OBS: Automatic OBS Launcher
-After=graphical-session.target
-
-[Service]
-ExecStart={python_executable} {script_path}
-WorkingDirectory={working_dir}
-Restart=on-failure
-
-[Install]
-WantedBy=graphical-session.target
-"""
+                new_service_content = self.get_service_content()
                 with open(service_path, 'w') as f:
                     f.write(new_service_content)
                     
@@ -666,6 +954,213 @@ WantedBy=graphical-session.target
             
         return False  # Return False if no update was needed or if it failed
 
+class SettingsDialog(tk.Toplevel):
+    def __init__(self, master):
+        super().__init__(master)
+        self.title("Settings")
+        self.resizable(False, False)
+        self.app = master
+
+        scheduling_frame = tk.LabelFrame(self, text="Service scheduling", padx=10, pady=10)
+        scheduling_frame.pack(padx=10, pady=10, fill="x")
+
+        self.low_priority_var = tk.BooleanVar(value=master.config.get('low_priority_service', False))
+        tk.Checkbutton(scheduling_frame, text="Run at idle CPU and I/O priority",
+                       variable=self.low_priority_var).pack(anchor=tk.W)
+
+        self.slice_var = tk.BooleanVar(value=master.config.get('service_slice', False))
+        tk.Checkbutton(scheduling_frame, text=f"Run in a resource-limited slice ({SERVICE_SLICE})",
+                       variable=self.slice_var).pack(anchor=tk.W)
+
+        cpus_frame = tk.Frame(scheduling_frame)
+        cpus_frame.pack(fill="x", pady=(5, 0))
+        tk.Label(cpus_frame, text="Housekeeping CPUs (e.g. 0-1):").pack(side="left")
+        self.cpus_entry = tk.Entry(cpus_frame, width=12)
+        self.cpus_entry.insert(0, master.config.get('housekeeping_cpus', ""))
+        self.cpus_entry.pack(side="left", padx=(5, 0))
+
+        if platform.system() != "Linux":
+            for child in scheduling_frame.winfo_children():
+                if isinstance(child, tk.Checkbutton):
+                    child.config(state=tk.DISABLED)
+            self.cpus_entry.config(state=tk.DISABLED)
+
+        autostart_frame = tk.LabelFrame(self, text="Start on boot", padx=10, pady=10)
+        autostart_frame.pack(padx=10, pady=(0, 10), fill="x")
+
+        self.headless_var = tk.BooleanVar(value=master.config.get('headless_service', False))
+        headless_check = tk.Checkbutton(autostart_frame, text="Start only the service (no tray icon), supervised by systemd",
+                                        variable=self.headless_var)
+        headless_check.pack(anchor=tk.W)
+        if platform.system() != "Linux":
+            headless_check.config(state=tk.DISABLED)
+
+        save_button = tk.Button(self, text="Save", command=self.on_save)
+        save_button.pack(pady=(0, 10))
+
+    def on_save(self):
+        cpus = self.cpus_entry.get().strip()
+        self.app.config['low_priority_service'] = self.low_priority_var.get()
+        self.app.config['service_slice'] = self.slice_var.get()
+        self.app.config['housekeeping_cpus'] = cpus
+        self.app.config['headless_service'] = self.headless_var.get()
+        self.app._save_config()
+        if platform.system() == "Linux" and self.app.is_systemd_service_active():
+            # Rewrite the unit for the selected mode (and slice settings)
+            self.app.create_systemd_service()
+        # Scheduling is applied when the service starts
+        self.app.restart_monitor()
+        self.destroy()
+
+class ClipBrowser(tk.Toplevel):
+    PAGE_SIZE = 50
+    ALL_GAMES = "All games"
+
+    def __init__(self, master):
+        super().__init__(master)
+        self.title("Clips")
+        self.minsize(560, 420)
+        self.index = ClipIndex(DB_PATH)
+        self.page = 0
+        self.rows = []
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+
+        filter_frame = tk.Frame(self)
+        filter_frame.pack(fill=tk.X, padx=5, pady=5)
+
+        self.game_var = tk.StringVar(value=self.ALL_GAMES)
+        game_menu = tk.OptionMenu(filter_frame, self.game_var, self.ALL_GAMES, *self.index.games(),
+                                  command=lambda _: self.reset_page())
+        game_menu.pack(side="left")
+
+        tk.Label(filter_frame, text="From:").pack(side="left", padx=(10, 0))
+        self.since_entry = tk.Entry(filter_frame, width=11)
+        self.since_entry.pack(side="left")
+        tk.Label(filter_frame, text="To:").pack(side="left", padx=(5, 0))
+        self.until_entry = tk.Entry(filter_frame, width=11)
+        self.until_entry.pack(side="left")
+        tk.Button(filter_frame, text="Filter", command=self.reset_page).pack(side="left", padx=(5, 0))
+        for entry in (self.since_entry, self.until_entry):
+            entry.bind("<Return>", lambda event: self.reset_page())
+
+        self.clip_listbox = tk.Listbox(self, font="TkFixedFont")
+        self.clip_listbox.pack(fill=tk.BOTH, expand=True, padx=5)
+        self.clip_listbox.bind("<Double-Button-1>", self.open_clip)
+
+        nav_frame = tk.Frame(self)
+        nav_frame.pack(fill=tk.X, padx=5, pady=5)
+        self.prev_button = tk.Button(nav_frame, text="< Newer", command=lambda: self.change_page(-1))
+        self.prev_button.pack(side="left")
+        self.next_button = tk.Button(nav_frame, text="Older >", command=lambda: self.change_page(1))
+        self.next_button.pack(side="right")
+        self.page_label = tk.Label(nav_frame, text="")
+        self.page_label.pack()
+
+        self.refresh()
+
+    def parse_date(self, entry, end_of_day=False):
+        """Returns the entry's YYYY-MM-DD date as a timestamp, or None if it is empty or invalid."""
+        text = entry.get().strip()
+        if not text:
+            return None
+        try:
+            timestamp = time.mktime(time.strptime(text, "%Y-%m-%d"))
+        except ValueError:
+            messagebox.showwarning("Warning", f"'{text}' is not a date in YYYY-MM-DD format.", parent=self)
+            return None
+        return timestamp + 86400 if end_of_day else timestamp
+
+    def current_filters(self):
+        game = self.game_var.get()
+        return {
+            'game': None if game == self.ALL_GAMES else game,
+            'since': self.parse_date(self.since_entry),
+            'until': self.parse_date(self.until_entry, end_of_day=True),
+        }
+
+    def reset_page(self):
+        self.page = 0
+        self.refresh()
+
+    def change_page(self, step):
+        self.page = max(0, self.page + step)
+        self.refresh()
+
+    def refresh(self):
+        filters = self.current_filters()
+        total = self.index.count(**filters)
+        pages = max(1, (total + self.PAGE_SIZE - 1) // self.PAGE_SIZE)
+        self.page = min(self.page, pages - 1)
+        self.rows = self.index.query(limit=self.PAGE_SIZE, offset=self.page * self.PAGE_SIZE, **filters)
+
+        self.clip_listbox.delete(0, tk.END)
+        for row in self.rows:
+            saved = time.strftime("%Y-%m-%d %H:%M", time.localtime(row['timestamp']))
+            duration = f"{int(row['duration']) // 60}:{int(row['duration']) % 60:02d}" if row['duration'] else "?:??"
+            resolution = f"{row['width']}x{row['height']}" if row['width'] else "?"
+            game = (row['game'] or "-")[:16]
+            self.clip_listbox.insert(tk.END, f"{saved}  {game:<16}  {duration:>6}  {resolution:>9}  "
+                                             f"{row['size'] / 1048576:7.1f} MB  {os.path.basename(row['path'])}")
+
+        self.page_label.config(text=f"Page {self.page + 1} of {pages} ({total} clips)")
+        self.prev_button.config(state=tk.NORMAL if self.page > 0 else tk.DISABLED)
+        self.next_button.config(state=tk.NORMAL if self.page < pages - 1 else tk.DISABLED)
+
+    def open_clip(self, event=None):
+        selected_indices = self.clip_listbox.curselection()
+        if not selected_indices:
+            return
+        path = self.rows[selected_indices[0]]['path']
+        if not os.path.exists(path):
+            messagebox.showwarning("Warning", f"'{path}' no longer exists.", parent=self)
+            return
+        opener = 'xdg-open' if platform.system() == "Linux" else 'open'
+        try:
+            subprocess.Popen([opener, path], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        except FileNotFoundError:
+            messagebox.showerror("Error", f"Could not find '{opener}' to open the clip.", parent=self)
+
+    def on_close(self):
+        self.index.close()
+        self.destroy()
+
+class SessionStatsDialog(tk.Toplevel):
+    """Shows the average OBS overhead per game, next to the game's own usage for context."""
+
+    def __init__(self, master):
+        super().__init__(master)
+        self.title("Session stats")
+        self.minsize(640, 240)
+
+        store = SessionStore(DB_PATH)
+        try:
+            summaries = store.game_summaries()
+        finally:
+            store.close()
+
+        header = f"{'Game':<20} {'Sessions':>8} {'Hours':>7}  {'OBS CPU':>8} {'OBS RSS':>9} {'OBS write':>11}  {'Game CPU':>8}"
+        tk.Label(self, text=header, font="TkFixedFont", anchor=tk.W).pack(fill=tk.X, padx=5, pady=(5, 0))
+
+        listbox = tk.Listbox(self, font="TkFixedFont")
+        listbox.pack(fill=tk.BOTH, expand=True, padx=5, pady=(0, 5))
+        for entry in summaries:
+            obs = entry['obs']
+            game_cpu = entry['game_tree'].get('cpu_percent')
+            listbox.insert(tk.END, (
+                f"{(entry['game'] or '-')[:20]:<20} {entry['sessions']:>8} {entry['hours']:>7.1f}  "
+                f"{self.format_stat(obs.get('cpu_percent'), '%', 1):>8} "
+                f"{self.format_stat(obs.get('rss_mb'), ' MB', 0):>9} "
+                f"{self.format_stat(obs.get('write_mb_s'), ' MB/s', 1):>11}  "
+                f"{self.format_stat(game_cpu, '%', 1):>8}"))
+        if not summaries:
+            listbox.insert(tk.END, "No sessions have been recorded yet.")
+
+        tk.Button(self, text="Close", command=self.destroy).pack(pady=(0, 5))
+
+    @staticmethod
+    def format_stat(value, unit, decimals):
+        return "-" if value is None else f"{value:.{decimals}f}{unit}"
+
 class ProcessPicker(tk.Toplevel):
     def __init__(self, master, callback):
         super().__init__(master)
@@ -678,10 +1173,10 @@ class ProcessPicker(tk.Toplevel):
         search_entry = tk.Entry(self, textvariable=self.search_var)
         search_entry.pack(fill=tk.X, padx=5, pady=5)
 
-        self.process_listbox = tk.Listbox(self)
+        self.process_listbox = tk.Listbox(self, selectmode=tk.EXTENDED)
         self.process_listbox.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
 
-        select_button = tk.Button(self, text="Select a process", command=self.on_select)
+        select_button = tk.Button(self, text="Add the selected processes", command=self.on_select)
         select_button.pack(pady=5)
 
         self.processes = self.get_process_list()
@@ -717,8 +1212,8 @@ class ProcessPicker(tk.Toplevel):
     def on_select(self, event=None):
         selected_indices = self.process_listbox.curselection()
         if selected_indices:
-            selected_process = self.process_listbox.get(selected_indices[0])
-            self.callback(selected_process)
+            selected_processes = [self.process_listbox.get(i) for i in selected_indices]
+            self.callback(selected_processes)
             self.destroy()
 
 if __name__ == "__main__":
@@ -0,0 +1,325 @@
+"""Counter-Strike 2 Game State Integration receiver that saves the replay buffer on highlights.
+
+CS2 posts its game state to the service when a gamestate_integration_*.cfg pointing at it
+is installed (see README.md). The file can also be run to load-test the receiver with
+recorded traffic:
+
+    python3 gsi.py loadtest gsi-trace.jsonl --speed 0
+"""
+import argparse
+import asyncio
+import http.client
+import json
+import threading
+import time
+
+from obs_websocket import ObsWebSocketError
+
+DEFAULT_PORT = 3000
+
+# Events CS2's player-scope GSI data allows us to detect
+SUPPORTED_EVENTS = ('multi_kill', 'round_win')
+
+# Largest payload accepted; full-state posts are a few KB
+MAX_BODY = 1 << 20
+
+def section(payload, name):
+    """Returns the object `name` of a GSI payload, {} if it is missing."""
+    value = payload.get(name)
+    if value is None:
+        return {}
+    if not isinstance(value, dict):
+        raise ValueError(f"'{name}' is not an object")
+    return value
+
+class GsiEvents:
+    """Turns successive GSI payloads into highlight events for the local player.
+
+    Only changes between payloads matter, so just the few fields compared are kept from
+    the previous one.
+    """
+
+    def __init__(self, events=SUPPORTED_EVENTS, multi_kill=3):
+        self.events = set(events)
+        self.multi_kill = multi_kill
+        self.round_kills = 0
+        self.round_phase = None
+        # The local player's team, remembered for round wins seen while spectating
+        self.team = None
+
+    def feed(self, payload):
+        """Returns a list of (event, detail) tuples triggered by `payload`.
+
+        Raises ValueError if a field has the wrong type.
+        """
+        triggered = []
+        player = section(payload, 'player')
+        provider = section(payload, 'provider')
+        round_info = section(payload, 'round')
+        state = section(player, 'state')
+
+        # Checked before the spectator test: a round won after we died is still our win
+        phase = round_info.get('phase')
+        if phase == 'over' and self.round_phase != 'over' and 'round_win' in self.events:
+            if round_info.get('win_team') and round_info.get('win_team') == self.team:
+                triggered.append(('round_win', round_info['win_team']))
+        if phase is not None:
+            self.round_phase = phase
+
+        if player.get('steamid') != provider.get('steamid'):
+            # Spectating someone else (dead or in a demo), their kills aren't ours
+            return triggered
+        self.team = player.get('team')
+
+        kills = state.get('round_kills', 0)
+        if not isinstance(kills, int) or isinstance(kills, bool):
+            raise ValueError(f"round_kills is not an integer: {kills!r}")
+        if kills > self.round_kills and kills >= self.multi_kill and 'multi_kill' in self.events:
+            triggered.append(('multi_kill', "ace" if kills >= 5 else f"{kills}k"))
+        self.round_kills = kills
+        return triggered
+
+class GsiReceiver:
+    """Accepts GSI posts on an asyncio HTTP server running in its own thread.
+
+    Requests are answered as soon as the payload is parsed; saving the replay buffer runs
+    on an executor thread so a slow OBS never holds up the posts. Events are debounced:
+    the save happens `save_delay` seconds after the last event (so a 3k followed by a 4th
+    kill yields one clip), but never more than `max_delay` seconds after the first.
+    """
+
+    def __init__(self, detector, save, host='127.0.0.1', port=DEFAULT_PORT, token=None,
+                 save_delay=3.0, max_delay=10.0, record_path=None):
+        self.detector = detector
+        self.save = save
+        self.host = host
+        self.port = port
+        self.token = token
+        self.save_delay = save_delay
+        self.max_delay = max_delay
+        self.record_path = record_path
+        self.record_file = None
+        self.pending = None
+        self.save_handle = None
+        self.latencies = []
+        self.loop = None
+        self.stopped = None
+        # {handler task: writer} for open connections, CS2 keeps its connection open indefinitely
+        self.connections = {}
+        self.thread = None
+        self.ready = threading.Event()
+
+    @classmethod
+    def from_config(cls, config, obs_ws):
+        """Returns a receiver for the "gsi" config section that saves through `obs_ws`."""
+        settings = config.get('gsi', {})
+        events = settings.get('events', list(SUPPORTED_EVENTS))
+        for event in events:
+            if event not in SUPPORTED_EVENTS:
+                # e.g. "clutch" needs the state of every teammate, which GSI only sends to spectators
+                print(f"Warning: GSI event '{event}' can't be detected from player data, ignoring it.")
+        detector = GsiEvents([event for event in events if event in SUPPORTED_EVENTS],
+                             settings.get('multi_kill', 3))
+        return cls(detector, lambda: obs_ws.request('SaveReplayBuffer'),
+                   host=settings.get('host', '127.0.0.1'),
+                   port=settings.get('port', DEFAULT_PORT),
+                   token=settings.get('token'),
+                   save_delay=settings.get('save_delay', 3.0),
+                   max_delay=settings.get('max_delay', 10.0),
+                   record_path=settings.get('record_path'))
+
+    def start(self):
+        """Starts the server thread. Returns False if the port could not be opened."""
+        self.thread = threading.Thread(target=self._run, name="gsi", daemon=True)
+        self.thread.start()
+        self.ready.wait()
+        return self.stopped is not None
+
+    def stop(self):
+        if self.loop and self.stopped:
+            self.loop.call_soon_threadsafe(self.stopped.set)
+            self.thread.join(timeout=5)
+        if self.record_file:
+            self.record_file.close()
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        try:
+            self.loop.run_until_complete(self._serve())
+        finally:
+            self.loop.close()
+
+    async def _serve(self):
+        try:
+            server = await asyncio.start_server(self._handle, self.host, self.port)
+        except OSError as e:
+            print(f"Error: Could not listen for CS2 game state on {self.host}:{self.port}: {e}")
+            self.ready.set()
+            return
+        # With port 0 the system picks one, report the actual port
+        self.port = server.sockets[0].getsockname()[1]
+        if self.record_path:
+            self.record_file = open(self.record_path, 'a')
+        self.stopped = asyncio.Event()
+        print(f"Listening for CS2 game state on {self.host}:{self.port}")
+        self.ready.set()
+        async with server:
+            await self.stopped.wait()
+            # Closing the connections ends their handlers, which must finish before the loop closes
+            for writer in self.connections.values():
+                writer.close()
+            if self.connections:
+                _, pending = await asyncio.wait(list(self.connections), timeout=2)
+                for task in pending:
+                    task.cancel()
+
+    async def _handle(self, reader, writer):
+        task = asyncio.current_task()
+        self.connections[task] = writer
+        try:
+            # CS2 keeps the connection open and posts on it at up to tick rate
+            while True:
+                try:
+                    header = await reader.readuntil(b'\r\n\r\n')
+                except asyncio.IncompleteReadError:
+                    break
+                lines = header.decode('latin-1').split('\r\n')
+                method = lines[0].split(' ', 1)[0]
+                headers = {name.strip().lower(): value.strip()
+                           for name, _, value in (line.partition(':') for line in lines[1:] if line)}
+                length = int(headers.get('content-length', 0))
+                if length > MAX_BODY:
+                    writer.write(b"HTTP/1.1 413 Payload Too Large\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+                    break
+                body = await reader.readexactly(length)
+                status = self.handle_post(body) if method == 'POST' else "405 Method Not Allowed"
+                writer.write(f"HTTP/1.1 {status}\r\nContent-Length: 0\r\n\r\n".encode())
+                await writer.drain()
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            del self.connections[task]
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    def handle_post(self, body):
+        """Processes one GSI payload and returns the HTTP status line to answer with."""
+        received = time.monotonic()
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return "400 Bad Request"
+        if not isinstance(payload, dict):
+            return "400 Bad Request"
+        try:
+            auth = section(payload, 'auth')
+        except ValueError:
+            return "400 Bad Request"
+        if self.token and auth.get('token') != self.token:
+            return "401 Unauthorized"
+        if self.record_file:
+            self.record_file.write(json.dumps({'t': round(time.time(), 3), 'body': payload}) + "\n")
+
+        try:
+            events = self.detector.feed(payload)
+        except ValueError:
+            return "400 Bad Request"
+        for event, detail in events:
+            self.schedule_save(f"{event} ({detail})", received)
+        return "200 OK"
+
+    def schedule_save(self, description, received):
+        if self.pending is None:
+            self.pending = {'first': received, 'events': []}
+        self.pending['events'].append(description)
+        if self.save_handle:
+            self.save_handle.cancel()
+        due = min(received + self.save_delay, self.pending['first'] + self.max_delay)
+        self.save_handle = self.loop.call_later(max(0.0, due - time.monotonic()), self._fire_save)
+
+    def _fire_save(self):
+        pending, self.pending, self.save_handle = self.pending, None, None
+        self.loop.run_in_executor(None, self._save, pending)
+
+    def _save(self, pending):
+        try:
+            self.save()
+        except ObsWebSocketError as e:
+            print(f"Warning: Could not save the replay buffer: {e}")
+            return
+        latency = time.monotonic() - pending['first']
+        self.latencies.append(latency)
+        print(f"Saved replay for {', '.join(pending['events'])} ({latency * 1000:.0f} ms after the event)")
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+def load_test(path, speed=0.0, save_delay=0.0, multi_kill=3):
+    """Replays a recorded trace against a local receiver and returns latency metrics.
+
+    The trace is a JSON-lines file as written by the "record_path" option. `speed` scales
+    the recorded pacing (2 = twice as fast), 0 posts as fast as possible.
+    """
+    with open(path, 'r') as f:
+        trace = [json.loads(line) for line in f if line.strip()]
+
+    saves = []
+    receiver = GsiReceiver(GsiEvents(multi_kill=multi_kill), lambda: saves.append(time.monotonic()),
+                           port=0, save_delay=save_delay, max_delay=max(save_delay, 10.0))
+    if not receiver.start():
+        raise RuntimeError("Could not start the receiver")
+
+    connection = http.client.HTTPConnection(receiver.host, receiver.port)
+    request_times = []
+    started = time.monotonic()
+    for entry in trace:
+        if speed:
+            due = started + (entry['t'] - trace[0]['t']) / speed
+            time.sleep(max(0.0, due - time.monotonic()))
+        body = json.dumps(entry['body']).encode()
+        sent = time.monotonic()
+        connection.request('POST', '/', body, {'Content-Type': 'application/json'})
+        connection.getresponse().read()
+        request_times.append(time.monotonic() - sent)
+    elapsed = time.monotonic() - started
+    connection.close()
+
+    # Let the last debounced save go through
+    time.sleep(save_delay + 0.5)
+    receiver.stop()
+    return {
+        'posts': len(trace),
+        'posts_per_second': len(trace) / elapsed if elapsed else float('inf'),
+        'request_p50_ms': percentile(request_times, 0.5) * 1000,
+        'request_p95_ms': percentile(request_times, 0.95) * 1000,
+        'request_max_ms': max(request_times, default=0.0) * 1000,
+        'saves': len(receiver.latencies),
+        'save_p50_ms': percentile(receiver.latencies, 0.5) * 1000,
+        'save_max_ms': max(receiver.latencies, default=0.0) * 1000,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="CS2 Game State Integration tools for CS_OBS.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    test_parser = subparsers.add_parser('loadtest', help="replay recorded GSI traffic against a local receiver")
+    test_parser.add_argument('trace')
+    test_parser.add_argument('--speed', type=float, default=0.0, help="pacing multiplier, 0 for as fast as possible")
+    test_parser.add_argument('--save-delay', type=float, default=0.0, help="debounce delay in seconds")
+    test_parser.add_argument('--multi-kill', type=int, default=3)
+    args = parser.parse_args()
+
+    result = load_test(args.trace, args.speed, args.save_delay, args.multi_kill)
+    print(f"{result['posts']} posts at {result['posts_per_second']:.0f}/s, "
+          f"request latency p50 {result['request_p50_ms']:.2f} ms, p95 {result['request_p95_ms']:.2f} ms, "
+          f"max {result['request_max_ms']:.2f} ms")
+    print(f"{result['saves']} saves, event-to-save latency p50 {result['save_p50_ms']:.1f} ms, "
+          f"max {result['save_max_ms']:.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""Measures how much the service's scans disturb a CPU-bound foreground workload.
+
+    python3 jitter.py --duration 30
+    python3 jitter.py --duration 30 --idle --cpus 0-1 --slice
+
+A game-like workload runs fixed-size frames on every CPU while the detection loop scans
+the real process table in the background. Frame time percentiles are reported without
+the service, with default scheduling, and with the requested scheduling settings (the
+same ones as "low_priority_service", "housekeeping_cpus" and "service_slice"), so the
+extra jitter each configuration adds can be compared.
+"""
+import argparse
+import contextlib
+import io
+import multiprocessing
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+import service
+from timeline import ReplayLauncher
+
+# Scope properties the GUI applies to the service slice (see cs_obs.py)
+SLICE_PROPERTIES = ("CPUQuota=10%", "MemoryMax=256M")
+
+def calibrate(frame_ms):
+    """Returns the loop count that takes about `frame_ms` milliseconds on this CPU."""
+    iterations = 10000
+    while True:
+        started = time.perf_counter()
+        spin(iterations)
+        elapsed = time.perf_counter() - started
+        if elapsed > 0.05:
+            return max(1, int(iterations * frame_ms / 1000 / elapsed))
+        iterations *= 2
+
+def spin(iterations):
+    total = 0
+    for i in range(iterations):
+        total += i * i
+    return total
+
+def frame_worker(iterations, duration, results):
+    frames = []
+    deadline = time.perf_counter() + duration
+    while True:
+        started = time.perf_counter()
+        if started >= deadline:
+            break
+        spin(iterations)
+        frames.append(time.perf_counter() - started)
+    results.put(frames)
+
+def run_workload(duration, frame_ms, workers):
+    """Runs `workers` frame loops for `duration` seconds and returns all frame times in ms."""
+    iterations = calibrate(frame_ms)
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=frame_worker, args=(iterations, duration, results))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    frames = []
+    for _ in processes:
+        frames.extend(results.get())
+    for process in processes:
+        process.join()
+    return sorted(frame * 1000 for frame in frames)
+
+def service_loop(interval, idle, cpus):
+    """Runs the detection loop against the live process table without ever starting OBS."""
+    config = {'whitelisted_games': ['cs2'], 'low_priority_service': idle}
+    if cpus:
+        config['housekeeping_cpus'] = cpus
+    service.apply_service_scheduling(config)
+    monitor = service.Monitor(config, launcher=ReplayLauncher(time.monotonic), config_path=None,
+                              log=lambda message: None, live=False)
+    while True:
+        with contextlib.redirect_stdout(io.StringIO()):
+            monitor.tick()
+        time.sleep(interval)
+
+def start_service(interval, idle=False, cpus=None, in_slice=False):
+    command = [sys.executable, os.path.abspath(__file__), 'service-loop', '--interval', str(interval)]
+    if idle:
+        command.append('--idle')
+    if cpus:
+        command += ['--cpus', cpus]
+    if in_slice:
+        properties = [f"--property={prop}" for prop in SLICE_PROPERTIES]
+        command = ['systemd-run', '--user', '--scope', '--quiet', f'--slice={service.SERVICE_SLICE}'] + \
+                  properties + command
+    return subprocess.Popen(command)
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+def measure(name, args, service_args=None):
+    process = start_service(args.interval, **service_args) if service_args is not None else None
+    try:
+        # Let the service get through its startup before measuring
+        time.sleep(1.0 if process else 0.0)
+        frames = run_workload(args.duration, args.frame_ms, args.workers)
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
+    p50 = percentile(frames, 0.5)
+    p99 = percentile(frames, 0.99)
+    print(f"{name:<12} {len(frames):>8} frames, p50 {p50:6.2f} ms, p99 {p99:6.2f} ms, "
+          f"p99.9 {percentile(frames, 0.999):6.2f} ms, max {frames[-1] if frames else 0.0:7.2f} ms, "
+          f"jitter (p99 - p50) {p99 - p50:6.2f} ms")
+    return p99 - p50
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the frame time jitter the CS_OBS service adds to a CPU-bound workload.")
+    parser.add_argument('--duration', type=float, default=30.0, help="seconds per measurement")
+    parser.add_argument('--frame-ms', type=float, default=4.0, help="work per frame in milliseconds")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="foreground processes, one per CPU by default")
+    parser.add_argument('--interval', type=float, default=0.5,
+                        help="seconds between service ticks, shorter than the real one to make the effect measurable")
+    parser.add_argument('--idle', action='store_true', help="run the service at SCHED_IDLE and idle I/O priority")
+    parser.add_argument('--cpus', help="housekeeping CPU list to pin the service to, e.g. 0-1")
+    parser.add_argument('--slice', action='store_true', help=f"run the service in {service.SERVICE_SLICE}")
+    subparsers = parser.add_subparsers(dest='command')
+    loop_parser = subparsers.add_parser('service-loop')
+    loop_parser.add_argument('--interval', type=float, default=0.5)
+    loop_parser.add_argument('--idle', action='store_true')
+    loop_parser.add_argument('--cpus')
+    args = parser.parse_args()
+
+    if args.command == 'service-loop':
+        service_loop(args.interval, args.idle, args.cpus)
+        return
+
+    if args.slice and not shutil.which('systemd-run'):
+        parser.error("--slice needs systemd-run")
+    configured = args.idle or args.cpus or args.slice
+    baseline = measure("no service", args)
+    default = measure("default", args, {})
+    print(f"The service with default scheduling adds {default - baseline:+.2f} ms of jitter")
+    if configured:
+        tuned = measure("configured", args, {'idle': args.idle, 'cpus': args.cpus, 'in_slice': args.slice})
+        print(f"The service with the requested settings adds {tuned - baseline:+.2f} ms of jitter")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+import base64
+import hashlib
+import json
+import os
+import socket
+import struct
+import threading
+import uuid
+
+# obs-websocket 5.x opcodes
+OP_HELLO = 0
+OP_IDENTIFY = 1
+OP_IDENTIFIED = 2
+OP_REQUEST = 6
+OP_REQUEST_RESPONSE = 7
+
+# RFC 6455 frame opcodes
+WS_TEXT = 0x1
+WS_CLOSE = 0x8
+WS_PING = 0x9
+WS_PONG = 0xA
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+class ObsWebSocketError(Exception):
+    """Raised when OBS can't be reached or rejects a request."""
+
+def auth_response(password, salt, challenge):
+    """Computes the obs-websocket authentication string for a Hello challenge."""
+    secret = base64.b64encode(hashlib.sha256((password + salt).encode()).digest())
+    return base64.b64encode(hashlib.sha256(secret + challenge.encode()).digest()).decode()
+
+class ObsWebSocket:
+    """Minimal obs-websocket 5.x client using only the standard library.
+
+    Requests are synchronous and serialised with a lock, so one client can be shared
+    between threads. Events are not subscribed to.
+    """
+
+    def __init__(self, host='localhost', port=4455, password=None, timeout=5.0):
+        self.host = host
+        self.port = int(port)
+        self.password = password or None
+        self.timeout = timeout
+        self.sock = None
+        self.buffer = b''
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config, key='obs_websocket'):
+        """Returns a client for a {"host", "port", "password"} config section."""
+        settings = config.get(key, {})
+        return cls(settings.get('host', 'localhost'), settings.get('port', 4455), settings.get('password'))
+
+    def is_connected(self):
+        return self.sock is not None
+
+    def connect(self):
+        """Opens the connection and completes the obs-websocket handshake."""
+        with self.lock:
+            self._connect()
+
+    def _connect(self):
+        self._close()
+        try:
+            self.sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._upgrade()
+
+            hello = self._recv_message()
+            if hello.get('op') != OP_HELLO:
+                raise ObsWebSocketError(f"Expected Hello from OBS, got op {hello.get('op')}")
+
+            identify = {'rpcVersion': 1, 'eventSubscriptions': 0}
+            auth = hello['d'].get('authentication')
+            if auth:
+                if not self.password:
+                    raise ObsWebSocketError("OBS requires a websocket password but none is configured")
+                identify['authentication'] = auth_response(self.password, auth['salt'], auth['challenge'])
+            self._send_message({'op': OP_IDENTIFY, 'd': identify})
+
+            identified = self._recv_message()
+            if identified.get('op') != OP_IDENTIFIED:
+                raise ObsWebSocketError("OBS did not accept the identification (wrong password?)")
+        except (OSError, ValueError, KeyError) as e:
+            self._close()
+            raise ObsWebSocketError(f"Could not connect to OBS at {self.host}:{self.port}: {e}") from e
+        except ObsWebSocketError:
+            self._close()
+            raise
+
+    def close(self):
+        with self.lock:
+            self._close()
+
+    def _close(self):
+        if self.sock:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+        self.sock = None
+        self.buffer = b''
+
+    def request(self, request_type, data=None):
+        """Sends a request and returns its responseData (or {}), connecting first if needed."""
+        with self.lock:
+            if self.sock is None:
+                self._connect()
+            request_id = uuid.uuid4().hex
+            payload = {'requestType': request_type, 'requestId': request_id}
+            if data:
+                payload['requestData'] = data
+            try:
+                self._send_message({'op': OP_REQUEST, 'd': payload})
+                while True:
+                    message = self._recv_message()
+                    if message.get('op') == OP_REQUEST_RESPONSE and message['d'].get('requestId') == request_id:
+                        break
+            except (OSError, ValueError) as e:
+                self._close()
+                raise ObsWebSocketError(f"Lost connection to OBS during {request_type}: {e}") from e
+
+        status = message['d'].get('requestStatus', {})
+        if not status.get('result'):
+            raise ObsWebSocketError(f"{request_type} failed: {status.get('comment') or status.get('code')}")
+        return message['d'].get('responseData') or {}
+
+    # --- WebSocket transport (RFC 6455, client side) ---
+
+    def _upgrade(self):
+        key = base64.b64encode(os.urandom(16)).decode()
+        self.sock.sendall((
+            f"GET / HTTP/1.1\r\n"
+            f"Host: {self.host}:{self.port}\r\n"
+            f"Upgrade: websocket\r\n"
+            f"Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Key: {key}\r\n"
+            f"Sec-WebSocket-Version: 13\r\n"
+            f"Sec-WebSocket-Protocol: obswebsocket.json\r\n\r\n").encode())
+
+        while b'\r\n\r\n' not in self.buffer:
+            self._fill()
+        header, self.buffer = self.buffer.split(b'\r\n\r\n', 1)
+        lines = header.decode(errors='replace').split('\r\n')
+        if ' 101 ' not in lines[0] + ' ':
+            raise ObsWebSocketError(f"WebSocket upgrade refused: {lines[0]}")
+
+        expected = base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+        headers = {name.strip().lower(): value.strip() for name, _, value in (line.partition(':') for line in lines[1:])}
+        if headers.get('sec-websocket-accept') != expected:
+            raise ObsWebSocketError("WebSocket upgrade returned a bad Sec-WebSocket-Accept")
+
+    def _fill(self):
+        data = self.sock.recv(65536)
+        if not data:
+            raise ConnectionError("connection closed by OBS")
+        self.buffer += data
+
+    def _read_exact(self, size):
+        while len(self.buffer) < size:
+            self._fill()
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+    def _send_frame(self, opcode, payload):
+        header = bytes([0x80 | opcode])
+        length = len(payload)
+        if length < 126:
+            header += bytes([0x80 | length])
+        elif length < 65536:
+            header += bytes([0x80 | 126]) + struct.pack('!H', length)
+        else:
+            header += bytes([0x80 | 127]) + struct.pack('!Q', length)
+        mask = os.urandom(4)
+        masked = bytes(byte ^ mask[i % 4] for i, byte in enumerate(payload))
+        self.sock.sendall(header + mask + masked)
+
+    def _send_message(self, message):
+        self._send_frame(WS_TEXT, json.dumps(message).encode())
+
+    def _recv_message(self):
+        """Returns the next JSON message, answering pings and joining fragments."""
+        fragments = []
+        while True:
+            first, second = self._read_exact(2)
+            opcode = first & 0x0F
+            length = second & 0x7F
+            if length == 126:
+                length = struct.unpack('!H', self._read_exact(2))[0]
+            elif length == 127:
+                length = struct.unpack('!Q', self._read_exact(8))[0]
+            mask = self._read_exact(4) if second & 0x80 else None
+            payload = self._read_exact(length)
+            if mask:
+                payload = bytes(byte ^ mask[i % 4] for i, byte in enumerate(payload))
+
+            if opcode == WS_PING:
+                self._send_frame(WS_PONG, payload)
+                continue
+            if opcode == WS_CLOSE:
+                raise ConnectionError("OBS closed the websocket")
+            if opcode == WS_PONG:
+                continue
+
+            fragments.append(payload)
+            if first & 0x80:
+                return json.loads(b''.join(fragments).decode())
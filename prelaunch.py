@@ -0,0 +1,193 @@
+import json
+import os
+import time
+
+# Learned delays kept per game; older ones are dropped
+MAX_DELAYS = 20
+
+# Default seconds to wait for the game after its launcher appeared
+DEFAULT_TIMEOUT = 90
+
+# Default seconds OBS is started ahead of the expected game start
+DEFAULT_LEAD_SECONDS = 10
+
+def launcher_kind(info):
+    """Returns "steam", "lutris" or "heroic" if a process info dict is a game launch in progress."""
+    name = (info.get('name') or "").lower()
+    args = [arg.lower() for arg in info.get('cmdline') or []]
+    if name == 'reaper' and 'steamlaunch' in args:
+        # Steam runs every game as: reaper SteamLaunch AppId=<id> -- <launch command>
+        return 'steam'
+    if name.startswith('lutris-wrapper'):
+        return 'lutris'
+    if 'launch' in args and any(os.path.basename(arg) in ('legendary', 'gogdl') for arg in args[:2]):
+        # Heroic launches Epic games through legendary and GOG games through gogdl
+        return 'heroic'
+    return None
+
+class PrecursorMatcher:
+    """Maps launcher processes to the whitelisted game they are about to start.
+
+    Built-in launchers (Steam's reaper, Lutris, Heroic) are matched by finding a whitelisted
+    name in their command line. The `precursors` config maps games to extra command line
+    patterns, for launchers that don't mention the game binary (e.g. "AppId=730").
+    """
+
+    def __init__(self, whitelisted_games, precursors):
+        self.games = list(whitelisted_games)
+        self.targets = [game.lower() for game in self.games]
+        self.patterns = [(game, [pattern.lower() for pattern in precursors.get(game, [])])
+                         for game in self.games if precursors.get(game)]
+
+    def match(self, info):
+        """Returns the whitelisted game a launcher process is starting, or None."""
+        cmdline_str = " ".join(arg for arg in info.get('cmdline') or [] if arg.strip()).lower().replace("\\", "/")
+        for game, patterns in self.patterns:
+            if any(pattern in cmdline_str for pattern in patterns):
+                return game
+        if launcher_kind(info) is None:
+            return None
+        for game, target in zip(self.games, self.targets):
+            if target in cmdline_str:
+                return game
+        return None
+
+class LaunchPredictor:
+    """Starts OBS on launcher activity and learns how long each game takes to follow.
+
+    Launcher processes are tracked by PID from the tick they first appear. Once the game
+    itself shows up the precursor-to-game delay is recorded, and the median of past delays
+    decides how early OBS is started next time. Hits and misses are counted per game and
+    kept, with the delays, in a JSON file.
+    """
+
+    def __init__(self, whitelisted_games, config, clock=time.monotonic, stats_path=None):
+        self.clock = clock
+        self.stats_path = stats_path
+        self.stats = self.load_stats()
+        # {pid: {"game", "seen", "consumed"}} for launcher processes currently running
+        self.precursors = {}
+        self.update_config(whitelisted_games, config)
+
+    def update_config(self, whitelisted_games, config):
+        settings = config.get('prelaunch', {})
+        self.timeout = settings.get('timeout', DEFAULT_TIMEOUT)
+        self.lead_seconds = settings.get('lead_seconds', DEFAULT_LEAD_SECONDS)
+        self.matcher = PrecursorMatcher(whitelisted_games, config.get('precursors', {}))
+
+    def load_stats(self):
+        if not self.stats_path:
+            return {}
+        try:
+            with open(self.stats_path, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Warning: Ignoring unreadable prelaunch stats {self.stats_path}: {e}")
+            return {}
+
+    def save_stats(self):
+        if not self.stats_path:
+            return
+        tmp_path = f"{self.stats_path}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(self.stats, f, indent=4)
+            os.replace(tmp_path, self.stats_path)
+        except OSError as e:
+            print(f"Warning: Could not save prelaunch stats to {self.stats_path}: {e}")
+
+    def game_stats(self, game):
+        return self.stats.setdefault(game, {'delays': [], 'hits': 0, 'misses': 0})
+
+    def observe(self, process_infos):
+        """Tracks launcher processes and returns the process infos that aren't launchers.
+
+        Launchers carry the game's name in their command line, so they have to be kept
+        away from the game matcher or they would be taken for the game itself.
+        """
+        now = self.clock()
+        remaining = []
+        present = set()
+        for info in process_infos:
+            game = self.matcher.match(info)
+            if game is None:
+                remaining.append(info)
+                continue
+            pid = info.get('pid')
+            present.add(pid)
+            if pid not in self.precursors:
+                print(f"Launch of {game} detected")
+                self.precursors[pid] = {'game': game, 'seen': now, 'consumed': False}
+        for pid in list(self.precursors):
+            if pid not in present:
+                del self.precursors[pid]
+        return remaining
+
+    def pending(self, game=None):
+        """Returns the launchers still waiting for their game, optionally only for `game`."""
+        return [entry for entry in self.precursors.values()
+                if not entry['consumed'] and (game is None or entry['game'] == game)]
+
+    def expected_delay(self, game):
+        delays = sorted(self.stats.get(game, {}).get('delays', []))
+        return delays[len(delays) // 2] if delays else 0.0
+
+    def deadline(self, game):
+        """Seconds after the launcher appeared after which a speculative start is a miss."""
+        delays = self.stats.get(game, {}).get('delays', [])
+        return max(self.timeout, 1.5 * max(delays)) if delays else self.timeout
+
+    def due(self):
+        """Returns a game whose OBS should be started now, or None."""
+        now = self.clock()
+        for entry in self.pending():
+            if now - entry['seen'] >= self.expected_delay(entry['game']) - self.lead_seconds:
+                return entry['game']
+        return None
+
+    def expired(self, game):
+        """Returns True once `game` can no longer be expected to start."""
+        entries = self.pending(game)
+        if not entries:
+            return True
+        return self.clock() - min(entry['seen'] for entry in entries) > self.deadline(game)
+
+    def game_appeared(self, game):
+        """Records the delay from the game's launcher to the game itself."""
+        entries = self.pending(game)
+        if not entries:
+            return
+        delay = self.clock() - min(entry['seen'] for entry in entries)
+        for entry in entries:
+            entry['consumed'] = True
+        stats = self.game_stats(game)
+        stats['delays'] = (stats['delays'] + [round(delay, 1)])[-MAX_DELAYS:]
+        print(f"{game} started {delay:.1f} s after its launcher")
+        self.save_stats()
+
+    def cancel(self, game):
+        """Stops expecting `game` from the launchers currently running."""
+        for entry in self.pending(game):
+            entry['consumed'] = True
+
+    def record_hit(self, game):
+        self.game_stats(game)['hits'] += 1
+        self.save_stats()
+        print(f"Prelaunch hit for {game} ({self.describe(game)})")
+
+    def record_miss(self, game):
+        self.cancel(game)
+        self.game_stats(game)['misses'] += 1
+        self.save_stats()
+        print(f"Prelaunch miss for {game} ({self.describe(game)})")
+
+    def describe(self, game):
+        stats = self.stats.get(game, {})
+        return (f"{stats.get('hits', 0)} hits, {stats.get('misses', 0)} misses, "
+                f"expected delay {self.expected_delay(game):.1f} s")
+
+    def report(self):
+        for game in sorted(self.stats):
+            print(f"Prelaunch {game}: {self.describe(game)}")
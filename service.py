@@ -1,3 +1,5 @@
+import collections
+import gc
 import json
 import subprocess
 import time
@@ -6,20 +8,60 @@ import os
 import platform
 import shlex
 import shutil
+import signal
+import socket
+import threading
+import tracemalloc
+import uuid
+
+from clips import ClipCoalescer, ClipIndex, ClipPipeline
+from gsi import GsiReceiver
+from obs_websocket import ObsWebSocket, ObsWebSocketError
+from prelaunch import LaunchPredictor
+from telemetry import SessionStore, SessionTelemetry
+from x11_detect import ActiveWindowWatcher, x11_available
 
 # Get the absolute path of the directory containing the script
 script_dir = os.path.dirname(os.path.abspath(__file__))
 CONFIG_PATH = os.path.join(script_dir, 'config.json')
 LOG_PATH = os.path.join(script_dir, 'actions.log')
+DB_PATH = os.path.join(script_dir, 'cs_obs.db')
+PRELAUNCH_STATS_PATH = os.path.join(script_dir, 'prelaunch.json')
+
+# Session state survives service restarts (but not reboots) in the runtime directory
+if os.environ.get('XDG_RUNTIME_DIR'):
+    STATE_PATH = os.path.join(os.environ['XDG_RUNTIME_DIR'], 'cs_obs', 'state.json')
+else:
+    STATE_PATH = os.path.join(script_dir, 'state.json')
 
 # Hardcoded polling interval in seconds
 POLL_INTERVAL = 5
 
-# Clear log file on startup
-try:
-    open(LOG_PATH, 'w').close()
-except IOError as e:
-    print(f"Error clearing log file on startup: {e}")
+# Self-monitoring of the service's own memory use
+MEMORY_CHECK_TICKS = 60  # every 5 minutes at POLL_INTERVAL
+MEMORY_GROWTH_WARN_MB = 32
+
+# Memory pressure stall information, see Documentation/accounting/psi.rst
+PSI_MEMORY_PATH = "/proc/pressure/memory"
+
+# Seconds between connection checks for the remote OBS backend
+REMOTE_RECONNECT_INTERVAL = 10
+
+# Per-session resource telemetry is sampled every this many ticks
+TELEMETRY_TICKS = 3
+
+# systemd user slice the GUI places the service in when "service_slice" is enabled
+SERVICE_SLICE = "cs_obs.slice"
+
+# CPUs this process may run on before any housekeeping pinning, used for placement decisions
+ORIGINAL_AFFINITY = os.sched_getaffinity(0) if hasattr(os, 'sched_getaffinity') else None
+
+# Mount point of the unified (v2) cgroup hierarchy
+CGROUP_ROOT = "/sys/fs/cgroup"
+
+# Session environment handed to processes started through systemd-run
+DETACHED_ENV = ('DISPLAY', 'WAYLAND_DISPLAY', 'XAUTHORITY', 'XDG_RUNTIME_DIR',
+                'XDG_CURRENT_DESKTOP', 'DBUS_SESSION_BUS_ADDRESS')
 
 def log_action(message):
     """Writes a message to the action log file, overwriting the previous one."""
@@ -62,13 +104,22 @@ def detect_obs_path():
         
         return "obs"  # fallback
 
-def load_config():
-    """Loads the configuration from config.json."""
+def config_signature(path):
+    """Returns what identifies one version of the config file.
+
+    The GUI replaces config.json atomically, so the inode changes with every write even
+    when two writes land within the filesystem's timestamp granularity.
+    """
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+def load_config(path=CONFIG_PATH):
+    """Loads the configuration from `path` (config.json by default)."""
     try:
-        with open(CONFIG_PATH, 'r') as f:
+        with open(path, 'r') as f:
             return json.load(f)
     except FileNotFoundError:
-        print(f"Error: {CONFIG_PATH} not found.")
+        print(f"Error: {path} not found.")
         # Create a default config file based on OS
         obs_path = detect_obs_path()
         default_config = {
@@ -77,16 +128,16 @@ def load_config():
         }
         
         try:
-            with open(CONFIG_PATH, 'w') as f:
+            with open(path, 'w') as f:
                 json.dump(default_config, f, indent=4)
             
-            print(f"Created default config file at {CONFIG_PATH}")
+            print(f"Created default config file at {path}")
             return default_config
         except IOError as e:
             print(f"Error creating default config file: {e}")
             return None
     except json.JSONDecodeError:
-        print(f"Error: Could not decode {CONFIG_PATH}.")
+        print(f"Error: Could not decode {path}.")
         return None
 
 def is_process_running(identifier):
@@ -181,27 +232,356 @@ def cleanup_obs_sentinel():
                 except OSError as e:
                     print(f"Warning: Could not remove .sentinel from {config_dir}: {e}")
 
-def start_obs(obs_path):
-    """Starts OBS and returns the OBS process object."""
+def save_state(path, state):
+    """Atomically writes the session state to `path` (or removes it if `state` is None)."""
+    if state is None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Warning: Could not remove state file {path}: {e}")
+        return
+
+    tmp_path = f"{path}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Warning: Could not save state to {path}: {e}")
+
+def load_state(path):
+    """Returns the persisted session state, or None if there is none."""
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"Warning: Ignoring unreadable state file {path}: {e}")
+        return None
+
+def process_identity(pid):
+    """Returns {"pid", "create_time"} for a live process, or None. The pair survives pid reuse."""
+    try:
+        return {'pid': pid, 'create_time': psutil.Process(pid).create_time()}
+    except psutil.Error:
+        return None
+
+def find_live_process(identity):
+    """Returns the psutil.Process for an identity from process_identity() if it is still alive."""
+    if not identity:
+        return None
+    try:
+        proc = psutil.Process(identity['pid'])
+        if abs(proc.create_time() - identity['create_time']) < 0.01:
+            return proc
+    except (psutil.Error, KeyError, TypeError):
+        pass
+    return None
+
+def sd_notify(message):
+    """Sends a state update (e.g. "READY=1") to systemd when running under a Type=notify unit."""
+    address = os.environ.get('NOTIFY_SOCKET')
+    if not address:
+        return False
+    if address.startswith('@'):
+        # Abstract namespace socket
+        address = '\0' + address[1:]
+
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM | socket.SOCK_CLOEXEC) as sock:
+            sock.connect(address)
+            sock.sendall(message.encode())
+        return True
+    except OSError as e:
+        print(f"Warning: Could not notify systemd: {e}")
+        return False
+
+def watchdog_enabled():
+    """Returns True if systemd expects WATCHDOG=1 pings from this process."""
+    if not os.environ.get('WATCHDOG_USEC'):
+        return False
+    watchdog_pid = os.environ.get('WATCHDOG_PID')
+    return not watchdog_pid or watchdog_pid == str(os.getpid())
+
+def parse_cpu_list(spec):
+    """Parses a CPU list such as "0-3,8" (or a list of ints) into a set of CPU numbers."""
+    if isinstance(spec, (list, tuple, set)):
+        return {int(cpu) for cpu in spec}
+
+    cpus = set()
+    for part in str(spec).split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            start, end = part.split('-', 1)
+            cpus.update(range(int(start), int(end) + 1))
+        else:
+            cpus.add(int(part))
+    return cpus
+
+def detached_command(command, unit=None):
+    """Wraps `command` so the systemd user manager starts it instead of this process.
+
+    The launched program then gets default scheduling and its own cgroup rather than
+    inheriting the service's idle priority, CPU affinity and slice limits.
+    """
+    setenv = [f"--setenv={name}" for name in DETACHED_ENV if name in os.environ]
+    unit_args = [f"--unit={unit}"] if unit else []
+    return ['systemd-run', '--user', '--quiet', '--collect'] + unit_args + setenv + ['--'] + command
+
+def apply_service_scheduling(config):
+    """Applies and verifies the optional game-friendly scheduling settings for this process.
+
+    Returns True if the service changed its own scheduling or runs in the service slice, in
+    which case OBS has to be launched detached so it does not inherit either.
+    """
+    wants_idle = config.get('low_priority_service', False)
+    cpus_spec = config.get('housekeeping_cpus')
+    wants_slice = config.get('service_slice', False)
+
+    if platform.system() != "Linux" or not (wants_idle or cpus_spec or wants_slice):
+        return False
+
+    in_slice = False
+    if wants_slice:
+        # The slice is set up by whoever launches us, here we only verify it
+        try:
+            with open('/proc/self/cgroup', 'r') as f:
+                in_slice = SERVICE_SLICE in f.read()
+        except IOError:
+            pass
+        print(f"Scheduling: running in {SERVICE_SLICE}: {'verified' if in_slice else 'NO'}")
+
+    if not shutil.which('systemd-run'):
+        if in_slice:
+            print(f"Warning: systemd-run not found, OBS will share the CPU and memory limits of {SERVICE_SLICE}.")
+        if wants_idle or cpus_spec:
+            # Scheduling class, I/O priority and affinity are inherited by OBS and can't be undone
+            # by an unprivileged child, so only demote ourselves if OBS can be started elsewhere.
+            print("Warning: systemd-run not found, keeping default scheduling for the service.")
+        return False
+
+    # A child started with Popen would stay in the slice's scope and hit its MemoryMax
+    demoted = in_slice
+    if wants_idle:
+        try:
+            os.sched_setscheduler(0, os.SCHED_IDLE, os.sched_param(0))
+        except OSError as e:
+            print(f"Warning: Could not switch the service to SCHED_IDLE: {e}")
+        try:
+            psutil.Process().ionice(psutil.IOPRIO_CLASS_IDLE)
+        except (psutil.Error, OSError) as e:
+            print(f"Warning: Could not switch the service to the idle I/O class: {e}")
+
+        policy_ok = os.sched_getscheduler(0) == os.SCHED_IDLE
+        ioclass_ok = psutil.Process().ionice().ioclass == psutil.IOPRIO_CLASS_IDLE
+        print(f"Scheduling: SCHED_IDLE: {'verified' if policy_ok else 'NOT applied'}, "
+              f"idle I/O class: {'verified' if ioclass_ok else 'NOT applied'}")
+        demoted = demoted or policy_ok or ioclass_ok
+
+    if cpus_spec:
+        try:
+            requested = parse_cpu_list(cpus_spec)
+        except ValueError:
+            print(f"Warning: Invalid housekeeping_cpus value: {cpus_spec!r}")
+            requested = set()
+
+        cpus = requested & os.sched_getaffinity(0)
+        if not cpus:
+            print(f"Warning: None of the housekeeping CPUs {sorted(requested)} are available to the service.")
+        else:
+            try:
+                os.sched_setaffinity(0, cpus)
+            except OSError as e:
+                print(f"Warning: Could not pin the service to CPUs {sorted(cpus)}: {e}")
+            pinned = os.sched_getaffinity(0) == cpus
+            print(f"Scheduling: pinned to CPUs {sorted(cpus)}: {'verified' if pinned else 'NOT applied'}")
+            demoted = demoted or pinned
+
+    return demoted
+
+def obs_command(obs_path, extra_args=(), replay_buffer=True):
+    """Returns the command line that launches OBS, with the replay buffer running unless disabled."""
+    # Handle Flatpak commands properly by splitting the command
+    if obs_path.startswith('flatpak run'):
+        command = shlex.split(obs_path)
+    else:
+        command = [obs_path]
+    if replay_buffer:
+        command.append('--startreplaybuffer')
+    command.append('--minimize-to-tray')
+    return command + list(extra_args)
+
+def cgroup_launch_available():
+    """Returns True if OBS can be started in its own systemd-managed cgroup v2."""
+    return (platform.system() == "Linux" and
+            os.path.exists(os.path.join(CGROUP_ROOT, 'cgroup.controllers')) and
+            shutil.which('systemd-run') is not None and
+            shutil.which('systemctl') is not None)
+
+class ObsScope:
+    """An OBS instance running in its own transient systemd unit, tracked through its cgroup.
+
+    Liveness comes from cgroup.events and the member processes from cgroup.procs, so the
+    Flatpak wrapper, OBS itself and any helpers are handled as one group.
+    """
+
+    def __init__(self, unit, cgroup_dir):
+        self.unit = unit
+        self.cgroup_dir = cgroup_dir
+        self.main_pid = None
+
+    def _read(self, name):
+        with open(os.path.join(self.cgroup_dir, name), 'r') as f:
+            return f.read()
+
+    def is_running(self):
+        """Returns True while any process is left in the cgroup (populated 1)."""
+        try:
+            for line in self._read('cgroup.events').splitlines():
+                key, _, value = line.partition(' ')
+                if key == 'populated':
+                    return value.strip() == '1'
+        except OSError:
+            pass
+        return False
+
+    def pids(self):
+        try:
+            return [int(pid) for pid in self._read('cgroup.procs').split()]
+        except (OSError, ValueError):
+            return []
+
+    @property
+    def pid(self):
+        """PID of the OBS process itself (not the Flatpak wrapper), or None while unknown."""
+        if self.main_pid and psutil.pid_exists(self.main_pid):
+            return self.main_pid
+        self.main_pid = None
+        pids = self.pids()
+        for pid in pids:
+            try:
+                if psutil.Process(pid).name().lower() == 'obs':
+                    self.main_pid = pid
+                    break
+            except psutil.Error:
+                continue
+        if self.main_pid is None and pids:
+            return min(pids)
+        return self.main_pid
+
+    def signal(self, sig):
+        for pid in self.pids():
+            try:
+                os.kill(pid, sig)
+            except OSError:
+                pass
+
+    def kill(self):
+        """Kills every process in the cgroup at once."""
+        try:
+            with open(os.path.join(self.cgroup_dir, 'cgroup.kill'), 'w') as f:
+                f.write('1')
+        except OSError:
+            # cgroup.kill needs Linux 5.14+
+            self.signal(signal.SIGKILL)
+
+    def wait(self, timeout):
+        """Waits up to `timeout` seconds for the cgroup to empty. Returns True if it did."""
+        deadline = time.monotonic() + timeout
+        while self.is_running():
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.1)
+        return True
+
+def process_cgroup(pid):
+    """Returns the cgroup v2 path of `pid` (relative to CGROUP_ROOT), or None."""
+    try:
+        with open(f"/proc/{pid}/cgroup", 'r') as f:
+            for line in f:
+                if line.startswith('0::'):
+                    return line[3:].strip()
+    except OSError:
+        pass
+    return None
+
+def start_obs_scoped(obs_path, extra_args=(), replay_buffer=True):
+    """Starts OBS in its own transient systemd user unit and returns an ObsScope, or None.
+
+    A transient service (rather than a scope) is used so OBS is spawned by the user manager
+    and never inherits the service's own scheduling settings.
+    """
+    print("Starting OBS in its own cgroup...")
+    cleanup_obs_sentinel()
+
+    unit = f"cs-obs-{uuid.uuid4().hex[:8]}.service"
+    try:
+        subprocess.run(detached_command(obs_command(obs_path, extra_args, replay_buffer), unit=unit),
+                       check=True, capture_output=True, timeout=10)
+        # Give OBS a moment to start, like the unscoped launch does
+        time.sleep(2)
+        properties = subprocess.run(['systemctl', '--user', 'show', '-p', 'MainPID', '-p', 'ControlGroup', unit],
+                                    check=True, capture_output=True, text=True, timeout=10).stdout
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired, OSError) as e:
+        print(f"Error starting OBS in a transient unit: {e}")
+        return None
+
+    values = dict(line.split('=', 1) for line in properties.splitlines() if '=' in line)
+    cgroup = values.get('ControlGroup', '')
+    main_pid = int(values.get('MainPID') or 0)
+    if main_pid:
+        # Flatpak moves itself into its own app-flatpak-*.scope, so follow the launched
+        # process to wherever it ended up rather than trusting the unit's cgroup
+        cgroup = process_cgroup(main_pid) or cgroup
+
+    if not cgroup:
+        print(f"Warning: Could not find the cgroup of {unit}")
+        return None
+
+    scope = ObsScope(unit, CGROUP_ROOT + cgroup)
+    if not scope.is_running():
+        print("Warning: OBS exited right after starting")
+        return None
+    print(f"OBS started by script in {cgroup} (PID: {scope.pid})")
+    return scope
+
+def stop_obs_scoped(scope, timeout=3):
+    """Stops every process in the OBS cgroup, gracefully first."""
+    if not scope.is_running():
+        print("OBS process is no longer running")
+        return
+    print(f"Stopping OBS in {scope.unit}")
+    scope.signal(signal.SIGTERM)
+    if scope.wait(timeout):
+        print("OBS terminated successfully")
+    else:
+        print(f"OBS in {scope.unit} did not terminate gracefully, killing its cgroup.")
+        scope.kill()
+
+def start_obs(obs_path, detach=False, extra_args=(), replay_buffer=True):
+    """Starts OBS and returns the OBS process object.
+
+    `extra_args` are appended to the OBS command line (e.g. --profile / --collection).
+    """
     print("Starting OBS...")
     
     # Clean up sentinel file to prevent shutdown warnings (OBS 32.0+ compatibility)
     cleanup_obs_sentinel()
     
     try:
-        # Handle Flatpak commands properly by splitting the command
-        if obs_path.startswith('flatpak run'):
-            command = shlex.split(obs_path) + [
-                '--startreplaybuffer',
-                '--minimize-to-tray'
-            ]
-        else:
-            command = [
-                obs_path,
-                '--startreplaybuffer',
-                '--minimize-to-tray'
-            ]
+        command = obs_command(obs_path, extra_args, replay_buffer)
         
+        if detach:
+            command = detached_command(command)
+
         # Start the process
         subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
         
@@ -260,135 +640,1224 @@ def stop_obs(obs_process):
         print(f"Error stopping OBS process: {e}")
 
 
+class GameMatcher:
+    """Matches process info against the whitelist in a single pass over the process table."""
+
+    def __init__(self, whitelisted_games):
+        self.games = list(whitelisted_games)
+        self.targets = [game.lower() for game in self.games]
+
+    def match_info(self, info):
+        """Returns the index of the first whitelisted game matching a process info dict, or None."""
+        name = (info.get('name') or "").lower()
+        cmd = info.get('cmdline') or []
+        cmdline_str = None
+        for index, target in enumerate(self.targets):
+            if target in name:
+                return index
+            if cmdline_str is None:
+                # Same cleaning as is_process_running, built lazily
+                args = [arg for arg in cmd if arg.strip()]
+                cmdline_str = " ".join(args).lower().replace("\\", "/")
+            if target in cmdline_str:
+                return index
+        return None
+
+    def find_running_game(self, process_infos):
+        """Returns (game, pid) for the highest-priority running whitelisted game, or (None, None)."""
+        best_index = None
+        best_pid = None
+        for info in process_infos:
+            index = self.match_info(info)
+            if index is None:
+                continue
+            if best_index is None or index < best_index:
+                best_index = index
+                best_pid = info.get('pid')
+                if index == 0:
+                    break
+        if best_index is None:
+            return None, None
+        return self.games[best_index], best_pid
+
+def iter_process_info():
+    """Yields pid/ppid/name/cmdline info dicts for all running processes."""
+    for proc in psutil.process_iter(['pid', 'ppid', 'name', 'cmdline']):
+        yield proc.info
+
+def process_tree_pids(root_pid, process_infos):
+    """Returns the pids of `root_pid` and all its descendants in a process table snapshot."""
+    children = {}
+    for info in process_infos:
+        children.setdefault(info.get('ppid'), []).append(info.get('pid'))
+
+    pids = []
+    pending = [root_pid]
+    seen = set()
+    while pending:
+        pid = pending.pop()
+        if pid in seen:
+            continue
+        seen.add(pid)
+        pids.append(pid)
+        pending.extend(children.get(pid, []))
+    return pids
+
+def get_l3_groups(cpus):
+    """Returns the sets of CPUs in `cpus` that share an L3 cache (one set per CCX/die)."""
+    groups = []
+    for cpu in sorted(cpus):
+        cache_dir = f"/sys/devices/system/cpu/cpu{cpu}/cache"
+        try:
+            for index in os.listdir(cache_dir):
+                with open(os.path.join(cache_dir, index, 'level'), 'r') as f:
+                    if f.read().strip() != '3':
+                        continue
+                with open(os.path.join(cache_dir, index, 'shared_cpu_list'), 'r') as f:
+                    group = frozenset(parse_cpu_list(f.read().strip())) & set(cpus)
+                if group and group not in groups:
+                    groups.append(group)
+                break
+        except (IOError, OSError, ValueError):
+            continue
+    return groups
+
+def resolve_placement_cpus(policy, available_cpus):
+    """Returns (game_cpus, obs_cpus) for a placement policy, limited to `available_cpus`.
+
+    With "separate_l3" OBS gets every CPU outside the L3 domains the game runs on; if the game
+    has no explicit core set it is given the first L3 domain.
+    """
+    game_cpus = parse_cpu_list(policy['game_cpus']) & available_cpus if policy.get('game_cpus') else None
+    obs_cpus = parse_cpu_list(policy['obs_cpus']) & available_cpus if policy.get('obs_cpus') else None
+
+    if policy.get('separate_l3'):
+        groups = get_l3_groups(available_cpus)
+        if len(groups) < 2:
+            print("Warning: separate_l3 requested but only one L3 domain was found, ignoring it.")
+        else:
+            if not game_cpus:
+                game_cpus = set(groups[0])
+            game_domains = set().union(*(group for group in groups if group & game_cpus))
+            obs_cpus = (obs_cpus or available_cpus) - game_domains
+            if not obs_cpus:
+                print("Warning: the game's L3 domains cover every CPU, OBS keeps its default cores.")
+                obs_cpus = None
+
+    return game_cpus or None, obs_cpus or None
+
+class ProcessPlacement:
+    """Applies a core set, nice value and I/O priority to every thread of a process tree.
+
+    Threads are tracked by tid so new ones are picked up on later calls without touching
+    the ones already placed. CPU time of the tree is tallied along the way.
+    """
+
+    def __init__(self, label, cpus=None, nice=None, ioprio=None):
+        self.label = label
+        self.cpus = cpus
+        self.nice = nice
+        self.ioprio = ioprio
+        self.placed_tids = set()
+        self.warned = False
+        self.processes = {}
+        self.cpu_seconds = {}
+
+    def has_policy(self):
+        return self.cpus is not None or self.nice is not None or self.ioprio is not None
+
+    def apply(self, pids):
+        for pid in pids:
+            proc = self.processes.get(pid)
+            try:
+                if proc is None:
+                    proc = self.processes[pid] = psutil.Process(pid)
+                cpu = proc.cpu_times()
+                self.cpu_seconds[pid] = cpu.user + cpu.system
+            except psutil.Error:
+                self.processes.pop(pid, None)
+                continue
+
+            if not self.has_policy():
+                continue
+            try:
+                tids = os.listdir(f"/proc/{pid}/task")
+            except OSError:
+                continue
+            for tid in map(int, tids):
+                if tid not in self.placed_tids:
+                    self.placed_tids.add(tid)
+                    self._place_thread(tid)
+
+    def _place_thread(self, tid):
+        # On Linux affinity, nice and ioprio are all per-thread when addressed by tid
+        try:
+            if self.cpus is not None:
+                os.sched_setaffinity(tid, self.cpus)
+            if self.nice is not None:
+                os.setpriority(os.PRIO_PROCESS, tid, int(self.nice))
+            if self.ioprio == 'idle':
+                psutil.Process(tid).ionice(psutil.IOPRIO_CLASS_IDLE)
+            elif self.ioprio is not None:
+                psutil.Process(tid).ionice(psutil.IOPRIO_CLASS_BE, int(self.ioprio))
+        except (OSError, psutil.Error) as e:
+            if not self.warned:
+                self.warned = True
+                print(f"Warning: Could not fully apply the {self.label} placement policy: {e}")
+
+    def total_cpu_seconds(self):
+        return sum(self.cpu_seconds.values())
+
+class SessionPlacement:
+    """Places OBS and the game tree according to the game's policy for one session."""
+
+    def __init__(self, policy, available_cpus):
+        game_cpus, obs_cpus = (None, None)
+        if available_cpus:
+            game_cpus, obs_cpus = resolve_placement_cpus(policy, available_cpus)
+        self.obs = ProcessPlacement("OBS", obs_cpus, policy.get('obs_nice'), policy.get('obs_ioprio'))
+        self.game = ProcessPlacement("game", game_cpus, policy.get('game_nice'), policy.get('game_ioprio'))
+        if self.obs.has_policy() or self.game.has_policy():
+            print(f"Placement: game CPUs {sorted(game_cpus) if game_cpus else 'default'}, "
+                  f"OBS CPUs {sorted(obs_cpus) if obs_cpus else 'default'}")
+
+    def apply(self, obs_pid, game_pid, process_infos):
+        if obs_pid is not None:
+            self.obs.apply(process_tree_pids(obs_pid, process_infos))
+        if game_pid is not None:
+            self.game.apply(process_tree_pids(game_pid, process_infos))
+
+    def report(self, game):
+        print(f"Session CPU time for {game}: OBS {self.obs.total_cpu_seconds():.1f} s, "
+              f"game {self.game.total_cpu_seconds():.1f} s")
+
+class LocalObsLauncher:
+    """Starts, tracks and stops a local OBS process for the monitoring loop.
+
+    With use_cgroup, OBS runs in its own transient systemd unit and is tracked and torn
+    down through its cgroup; otherwise the process is found by name after launch.
+    """
+
+    def __init__(self, detach=False, use_cgroup=False, start_replay_buffer=True):
+        self.detach = detach
+        self.use_cgroup = use_cgroup
+        # Off when the replay buffer is sized and started over obs-websocket instead
+        self.start_replay_buffer = start_replay_buffer
+
+    def start(self, obs_path, extra_args=()):
+        if self.use_cgroup:
+            scope = start_obs_scoped(obs_path, extra_args, self.start_replay_buffer)
+            if scope:
+                return scope
+            print("Falling back to an unscoped OBS launch")
+        return start_obs(obs_path, detach=self.detach, extra_args=extra_args,
+                         replay_buffer=self.start_replay_buffer)
+
+    def close(self):
+        pass
+
+    def stop(self, handle):
+        if isinstance(handle, ObsScope):
+            stop_obs_scoped(handle)
+        else:
+            stop_obs(handle)
+
+    def running_elsewhere(self):
+        return is_obs_running()
+
+    def identity(self, handle):
+        """Returns a JSON-serialisable identity of `handle` for the state file."""
+        if isinstance(handle, ObsScope):
+            return {'unit': handle.unit, 'cgroup': handle.cgroup_dir}
+        return process_identity(handle.pid)
+
+    def adopt(self, identity):
+        """Returns a handle for a previously started OBS if it is still alive, None otherwise."""
+        if identity and 'cgroup' in identity:
+            scope = ObsScope(identity['unit'], identity['cgroup'])
+            return scope if scope.is_running() else None
+        proc = find_live_process(identity)
+        if proc and self.is_alive(proc):
+            return proc
+        return None
+
+    def is_alive(self, handle):
+        """Returns True if `handle` is still our running OBS process."""
+        if isinstance(handle, ObsScope):
+            if handle.is_running():
+                return True
+            print("OBS cgroup is empty, OBS has exited")
+            return False
+        try:
+            if handle.is_running():
+                proc_name = handle.name().lower()
+                cmdline = handle.cmdline() or []
+                cmdline_str = ' '.join(cmdline).lower()
+
+                # Check if it's still an OBS process (including Flatpak)
+                is_obs_process = (proc_name == 'obs' or
+                                  'com.obsproject.studio' in cmdline_str or
+                                  'obs' in proc_name)
+
+                if is_obs_process:
+                    return True
+                # Process changed, no longer OBS
+                print("Tracked process is no longer OBS")
+            else:
+                # Process is no longer running
+                print("Tracked OBS process is no longer running")
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            # Process is gone or inaccessible
+            print("Tracked OBS process is gone")
+        return False
+
+class RemoteObsHandle:
+    """A replay buffer started by this service on a remote OBS. There is no local process."""
+    pid = None
+
+    def __init__(self, started):
+        self.started = started
+
+class RemoteObsLauncher:
+    """Controls the replay buffer of an OBS running on another machine via obs-websocket.
+
+    Used instead of LocalObsLauncher on rigs that record on a dedicated encoding PC. A
+    background thread keeps the connection open (reconnecting as needed), so starting and
+    stopping the replay buffer doesn't pay for a new handshake.
+    """
+
+    def __init__(self, obs_ws, reconnect_interval=REMOTE_RECONNECT_INTERVAL):
+        self.obs_ws = obs_ws
+        self.reconnect_interval = reconnect_interval
+        self.endpoint = f"{obs_ws.host}:{obs_ws.port}"
+        self.stop_event = threading.Event()
+        self.connected = False
+        self.thread = None
+
+    def start_connection(self):
+        """Starts the thread that keeps the connection to the remote OBS alive."""
+        self.thread = threading.Thread(target=self._keep_connected, name="remote-obs", daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.stop_event.set()
+        self.obs_ws.close()
+
+    def _keep_connected(self):
+        while True:
+            try:
+                if self.obs_ws.is_connected():
+                    # Cheap request that notices a dead connection before a real command does
+                    self.obs_ws.request('GetVersion')
+                else:
+                    self.obs_ws.connect()
+                if not self.connected:
+                    print(f"Connected to remote OBS at {self.endpoint}")
+                self.connected = True
+            except ObsWebSocketError as e:
+                if self.connected:
+                    print(f"Lost connection to remote OBS: {e}")
+                self.connected = False
+            if self.stop_event.wait(self.reconnect_interval):
+                return
+
+    def _replay_buffer_active(self):
+        return self.obs_ws.request('GetReplayBufferStatus').get('outputActive', False)
+
+    def start(self, obs_path, extra_args=()):
+        """Starts the remote replay buffer. obs_path and extra_args only apply to local launches."""
+        try:
+            self.obs_ws.request('StartReplayBuffer')
+        except ObsWebSocketError as e:
+            print(f"Error: Could not start the replay buffer on {self.endpoint}: {e}")
+            return None
+        print(f"Started the replay buffer on {self.endpoint}")
+        return RemoteObsHandle(time.time())
+
+    def stop(self, handle):
+        try:
+            self.obs_ws.request('StopReplayBuffer')
+            print(f"Stopped the replay buffer on {self.endpoint}")
+        except ObsWebSocketError as e:
+            print(f"Error: Could not stop the replay buffer on {self.endpoint}: {e}")
+
+    def running_elsewhere(self):
+        """Returns True if the remote replay buffer was already started by someone else."""
+        try:
+            return self._replay_buffer_active()
+        except ObsWebSocketError:
+            return False
+
+    def identity(self, handle):
+        return {'remote': self.endpoint, 'started': handle.started}
+
+    def adopt(self, identity):
+        if not identity or identity.get('remote') != self.endpoint:
+            return None
+        try:
+            if self._replay_buffer_active():
+                return RemoteObsHandle(identity.get('started'))
+        except ObsWebSocketError:
+            pass
+        return None
+
+    def is_alive(self, handle):
+        """Returns True while the remote replay buffer is active.
+
+        An unreachable remote counts as alive, so a network blip doesn't end the session.
+        """
+        try:
+            if self._replay_buffer_active():
+                return True
+            print("Remote replay buffer is no longer active")
+            return False
+        except ObsWebSocketError as e:
+            print(f"Warning: Could not reach remote OBS, assuming it is still recording: {e}")
+            return True
+
+def object_census():
+    """Counts the objects tracked by the garbage collector, by type name."""
+    return collections.Counter(type(obj).__name__ for obj in gc.get_objects())
+
+class MemoryGuard:
+    """Watches the service's own RSS and reports top allocators when it drifts upwards.
+
+    An object census taken with the baseline lets the first drift name the types that
+    grew; allocation tracing is switched on then, so later drifts also name source lines.
+    """
+
+    def __init__(self, growth_warn_mb=MEMORY_GROWTH_WARN_MB, check_ticks=MEMORY_CHECK_TICKS):
+        self.process = psutil.Process()
+        self.growth_warn = growth_warn_mb * 1024 * 1024
+        self.check_ticks = check_ticks
+        self.ticks = 0
+        self.baseline_rss = None
+        self.census = None
+        self.snapshot = None
+
+    def check(self):
+        """Called once per tick; samples RSS every `check_ticks` ticks."""
+        self.ticks += 1
+        if self.ticks % self.check_ticks:
+            return
+
+        try:
+            rss = self.process.memory_info().rss
+        except psutil.Error:
+            return
+
+        if self.baseline_rss is None:
+            self.baseline_rss = rss
+            self.census = object_census()
+            if tracemalloc.is_tracing():
+                self.snapshot = tracemalloc.take_snapshot()
+            return
+
+        growth = rss - self.baseline_rss
+        if growth < self.growth_warn:
+            return
+
+        print(f"Warning: service memory grew by {growth / 1048576:.1f} MB "
+              f"(RSS now {rss / 1048576:.1f} MB)")
+        census = object_census()
+        print("Object types that grew since the last report:")
+        for name, count in (census - self.census).most_common(10):
+            print(f"  {name}: +{count}")
+        self.census = census
+
+        if self.snapshot is None:
+            # Tracing is only switched on once drift is seen, so a healthy service pays nothing for it
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            self.snapshot = tracemalloc.take_snapshot()
+            print("Started allocation tracing, top allocating lines will be reported on the next drift.")
+        else:
+            snapshot = tracemalloc.take_snapshot()
+            print("Top allocators since the last report:")
+            for stat in snapshot.compare_to(self.snapshot, 'lineno')[:10]:
+                print(f"  {stat}")
+            self.snapshot = snapshot
+        self.baseline_rss = rss
+
+def obs_profile_args(config, game):
+    """Returns the OBS command line arguments selecting the game's profile and scene collection."""
+    settings = config.get('game_profiles', {}).get(game, {})
+    args = []
+    if settings.get('profile'):
+        args += ['--profile', settings['profile']]
+    if settings.get('scene_collection'):
+        args += ['--collection', settings['scene_collection']]
+    return args
+
+class LoadSwitcher:
+    """Switches OBS to a game's lighter output profile while the CPU is saturated.
+
+    A switch happens only after the load stayed above (or, to switch back, well below)
+    the threshold for `sustain_seconds`, and never more often than `min_switch_interval`.
+    """
+
+    def __init__(self, settings, profiles, obs_ws, clock, replay_budget=None):
+        self.threshold = settings.get('cpu_threshold', 90)
+        self.recover_threshold = settings.get('recover_threshold', self.threshold - 20)
+        self.sustain_seconds = settings.get('sustain_seconds', 30)
+        self.min_switch_interval = settings.get('min_switch_interval', 300)
+        self.normal_profile = profiles.get('profile')
+        self.light_profile = profiles.get('light_profile')
+        self.obs_ws = obs_ws
+        self.clock = clock
+        self.replay_budget = replay_budget
+
+        self.on_light = False
+        self.condition_since = None
+        self.last_switch = None
+        # Prime the counter so the first sample covers one tick rather than since boot
+        psutil.cpu_percent(interval=None)
+
+    def sample(self):
+        """Called once per tick during a session."""
+        load = psutil.cpu_percent(interval=None)
+        now = self.clock()
+
+        wants_switch = load < self.recover_threshold if self.on_light else load >= self.threshold
+        if not wants_switch:
+            self.condition_since = None
+            return
+        if self.condition_since is None:
+            self.condition_since = now
+        if now - self.condition_since < self.sustain_seconds:
+            return
+        if self.last_switch is not None and now - self.last_switch < self.min_switch_interval:
+            return
+
+        target = self.normal_profile if self.on_light else self.light_profile
+        self.last_switch = now
+        self.condition_since = None
+        if self.switch_profile(target):
+            self.on_light = not self.on_light
+            direction = "lighter" if self.on_light else "normal"
+            log_action(f"CPU load {load:.0f}%, switched OBS to the {direction} profile '{target}'")
+
+    def switch_profile(self, profile):
+        """Switches the OBS profile over obs-websocket. Returns True on success."""
+        # OBS refuses profile changes while an output is active, so the replay buffer is
+        # restarted around the switch (footage buffered until then is dropped)
+        try:
+            self.obs_ws.request('StopReplayBuffer')
+            try:
+                if self.replay_budget:
+                    # The budgeted limits stay with the session, not with the profile being left
+                    self.replay_budget.restore()
+                self.obs_ws.request('SetCurrentProfile', {'profileName': profile})
+            finally:
+                if self.replay_budget:
+                    self.replay_budget.profile_changed()
+                self.obs_ws.request('StartReplayBuffer')
+            return True
+        except ObsWebSocketError as e:
+            print(f"Error switching OBS to profile '{profile}': {e}")
+            return False
+
+def read_memory_pressure():
+    """Returns the "some" avg10 memory pressure (percent of time stalled), or None without PSI."""
+    try:
+        with open(PSI_MEMORY_PATH, 'r') as f:
+            for line in f:
+                if line.startswith('some '):
+                    fields = dict(field.split('=', 1) for field in line.split()[1:])
+                    return float(fields['avg10'])
+    except (OSError, KeyError, ValueError):
+        pass
+    return None
+
+def tree_rss(pid):
+    """Returns the summed RSS in bytes of a process and its descendants."""
+    try:
+        proc = psutil.Process(pid)
+        procs = [proc] + proc.children(recursive=True)
+    except psutil.Error:
+        return 0
+    total = 0
+    for child in procs:
+        try:
+            total += child.memory_info().rss
+        except psutil.Error:
+            pass
+    return total
+
+class ReplayBudget:
+    """Sizes the replay buffer to the memory left over by the game, and shrinks it under pressure.
+
+    OBS is launched without --startreplaybuffer; once its WebSocket answers, the buffer's
+    memory limit is set in the current profile and the buffer is started. If memory
+    pressure stays high during the session the limit is halved (down to `min_mb`), at most
+    once per `shrink_interval`. Each shrink restarts the buffer, dropping what it held.
+
+    Only the current profile ever holds the budgeted limits: when the load switcher changes
+    profiles, the one being left gets its own limits back and the budget is applied to the
+    new one. The current profile's limits are put back when the session ends.
+    """
+
+    def __init__(self, settings, obs_ws, clock, expected_game_mb=None):
+        self.max_mb = settings.get('max_mb', 2048)
+        self.min_mb = settings.get('min_mb', 256)
+        # The profile's own length can't be used as the upper bound, it is overwritten here
+        self.max_seconds = settings.get('max_seconds', 120)
+        self.reserve_mb = settings.get('reserve_mb', 2048)
+        self.fraction = settings.get('fraction', 0.5)
+        self.pressure_threshold = settings.get('pressure_threshold', 10.0)
+        self.shrink_interval = settings.get('shrink_interval', 120)
+        self.startup_timeout = settings.get('startup_timeout', 60)
+        self.expected_game_mb = expected_game_mb
+        self.obs_ws = obs_ws
+        self.clock = clock
+
+        self.created = clock()
+        self.started = False
+        self.profile = None
+        self.section = None
+        # {profile name: {"section", "values"}} with RecRBSize and RecRBTime as they were
+        # before the budget changed them
+        self.originals = {}
+        self.size_mb = None
+        self.bitrate_kbps = None
+        self.last_shrink = None
+
+    def choose_size(self, game_pid):
+        """Returns the buffer size in MB that fits what is left after the game and a reserve."""
+        available_mb = psutil.virtual_memory().available / 1048576
+        game_mb = tree_rss(game_pid) / 1048576 if game_pid else 0
+        # Games keep growing after launch, hold back what they used at peak in earlier sessions
+        growth_mb = max(0, (self.expected_game_mb or 0) - game_mb)
+        headroom_mb = available_mb - self.reserve_mb - growth_mb
+        size_mb = int(max(self.min_mb, min(self.max_mb, headroom_mb * self.fraction)))
+        log_action(f"Replay buffer budget: {size_mb} MB (available {available_mb:.0f} MB, "
+                   f"game {game_mb:.0f} MB, expected growth {growth_mb:.0f} MB)")
+        return size_mb
+
+    def get_parameter(self, section, name):
+        return self.obs_ws.request('GetProfileParameter', {
+            'parameterCategory': section, 'parameterName': name}).get('parameterValue')
+
+    def set_parameter(self, name, value):
+        self.obs_ws.request('SetProfileParameter', {
+            'parameterCategory': self.section, 'parameterName': name, 'parameterValue': str(value)})
+
+    def read_profile(self):
+        """Reads the current profile's output mode, buffer limits and, in simple mode, bitrate."""
+        self.profile = self.obs_ws.request('GetProfileList').get('currentProfileName') or ""
+        mode = self.get_parameter('Output', 'Mode')
+        self.section = 'AdvOut' if mode == 'Advanced' else 'SimpleOutput'
+        if self.profile not in self.originals:
+            self.originals[self.profile] = {
+                'section': self.section,
+                'values': {name: self.get_parameter(self.section, name) for name in ('RecRBSize', 'RecRBTime')}}
+        self.bitrate_kbps = None
+        if self.section == 'SimpleOutput':
+            # Advanced mode keeps bitrates in the encoder settings, out of reach of the WebSocket
+            video = self.get_parameter('SimpleOutput', 'VBitrate')
+            audio = self.get_parameter('SimpleOutput', 'ABitrate')
+            if video:
+                self.bitrate_kbps = int(video) + int(audio or 0)
+
+    def set_size(self, size_mb):
+        """Sets the buffer's memory limit and its length (shortened where the bitrate is known)."""
+        self.set_parameter('RecRBSize', size_mb)
+        self.size_mb = size_mb
+        seconds = self.max_seconds
+        if self.bitrate_kbps:
+            # Simple mode ignores the size limit with "same as stream" quality, so cap the length too
+            seconds = max(1, min(self.max_seconds, int(size_mb * 8192 / self.bitrate_kbps)))
+        self.set_parameter('RecRBTime', seconds)
+        if self.bitrate_kbps:
+            return f"{size_mb} MB, {seconds} s at {self.bitrate_kbps} kbps"
+        return f"{size_mb} MB, up to {seconds} s"
+
+    def restore(self):
+        """Writes the current profile's original buffer limits back, while OBS is still running."""
+        original = self.originals.pop(self.profile, None)
+        if not original:
+            return
+        try:
+            for name, value in original['values'].items():
+                if value is not None:
+                    self.obs_ws.request('SetProfileParameter', {
+                        'parameterCategory': original['section'], 'parameterName': name,
+                        'parameterValue': str(value)})
+        except ObsWebSocketError as e:
+            log_action(f"Could not restore the replay buffer settings {original['values']} "
+                       f"in the OBS profile '{self.profile}': {e}")
+
+    def profile_changed(self):
+        """Applies the session's budget to the profile OBS was just switched to."""
+        if self.size_mb is None:
+            # Not started yet, start() budgets whichever profile is current then
+            return
+        try:
+            self.read_profile()
+            description = self.set_size(self.size_mb)
+        except (ObsWebSocketError, ValueError) as e:
+            log_action(f"Could not apply the replay buffer budget to the new OBS profile: {e}")
+            return
+        log_action(f"Applied the replay buffer budget to profile '{self.profile}': {description}")
+
+    def state(self):
+        """Returns what has to survive a service restart, see load_state()."""
+        # Copied, so persist_state() notices when they change
+        originals = {name: {'section': entry['section'], 'values': dict(entry['values'])}
+                     for name, entry in self.originals.items()}
+        return {'profile': self.profile, 'section': self.section, 'originals': originals,
+                'size_mb': self.size_mb, 'bitrate_kbps': self.bitrate_kbps}
+
+    def load_state(self, state):
+        """Takes over the budget of an adopted session, whose replay buffer is already running."""
+        self.started = True
+        if not state:
+            return
+        self.profile = state.get('profile')
+        self.section = state.get('section')
+        self.originals = state.get('originals') or {}
+        self.size_mb = state.get('size_mb')
+        self.bitrate_kbps = state.get('bitrate_kbps')
+
+    def sample(self, game_pid):
+        """Called once per tick during a session."""
+        if not self.started:
+            self.start(game_pid)
+            return
+
+        pressure = read_memory_pressure()
+        if pressure is None or pressure < self.pressure_threshold or self.size_mb is None:
+            return
+        now = self.clock()
+        if self.size_mb <= self.min_mb or (self.last_shrink is not None and now - self.last_shrink < self.shrink_interval):
+            return
+        self.last_shrink = now
+        new_size = max(self.min_mb, self.size_mb // 2)
+        try:
+            # The limit only applies when the buffer starts, so it is restarted around the change
+            self.obs_ws.request('StopReplayBuffer')
+            try:
+                description = self.set_size(new_size)
+            finally:
+                self.obs_ws.request('StartReplayBuffer')
+        except ObsWebSocketError as e:
+            print(f"Error shrinking the replay buffer: {e}")
+            return
+        log_action(f"Memory pressure {pressure:.0f}%, shrank the replay buffer to {description}")
+
+    def start(self, game_pid):
+        """Applies the budget and starts the replay buffer once OBS's WebSocket is up."""
+        try:
+            self.read_profile()
+            description = self.set_size(self.choose_size(game_pid))
+            self.obs_ws.request('StartReplayBuffer')
+            print(f"Started the replay buffer with {description}")
+        except (ObsWebSocketError, ValueError) as e:
+            if self.clock() - self.created < self.startup_timeout:
+                # OBS is most likely still starting up
+                return
+            log_action(f"Could not start the replay buffer over obs-websocket: {e}")
+        self.started = True
+
+class Monitor:
+    """Holds the monitoring loop state so it can be driven one tick at a time.
+
+    The process source, OBS launcher, clock and action log are injectable, which lets the
+    loop be driven with simulated process tables (e.g. for soak runs or recorded timelines).
+    With live=False nothing outside those is touched: no placement, CPU accounting or
+    OBS profile switching is done for the (possibly recorded) PIDs.
+    """
+
+    def __init__(self, config, process_source=iter_process_info, launcher=None,
+                 config_path=CONFIG_PATH, clock=time.monotonic, state_path=None,
+                 log=log_action, live=True):
+        self.config = config
+        self.log = log
+        self.live = live
+        self.process_source = process_source
+        self.launcher = launcher or LocalObsLauncher()
+        self.config_path = config_path
+        self.clock = clock
+        self.state_path = state_path
+        self.saved_state = None
+
+        # Event-driven detection: the X11 watcher reports game windows here and wakes the loop
+        self.use_window_events = False
+        self.window_games = {}
+        self.window_lock = threading.Lock()
+        self.wake_event = threading.Event()
+
+        self.obs_path = config.get('obs_path', detect_obs_path())
+        self.whitelisted_games = config.get('whitelisted_games', [])
+        self.matcher = GameMatcher(self.whitelisted_games)
+        self.memory_guard = MemoryGuard(config.get('memory_warn_mb', MEMORY_GROWTH_WARN_MB))
+
+        self.script_obs_process = None
+        self.last_running_game = None
+        self.game_pid = None
+        self.session_placement = None
+        self.load_switcher = None
+        self.replay_budgeting = False
+        self.replay_budget = None
+        self.telemetry = None
+        self.telemetry_ticks = 0
+        self.session_store = None
+        self.session_id = None
+        self.session_started = None
+        self.clip_pipeline = None
+        self.last_mod_time = config_signature(config_path) if config_path else None
+
+        # Speculative OBS starts on launcher activity, see prelaunch.py
+        self.predictor = None
+        self.speculative_game = None
+        self.configure_prelaunch()
+
+    def configure_prelaunch(self):
+        if not self.config.get('prelaunch', {}).get('enabled'):
+            self.predictor = None
+            if self.speculative_game:
+                # Without the predictor nothing would ever expire the wait, so treat the
+                # speculative OBS like any other and stop it unless the game is running
+                print(f"Prelaunch disabled, no longer waiting for {self.speculative_game}")
+                self.speculative_game = None
+            return
+        if self.predictor:
+            self.predictor.update_config(self.whitelisted_games, self.config)
+        else:
+            stats_path = PRELAUNCH_STATS_PATH if self.live else None
+            self.predictor = LaunchPredictor(self.whitelisted_games, self.config, self.clock, stats_path)
+
+    def reload_config(self):
+        """Reloads config.json if it changed. Returns False if the service should stop."""
+        if not self.config_path:
+            return True
+
+        try:
+            current_mod_time = config_signature(self.config_path)
+        except FileNotFoundError:
+            print(f"Error: {self.config_path} was not found during a check. Stopping service.")
+            return False
+
+        if current_mod_time == self.last_mod_time:
+            return True
+
+        print("Configuration file changed, reloading...")
+        self.last_mod_time = current_mod_time
+        new_config = load_config(self.config_path)
+        if new_config:
+            self.config = new_config  # Update the main config object
+            # Reload all config-dependent variables
+            self.obs_path = self.config.get('obs_path', detect_obs_path())
+            new_whitelisted_games = self.config.get('whitelisted_games', [])
+
+            # Only print (and rebuild the matcher) if the list has actually changed
+            if self.whitelisted_games != new_whitelisted_games:
+                if set(self.whitelisted_games) != set(new_whitelisted_games):
+                    print(f"Whitelist updated: {new_whitelisted_games}")
+                self.whitelisted_games = new_whitelisted_games
+                self.matcher = GameMatcher(self.whitelisted_games)
+
+            if not self.whitelisted_games:
+                print("Whitelist is now empty. Stopping service.")
+                return False
+            self.configure_prelaunch()
+        return True
+
+    def tick(self):
+        """Runs one detection pass. Returns False if the service should stop."""
+        if not self.reload_config():
+            return False
+
+        # Check for running games
+        if self.use_window_events:
+            running_game_name, game_pid = self.find_window_game()
+            # The process table is only needed to place the OBS/game trees during a session
+            process_infos = list(self.process_source()) if self.session_placement else []
+        else:
+            process_infos = list(self.process_source())
+            candidates = process_infos
+            if self.predictor:
+                candidates = self.predictor.observe(process_infos)
+            running_game_name, game_pid = self.matcher.find_running_game(candidates)
+        self.game_pid = game_pid
+        game_running = running_game_name is not None
+        if game_running:
+            print(f"Found running game: {running_game_name}")
+
+        # Check if our OBS process is still running
+        script_obs_is_running = False
+        if self.script_obs_process:
+            script_obs_is_running = self.launcher.is_alive(self.script_obs_process)
+            if not script_obs_is_running:
+                self.script_obs_process = None
+                self.end_session()
+                if self.speculative_game:
+                    # OBS was closed while waiting for the game, don't start it again
+                    self.predictor.cancel(self.speculative_game)
+                    self.speculative_game = None
+
+        # Debug output
+        print(f"Game running: {game_running}, OBS running: {script_obs_is_running}")
+
+        if game_running:
+            if self.predictor:
+                self.predictor.game_appeared(running_game_name)
+                if self.speculative_game:
+                    self.predictor.record_hit(self.speculative_game)
+                    self.speculative_game = None
+            if not script_obs_is_running:
+                # Start OBS only if no other instance is running
+                if not self.launcher.running_elsewhere():
+                    self.log(f"{running_game_name} process detected, launching OBS...")
+                    self.script_obs_process = self.launcher.start(self.obs_path, obs_profile_args(self.config, running_game_name))
+                    self.last_running_game = running_game_name
+                    if self.script_obs_process:
+                        self.begin_session(running_game_name)
+                else:
+                    print("OBS is already running (started externally)")
+            if self.session_placement:
+                self.session_placement.apply(self.script_obs_process.pid, game_pid, process_infos)
+            if self.load_switcher:
+                self.load_switcher.sample()
+            if self.replay_budget:
+                self.replay_budget.sample(game_pid)
+            if self.telemetry:
+                self.sample_telemetry(game_pid, process_infos)
+        elif script_obs_is_running and self.speculative_game and not self.predictor.expired(self.speculative_game):
+            print(f"Waiting for {self.speculative_game} to start")
+        elif script_obs_is_running:
+            # Game is not running, stop our instance of OBS
+            if self.speculative_game:
+                self.log(f"{self.speculative_game} did not start after its launcher, closing OBS...")
+                self.predictor.record_miss(self.speculative_game)
+                self.speculative_game = None
+            elif self.last_running_game:
+                self.log(f"{self.last_running_game} process no longer present, closing OBS...")
+            else:
+                self.log("Whitelisted game process no longer present, closing OBS...")
+            self.close_obs()
+            self.last_running_game = None
+        elif self.predictor:
+            predicted_game = self.predictor.due()
+            if predicted_game and not self.launcher.running_elsewhere():
+                self.log(f"{predicted_game} is being launched, starting OBS early...")
+                self.script_obs_process = self.launcher.start(self.obs_path, obs_profile_args(self.config, predicted_game))
+                if self.script_obs_process:
+                    self.last_running_game = predicted_game
+                    self.speculative_game = predicted_game
+                    self.begin_session(predicted_game)
+                else:
+                    self.predictor.cancel(predicted_game)
+
+        self.persist_state()
+        self.memory_guard.check()
+        return True
+
+    def on_window_pid(self, pid):
+        """Called by the window watcher thread with the PID of a new or focused window."""
+        try:
+            proc = psutil.Process(pid)
+            info = {'pid': pid, 'name': proc.name(), 'cmdline': proc.cmdline()}
+        except psutil.Error:
+            return
+        index = self.matcher.match_info(info)
+        if index is None:
+            return
+        with self.window_lock:
+            self.window_games[pid] = (self.matcher.games[index], proc)
+        # Run the next tick right away instead of waiting for the poll interval
+        self.wake_event.set()
+
+    def on_window_events_lost(self):
+        """Called by the window watcher thread when it stops, to fall back to polling."""
+        with self.window_lock:
+            self.use_window_events = False
+            self.window_games.clear()
+        print("Window events are gone, scanning the process table instead.")
+        self.wake_event.set()
+
+    def find_window_game(self):
+        """Returns (game, pid) for the highest-priority game reported by the window watcher.
+
+        Liveness is checked on the tracked processes only, without scanning /proc.
+        """
+        best = (None, None)
+        best_index = None
+        with self.window_lock:
+            for pid, (game, proc) in list(self.window_games.items()):
+                if game not in self.whitelisted_games or not proc.is_running():
+                    del self.window_games[pid]
+                    continue
+                index = self.whitelisted_games.index(game)
+                if best_index is None or index < best_index:
+                    best, best_index = (game, pid), index
+        return best
+
+    def wait(self, timeout):
+        """Sleeps until the next tick is due or a window event arrives."""
+        self.wake_event.wait(timeout)
+        self.wake_event.clear()
+
+    def obs_pids(self, process_infos):
+        """Returns the PIDs making up our OBS instance."""
+        if isinstance(self.script_obs_process, ObsScope):
+            return self.script_obs_process.pids()
+        return process_tree_pids(self.script_obs_process.pid, process_infos)
+
+    def sample_telemetry(self, game_pid, process_infos):
+        """Samples OBS and game resource use every TELEMETRY_TICKS ticks."""
+        self.telemetry_ticks += 1
+        if self.telemetry_ticks % TELEMETRY_TICKS != 1:
+            return
+        game_pids = process_tree_pids(game_pid, process_infos) if game_pid is not None else []
+        self.telemetry.sample(self.obs_pids(process_infos), game_pids)
+
+    def begin_session(self, game, session_id=None, started=None):
+        """Called once OBS has been started (or adopted after a restart) for `game`."""
+        self.session_id = session_id or uuid.uuid4().hex
+        self.session_started = started or time.time()
+        if not self.live:
+            return
+        if self.script_obs_process.pid is not None:
+            # Placement, telemetry and load switching only concern an OBS on this machine
+            placement = self.config.get('placement', {})
+            policy = placement.get(game, placement.get('default', {}))
+            self.session_placement = SessionPlacement(policy, ORIGINAL_AFFINITY)
+            if platform.system() == "Linux":
+                self.telemetry = SessionTelemetry()
+                self.telemetry_ticks = 0
+
+            if self.replay_budgeting:
+                expected_game_mb = self.session_store.peak_game_rss(game) if self.session_store else None
+                self.replay_budget = ReplayBudget(self.config.get('replay_budget', {}),
+                                                  ObsWebSocket.from_config(self.config), self.clock, expected_game_mb)
+            profiles = self.config.get('game_profiles', {}).get(game, {})
+            switching = self.config.get('load_switching', {})
+            if switching.get('enabled') and profiles.get('profile') and profiles.get('light_profile'):
+                self.load_switcher = LoadSwitcher(switching, profiles, ObsWebSocket.from_config(self.config),
+                                                  self.clock, self.replay_budget)
+        if self.clip_pipeline:
+            self.clip_pipeline.set_session(game, self.session_id)
+
+    def close_obs(self):
+        """Stops our OBS instance and ends its session."""
+        if self.replay_budget:
+            # Has to go over the WebSocket before OBS exits
+            self.replay_budget.restore()
+        self.launcher.stop(self.script_obs_process)
+        self.script_obs_process = None
+        self.end_session()
+
+    def end_session(self):
+        """Called once the OBS instance started for a game is gone."""
+        if self.session_placement:
+            self.session_placement.report(self.last_running_game)
+            self.session_placement = None
+        if self.load_switcher:
+            self.load_switcher.obs_ws.close()
+            self.load_switcher = None
+        if self.replay_budget:
+            # Nothing left to do if close_obs already did it; fails if OBS exited on its own
+            self.replay_budget.restore()
+            self.replay_budget.obs_ws.close()
+            self.replay_budget = None
+        if self.telemetry:
+            summary = self.telemetry.summary()
+            self.telemetry.close()
+            self.telemetry = None
+            obs_stats = summary['obs']
+            if 'cpu_percent' in obs_stats and 'rss_mb' in obs_stats:
+                print(f"OBS overhead for {self.last_running_game}: "
+                      f"CPU avg {obs_stats['cpu_percent']['avg']:.1f}% (p95 {obs_stats['cpu_percent']['p95']:.1f}%), "
+                      f"RSS avg {obs_stats['rss_mb']['avg']:.0f} MB")
+            if self.session_store:
+                self.session_store.record(self.session_id, self.last_running_game,
+                                          self.session_started, time.time(), summary)
+        if self.clip_pipeline:
+            self.clip_pipeline.session_ended(self.session_id)
+        self.session_id = None
+        self.session_started = None
+
+    def shutdown(self):
+        """Stops OBS if this service started it."""
+        if self.predictor:
+            self.predictor.report()
+        if self.script_obs_process:
+            self.close_obs()
+            self.last_running_game = None
+        self.persist_state()
+
+    def current_state(self):
+        """Returns the session state to persist, or None when no session is active."""
+        if not self.script_obs_process:
+            return None
+        game = None
+        if self.game_pid is not None:
+            game = process_identity(self.game_pid)
+        return {
+            'obs': self.launcher.identity(self.script_obs_process),
+            'game': game,
+            'game_name': self.last_running_game,
+            'session_id': self.session_id,
+            'session_started': self.session_started,
+            'replay_budget': self.replay_budget.state() if self.replay_budget else None,
+        }
+
+    def persist_state(self):
+        """Writes the session state if it changed since the last write."""
+        if not self.state_path:
+            return
+        state = self.current_state()
+        if state != self.saved_state:
+            save_state(self.state_path, state)
+            self.saved_state = state
+
+    def restore_state(self):
+        """Adopts the OBS instance recorded by a previous run of the service, if it is still alive.
+
+        Recording continues uninterrupted: the adopted OBS is tracked (and eventually stopped)
+        exactly as if this run had started it.
+        """
+        if not self.state_path:
+            return False
+        state = load_state(self.state_path)
+        if not state:
+            return False
+
+        handle = self.launcher.adopt(state.get('obs'))
+        if handle is None:
+            print("Previous OBS session is gone, starting fresh.")
+            save_state(self.state_path, None)
+            return False
+
+        self.script_obs_process = handle
+        self.last_running_game = state.get('game_name')
+        game = find_live_process(state.get('game'))
+        self.game_pid = game.pid if game else None
+        if game and self.last_running_game:
+            with self.window_lock:
+                self.window_games[game.pid] = (self.last_running_game, game)
+        self.begin_session(self.last_running_game, state.get('session_id'), state.get('session_started'))
+        if self.replay_budget:
+            # The adopted OBS already has its replay buffer running, with the budget applied
+            self.replay_budget.load_state(state.get('replay_budget'))
+        self.saved_state = state
+        obs = state['obs']
+        print(f"Adopted running OBS session for {self.last_running_game} "
+              f"(OBS: {obs.get('pid') or obs.get('unit') or obs.get('remote')})")
+        return True
+
 def main():
     """Main function to run the monitoring loop."""
+    # Clear log file on startup
+    try:
+        open(LOG_PATH, 'w').close()
+    except IOError as e:
+        print(f"Error clearing log file on startup: {e}")
+
     config = load_config()
     if not config:
         return
 
-    try:
-        last_mod_time = os.path.getmtime(CONFIG_PATH)
-    except FileNotFoundError:
+    if not os.path.exists(CONFIG_PATH):
         print(f"Error: {CONFIG_PATH} not found on startup. Exiting.")
         return
 
-    obs_path = config.get('obs_path', detect_obs_path())
-    whitelisted_games = config.get('whitelisted_games', [])
-
-    if not whitelisted_games:
+    if not config.get('whitelisted_games', []):
         print("No whitelisted games found in config.json. Exiting.")
         return
 
+    demoted = apply_service_scheduling(config)
+    if config.get('obs_backend') == 'remote':
+        launcher = RemoteObsLauncher(ObsWebSocket.from_config(config, key='remote_obs'))
+        launcher.start_connection()
+        budgeting = False
+    else:
+        use_cgroup = config.get('obs_cgroup', False) and cgroup_launch_available()
+        budgeting = config.get('replay_budget', {}).get('enabled', False)
+        launcher = LocalObsLauncher(detach=demoted, use_cgroup=use_cgroup, start_replay_buffer=not budgeting)
+    monitor = Monitor(config, launcher=launcher, state_path=STATE_PATH)
+    monitor.replay_budgeting = budgeting
+
+    if platform.system() == "Linux":
+        monitor.session_store = SessionStore(DB_PATH)
+
+    clip_index = None
+    clip_pipeline = None
+    if config.get('clip_pipeline', {}).get('enabled'):
+        clip_index = ClipIndex(DB_PATH)
+        clip_pipeline = ClipPipeline.from_config(config, on_clip=clip_index.add)
+    if clip_pipeline and clip_pipeline.start():
+        monitor.clip_pipeline = clip_pipeline
+        clip_pipeline.coalescer = ClipCoalescer.from_config(config, clip_index, clip_pipeline.output_dir)
+
+        def catch_up():
+            # Settle merges interrupted by a crash before the index is compared with the folders
+            if clip_pipeline.coalescer:
+                clip_pipeline.coalescer.recover()
+            clip_index.reconcile(clip_pipeline.output_dir)
+
+        # Catch up on clips saved while the service wasn't running, at worker priority
+        clip_pipeline.executor.submit(catch_up)
+
+    monitor.restore_state()
+
+    gsi_receiver = None
+    if config.get('gsi', {}).get('enabled'):
+        # The remote backend's connection is already kept open, share it
+        obs_ws = launcher.obs_ws if isinstance(launcher, RemoteObsLauncher) else ObsWebSocket.from_config(config)
+        gsi_receiver = GsiReceiver.from_config(config, obs_ws)
+        if not gsi_receiver.start():
+            gsi_receiver = None
+
+    if config.get('detection_backend') == 'x11':
+        if not x11_available():
+            print("Warning: X11 detection requested but python-xlib or $DISPLAY is missing, polling instead.")
+        else:
+            window_watcher = ActiveWindowWatcher(monitor.on_window_pid, monitor.on_window_events_lost)
+            # Under the lock so a watcher thread that dies right away can't be overridden
+            with monitor.window_lock:
+                monitor.use_window_events = window_watcher.start()
+
     print("Starting monitoring...")
-    print(f"Whitelisted games: {whitelisted_games}")
-    print(f"OBS path: {obs_path}")
+    print(f"Whitelisted games: {monitor.whitelisted_games}")
+    if isinstance(launcher, RemoteObsLauncher):
+        print(f"Remote OBS: {launcher.endpoint}")
+    else:
+        print(f"OBS path: {monitor.obs_path}")
 
-    script_obs_process = None
-    last_running_game = None
+    # The matcher is built, so detection is armed from the first tick on
+    sd_notify(f"READY=1\nSTATUS=Watching {len(monitor.whitelisted_games)} games")
+    use_watchdog = watchdog_enabled()
 
     try:
         while True:
             try:
-                # Check for configuration changes
-                try:
-                    current_mod_time = os.path.getmtime(CONFIG_PATH)
-                    if current_mod_time != last_mod_time:
-                        print("Configuration file changed, reloading...")
-                        last_mod_time = current_mod_time
-                        new_config = load_config()
-                        if new_config:
-                            config = new_config # Update the main config object
-                            # Reload all config-dependent variables
-                            obs_path = config.get('obs_path', detect_obs_path())
-                            new_whitelisted_games = config.get('whitelisted_games', [])
-
-                            # Only print if the list has actually changed
-                            if set(whitelisted_games) != set(new_whitelisted_games):
-                                print(f"Whitelist updated: {new_whitelisted_games}")
-                                whitelisted_games = new_whitelisted_games
-                            
-                            if not whitelisted_games:
-                                print("Whitelist is now empty. Stopping service.")
-                                if script_obs_process:
-                                    stop_obs(script_obs_process)
-                                    script_obs_process = None
-                                return # Exit the main function, stopping the script
-                except FileNotFoundError:
-                    print(f"Error: {CONFIG_PATH} was not found during a check. Stopping service.")
-                    if script_obs_process:
-                        stop_obs(script_obs_process)
-                    return # Exit
-
-                # Check for running games
-                game_running = False
-                running_game_name = None
-                for game in whitelisted_games:
-                    if is_process_running(game):
-                        print(f"Found running game: {game}")
-                        running_game_name = game
-                        game_running = True
-                        break
-
-                # Check if our OBS process is still running
-                script_obs_is_running = False
-                if script_obs_process:
-                    try:
-                        if script_obs_process.is_running():
-                            proc_name = script_obs_process.name().lower()
-                            cmdline = script_obs_process.cmdline() or []
-                            cmdline_str = ' '.join(cmdline).lower()
-                            
-                            # Check if it's still an OBS process (including Flatpak)
-                            is_obs_process = (proc_name == 'obs' or 
-                                             'com.obsproject.studio' in cmdline_str or
-                                             'obs' in proc_name)
-                            
-                            if is_obs_process:
-                                script_obs_is_running = True
-                            else:
-                                # Process changed, no longer OBS
-                                print("Tracked process is no longer OBS")
-                                script_obs_process = None
-                        else:
-                            # Process is no longer running
-                            print("Tracked OBS process is no longer running")
-                            script_obs_process = None
-                    except (psutil.NoSuchProcess, psutil.AccessDenied):
-                        # Process is gone or inaccessible
-                        print("Tracked OBS process is gone")
-                        script_obs_process = None
-
-                # Debug output
-                print(f"Game running: {game_running}, OBS running: {script_obs_is_running}")
-
-                if game_running:
-                    if not script_obs_is_running:
-                        # Start OBS only if no other instance is running
-                        if not is_obs_running():
-                            log_action(f"{running_game_name} process detected, launching OBS...")
-                            script_obs_process = start_obs(obs_path)
-                            last_running_game = running_game_name
-                        else:
-                            print("OBS is already running (started externally)")
-                elif script_obs_is_running:
-                    # Game is not running, stop our instance of OBS
-                    if last_running_game:
-                        log_action(f"{last_running_game} process no longer present, closing OBS...")
-                    else:
-                        log_action("Whitelisted game process no longer present, closing OBS...")
-                    stop_obs(script_obs_process)
-                    script_obs_process = None
-                    last_running_game = None
-
+                if not monitor.tick():
+                    monitor.shutdown()
+                    break # Stop monitoring, the service exits below
+                if use_watchdog:
+                    # Only completed ticks count as healthy, a loop stuck or failing gets restarted
+                    sd_notify("WATCHDOG=1")
             except Exception as e:
                 print(f"An error occurred in the monitoring loop: {e}")
-            
-            time.sleep(POLL_INTERVAL)
+
+            monitor.wait(POLL_INTERVAL)
     except KeyboardInterrupt:
         print("\nStopping monitoring.")
         # On exit, only stop OBS if we started it
-        if script_obs_process:
-            stop_obs(script_obs_process)
+        monitor.shutdown()
+
+    sd_notify("STOPPING=1")
+    if gsi_receiver:
+        gsi_receiver.stop()
+    launcher.close()
+    if monitor.clip_pipeline:
+        monitor.clip_pipeline.stop()
+    if clip_index:
+        clip_index.close()
+    if monitor.session_store:
+        monitor.session_store.close()
 
 if __name__ == "__main__":
     main()
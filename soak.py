@@ -0,0 +1,113 @@
+"""Soak test: drives the service's detection loop through many simulated ticks and checks memory.
+
+    python3 soak.py --ticks 200000
+    python3 soak.py --ticks 500000 --processes 300 --max-growth-mb 4
+
+service.Monitor runs against a fake process table with high churn (processes constantly
+appearing and exiting, a whitelisted game coming and going) and a fake OBS launcher.
+RSS and tracemalloc are sampled as it runs; the run fails if memory keeps growing after
+warm-up, and the allocation sites that grew most are printed.
+"""
+import argparse
+import contextlib
+import io
+import random
+import sys
+import time
+import tracemalloc
+
+import psutil
+
+import service
+from timeline import ReplayLauncher, VirtualClock
+
+class ChurningProcessSource:
+    """A fake process table where `churn` processes exit and new ones start every tick.
+
+    Every `game_period` ticks the whitelisted game runs for the first `game_ticks` of
+    them, so OBS sessions keep starting and stopping.
+    """
+
+    def __init__(self, size=150, churn=15, game='cs2', game_period=300, game_ticks=200, seed=1):
+        self.random = random.Random(seed)
+        self.churn = churn
+        self.game = game
+        self.game_period = game_period
+        self.game_ticks = game_ticks
+        self.next_pid = 1000
+        self.ticks = 0
+        self.processes = [self.new_process() for _ in range(size)]
+
+    def new_process(self):
+        self.next_pid += 1
+        name = f"proc-{self.random.randrange(100000)}"
+        return {'pid': self.next_pid, 'ppid': 1, 'name': name,
+                'cmdline': [f"/usr/bin/{name}", f"--id={self.next_pid}"]}
+
+    def __call__(self):
+        self.ticks += 1
+        for _ in range(self.churn):
+            self.processes[self.random.randrange(len(self.processes))] = self.new_process()
+        if self.ticks % self.game_period < self.game_ticks:
+            return self.processes + [{'pid': 1, 'ppid': 0, 'name': self.game, 'cmdline': [self.game]}]
+        return self.processes
+
+def run_soak(ticks=200000, max_growth_mb=8.0, sample_every=10000, warmup=None, size=150, churn=15, out=sys.stdout):
+    """Runs the soak and returns a result dict; result["passed"] is False on memory growth."""
+    warmup = warmup if warmup is not None else min(ticks // 10, 20000)
+    config = {'obs_path': 'obs', 'whitelisted_games': ['cs2', 'valorant', 'dota2']}
+    clock = VirtualClock()
+    launcher = ReplayLauncher(clock)
+    source = ChurningProcessSource(size=size, churn=churn)
+    monitor = service.Monitor(config, process_source=source, launcher=launcher, config_path=None,
+                              clock=clock, log=lambda message: None, live=False)
+    process = psutil.Process()
+
+    tracemalloc.start()
+    samples = []
+    baseline = None
+    started = time.perf_counter()
+    for tick in range(1, ticks + 1):
+        # The service's per-tick output is of no interest here
+        with contextlib.redirect_stdout(io.StringIO()):
+            monitor.tick()
+        clock.now += service.POLL_INTERVAL
+        if tick == warmup or tick % sample_every == 0 or tick == ticks:
+            rss = process.memory_info().rss
+            traced = tracemalloc.get_traced_memory()[0]
+            samples.append((tick, rss, traced))
+            print(f"tick {tick:>8}: RSS {rss / 1048576:7.1f} MB, traced {traced / 1048576:6.2f} MB", file=out)
+            if tick == warmup:
+                baseline = (rss, traced, tracemalloc.take_snapshot())
+    elapsed = time.perf_counter() - started
+
+    final = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    rss_growth = (samples[-1][1] - baseline[0]) / 1048576
+    traced_growth = (samples[-1][2] - baseline[1]) / 1048576
+    top = final.compare_to(baseline[2], 'lineno')[:10]
+    passed = rss_growth <= max_growth_mb and traced_growth <= max_growth_mb
+
+    print(f"{ticks} ticks in {elapsed:.1f} s, {len(launcher.sessions)} OBS sessions", file=out)
+    print(f"Growth after warm-up: RSS {rss_growth:+.2f} MB, traced {traced_growth:+.2f} MB "
+          f"(limit {max_growth_mb} MB)", file=out)
+    print("Top allocators since warm-up:", file=out)
+    for stat in top:
+        print(f"  {stat}", file=out)
+    print("PASS" if passed else "FAIL: memory grew beyond the limit", file=out)
+    return {'ticks': ticks, 'samples': samples, 'rss_growth_mb': rss_growth,
+            'traced_growth_mb': traced_growth, 'sessions': len(launcher.sessions), 'passed': passed}
+
+def main():
+    parser = argparse.ArgumentParser(description="Soak-test the CS_OBS detection loop for memory growth.")
+    parser.add_argument('--ticks', type=int, default=200000)
+    parser.add_argument('--max-growth-mb', type=float, default=8.0, help="allowed growth after warm-up")
+    parser.add_argument('--sample-every', type=int, default=10000)
+    parser.add_argument('--processes', type=int, default=150, help="size of the fake process table")
+    parser.add_argument('--churn', type=int, default=15, help="processes replaced per tick")
+    args = parser.parse_args()
+    result = run_soak(args.ticks, args.max_growth_mb, args.sample_every, size=args.processes, churn=args.churn)
+    sys.exit(0 if result['passed'] else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+# Metrics kept per sampled process tree
+METRICS = ('cpu_percent', 'rss_mb', 'write_mb_s', 'threads')
+
+class ProcReader:
+    """Reads one process's counters from /proc through descriptors kept open between samples.
+
+    Re-reading an open /proc file with pread() avoids the path lookup and open/close of
+    every sample, and the descriptor stays bound to the original process even if its
+    PID is reused (reads then fail with ESRCH).
+    """
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.stat_fd = os.open(f"/proc/{pid}/stat", os.O_RDONLY)
+        try:
+            self.io_fd = os.open(f"/proc/{pid}/io", os.O_RDONLY)
+        except OSError:
+            # /proc/<pid>/io needs ptrace access, which we may not have
+            self.io_fd = None
+
+    def read(self):
+        """Returns (cpu_seconds, rss_bytes, threads, write_bytes). Raises OSError once the process is gone."""
+        stat = os.pread(self.stat_fd, 4096, 0)
+        if not stat:
+            raise ProcessLookupError(self.pid)
+        # Fields after the parenthesised command name start with field 3 (state)
+        fields = stat[stat.rindex(b')') + 2:].split()
+        cpu_seconds = (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+        threads = int(fields[17])
+        rss_bytes = int(fields[21]) * PAGE_SIZE
+
+        write_bytes = 0
+        if self.io_fd is not None:
+            for line in os.pread(self.io_fd, 4096, 0).splitlines():
+                if line.startswith(b'write_bytes:'):
+                    write_bytes = int(line.split()[1])
+                    break
+        return cpu_seconds, rss_bytes, threads, write_bytes
+
+    def close(self):
+        for fd in (self.stat_fd, self.io_fd):
+            if fd is not None:
+                os.close(fd)
+        self.stat_fd = self.io_fd = None
+
+class TreeSampler:
+    """Samples a set of processes (e.g. the OBS tree) and turns counters into rates."""
+
+    def __init__(self):
+        self.readers = {}
+        self.last = {}
+        self.last_time = None
+        self.samples = {metric: [] for metric in METRICS}
+
+    def sample(self, pids, now=None):
+        now = time.monotonic() if now is None else now
+        pids = set(pids)
+
+        for pid in list(self.readers):
+            if pid not in pids:
+                self.readers.pop(pid).close()
+                self.last.pop(pid, None)
+        for pid in pids - self.readers.keys():
+            try:
+                self.readers[pid] = ProcReader(pid)
+            except OSError:
+                continue
+
+        current = {}
+        for pid, reader in list(self.readers.items()):
+            try:
+                current[pid] = reader.read()
+            except (OSError, ValueError, IndexError):
+                self.readers.pop(pid).close()
+
+        if self.last_time is not None and now > self.last_time and current:
+            elapsed = now - self.last_time
+            cpu = sum(values[0] - self.last[pid][0] for pid, values in current.items() if pid in self.last)
+            written = sum(values[3] - self.last[pid][3] for pid, values in current.items() if pid in self.last)
+            self.samples['cpu_percent'].append(100.0 * cpu / elapsed)
+            self.samples['rss_mb'].append(sum(values[1] for values in current.values()) / 1048576)
+            self.samples['write_mb_s'].append(written / elapsed / 1048576)
+            self.samples['threads'].append(sum(values[2] for values in current.values()))
+
+        self.last = current
+        self.last_time = now
+
+    def summary(self):
+        """Returns {metric: {"min", "avg", "p95"}} over all samples taken."""
+        result = {}
+        for metric, values in self.samples.items():
+            if not values:
+                continue
+            ordered = sorted(values)
+            result[metric] = {
+                'min': round(ordered[0], 2),
+                'avg': round(sum(ordered) / len(ordered), 2),
+                'p95': round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))], 2),
+            }
+        return result
+
+    def close(self):
+        for reader in self.readers.values():
+            reader.close()
+        self.readers.clear()
+
+class SessionTelemetry:
+    """Per-session resource samples for the OBS tree and the game tree."""
+
+    def __init__(self):
+        self.obs = TreeSampler()
+        self.game = TreeSampler()
+
+    def sample(self, obs_pids, game_pids):
+        now = time.monotonic()
+        self.obs.sample(obs_pids, now)
+        self.game.sample(game_pids, now)
+
+    def summary(self):
+        return {'obs': self.obs.summary(), 'game': self.game.summary()}
+
+    def close(self):
+        self.obs.close()
+        self.game.close()
+
+class SessionStore:
+    """Keeps finished sessions and their telemetry summaries in the SQLite database."""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sessions (
+            session_id TEXT PRIMARY KEY,
+            game TEXT,
+            started REAL,
+            ended REAL,
+            telemetry TEXT
+        );
+        CREATE INDEX IF NOT EXISTS sessions_by_game ON sessions (game);
+    """
+
+    def __init__(self, db_path):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.executescript(self.SCHEMA)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def record(self, session_id, game, started, ended, summary):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, game, started, ended, telemetry) VALUES (?, ?, ?, ?, ?)",
+                (session_id, game, started, ended, json.dumps(summary)))
+
+    def peak_game_rss(self, game, sessions=10):
+        """Returns the highest 95th-percentile game RSS in MB over the last sessions, or None."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT telemetry FROM sessions WHERE game = ? ORDER BY ended DESC LIMIT ?", (game, sessions)).fetchall()
+        peaks = [json.loads(row[0] or '{}').get('game', {}).get('rss_mb', {}).get('p95') for row in rows]
+        peaks = [peak for peak in peaks if peak is not None]
+        return max(peaks) if peaks else None
+
+    def game_summaries(self):
+        """Returns per-game averages of the session averages, ordered by game name.
+
+        Each entry is {"game", "sessions", "hours", "obs": {metric: avg}, "game_tree": {metric: avg}}.
+        """
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT game, started, ended, telemetry FROM sessions ORDER BY game COLLATE NOCASE").fetchall()
+
+        games = {}
+        for game, started, ended, telemetry in rows:
+            entry = games.setdefault(game, {'game': game, 'sessions': 0, 'hours': 0.0, 'obs': {}, 'game_tree': {}})
+            entry['sessions'] += 1
+            if started is not None and ended is not None:
+                entry['hours'] += (ended - started) / 3600
+            summary = json.loads(telemetry or '{}')
+            for side, key in (('obs', 'obs'), ('game', 'game_tree')):
+                for metric, stats in summary.get(side, {}).items():
+                    entry[key].setdefault(metric, []).append(stats['avg'])
+
+        for entry in games.values():
+            for key in ('obs', 'game_tree'):
+                entry[key] = {metric: sum(values) / len(values) for metric, values in entry[key].items()}
+        return list(games.values())
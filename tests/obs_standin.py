@@ -0,0 +1,177 @@
+"""A localhost stand-in for OBS's obs-websocket 5.x server, for tests."""
+import base64
+import hashlib
+import json
+import socket
+import struct
+import threading
+
+from obs_websocket import (OP_HELLO, OP_IDENTIFIED, OP_IDENTIFY, OP_REQUEST, OP_REQUEST_RESPONSE,
+                           WS_CLOSE, WS_GUID, WS_PING, WS_PONG, WS_TEXT, auth_response)
+
+class FakeObsServer:
+    """Accepts obs-websocket clients on 127.0.0.1 and answers their requests.
+
+    Every request is recorded in `requests` as (requestType, requestData). Answers come from
+    `handlers`, a dict of requestType to a function taking the requestData and returning
+    responseData (or raising RequestFailed); anything else succeeds with no data.
+    """
+
+    SALT = "salt"
+    CHALLENGE = "challenge"
+
+    def __init__(self, password=None, handlers=None, ping=False):
+        self.password = password
+        self.handlers = handlers or {}
+        self.ping = ping
+        self.requests = []
+        self.identified = 0
+        self.connections = []
+        self.lock = threading.Lock()
+        self.listener = socket.create_server(('127.0.0.1', 0))
+        self.port = self.listener.getsockname()[1]
+        self.thread = threading.Thread(target=self._accept, daemon=True)
+        self.thread.start()
+
+    def request_types(self):
+        with self.lock:
+            return [request_type for request_type, _ in self.requests]
+
+    def drop_connections(self):
+        """Closes every client connection, as OBS exiting or a network drop would."""
+        with self.lock:
+            connections, self.connections = self.connections, []
+        for conn in connections:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            conn.close()
+
+    def stop(self):
+        self.listener.close()
+        self.drop_connections()
+
+    def _accept(self):
+        while True:
+            try:
+                conn, _ = self.listener.accept()
+            except OSError:
+                return
+            with self.lock:
+                self.connections.append(conn)
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        buffer = [b'']
+        try:
+            self._upgrade(conn, buffer)
+            hello = {'rpcVersion': 1}
+            if self.password:
+                hello['authentication'] = {'salt': self.SALT, 'challenge': self.CHALLENGE}
+            self._send(conn, {'op': OP_HELLO, 'd': hello})
+
+            identify = self._recv(conn, buffer)
+            expected = auth_response(self.password, self.SALT, self.CHALLENGE) if self.password else None
+            if identify.get('op') != OP_IDENTIFY or identify['d'].get('authentication') != expected:
+                # obs-websocket closes with 4009 (authentication failed)
+                self._send_frame(conn, WS_CLOSE, struct.pack('!H', 4009))
+                return
+            with self.lock:
+                self.identified += 1
+            self._send(conn, {'op': OP_IDENTIFIED, 'd': {'negotiatedRpcVersion': 1}})
+
+            while True:
+                message = self._recv(conn, buffer)
+                if message.get('op') != OP_REQUEST:
+                    continue
+                self._answer(conn, message['d'])
+        except (OSError, ValueError):
+            pass
+        finally:
+            conn.close()
+
+    def _answer(self, conn, request):
+        request_type = request['requestType']
+        data = request.get('requestData') or {}
+        with self.lock:
+            self.requests.append((request_type, data))
+        status = {'result': True, 'code': 100}
+        response = {'requestType': request_type, 'requestId': request['requestId'], 'requestStatus': status}
+        try:
+            handler = self.handlers.get(request_type)
+            if handler:
+                response['responseData'] = handler(data)
+        except RequestFailed as e:
+            status.update(result=False, code=e.code, comment=str(e))
+        if self.ping:
+            self._send_frame(conn, WS_PING, b"ping")
+        self._send(conn, {'op': OP_REQUEST_RESPONSE, 'd': response})
+
+    def _upgrade(self, conn, buffer):
+        while b'\r\n\r\n' not in buffer[0]:
+            self._fill(conn, buffer)
+        header, buffer[0] = buffer[0].split(b'\r\n\r\n', 1)
+        headers = {name.strip().lower(): value.strip()
+                   for name, _, value in (line.partition(':') for line in header.decode().split('\r\n')[1:])}
+        accept = base64.b64encode(hashlib.sha1((headers['sec-websocket-key'] + WS_GUID).encode()).digest()).decode()
+        conn.sendall((
+            "HTTP/1.1 101 Switching Protocols\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept}\r\n"
+            "Sec-WebSocket-Protocol: obswebsocket.json\r\n\r\n").encode())
+
+    def _fill(self, conn, buffer):
+        data = conn.recv(65536)
+        if not data:
+            raise ConnectionError("client closed the connection")
+        buffer[0] += data
+
+    def _read_exact(self, conn, buffer, size):
+        while len(buffer[0]) < size:
+            self._fill(conn, buffer)
+        data, buffer[0] = buffer[0][:size], buffer[0][size:]
+        return data
+
+    def _recv(self, conn, buffer):
+        while True:
+            first, second = self._read_exact(conn, buffer, 2)
+            if not second & 0x80:
+                raise ValueError("client frames must be masked")
+            length = second & 0x7F
+            if length == 126:
+                length = struct.unpack('!H', self._read_exact(conn, buffer, 2))[0]
+            elif length == 127:
+                length = struct.unpack('!Q', self._read_exact(conn, buffer, 8))[0]
+            mask = self._read_exact(conn, buffer, 4)
+            payload = bytes(byte ^ mask[i % 4] for i, byte in enumerate(self._read_exact(conn, buffer, length)))
+            opcode = first & 0x0F
+            if opcode == WS_CLOSE:
+                raise ConnectionError("client closed the websocket")
+            if opcode == WS_PONG:
+                with self.lock:
+                    self.requests.append(('pong', payload))
+                continue
+            return json.loads(payload.decode())
+
+    def _send(self, conn, message):
+        self._send_frame(conn, WS_TEXT, json.dumps(message).encode())
+
+    def _send_frame(self, conn, opcode, payload):
+        # Server frames are not masked
+        header = bytes([0x80 | opcode])
+        if len(payload) < 126:
+            header += bytes([len(payload)])
+        elif len(payload) < 65536:
+            header += bytes([126]) + struct.pack('!H', len(payload))
+        else:
+            header += bytes([127]) + struct.pack('!Q', len(payload))
+        conn.sendall(header + payload)
+
+class RequestFailed(Exception):
+    """Raised by a handler to fail a request with an obs-websocket status code."""
+
+    def __init__(self, comment, code=600):
+        super().__init__(comment)
+        self.code = code
@@ -0,0 +1,244 @@
+import os
+import shutil
+import threading
+
+from clips import UNSORTED_FOLDER, ClipCoalescer, ClipIndex, ClipPipeline, game_folder_name, overlapping_groups
+
+def clip(path, timestamp, duration):
+    return {'path': path, 'timestamp': timestamp, 'duration': duration, 'width': 1920, 'height': 1080}
+
+def test_groups_before_a_clip_without_duration_are_kept():
+    clips = [clip('a.mkv', 100.0, 30.0), clip('b.mkv', 110.0, 30.0), clip('c.mkv', 200.0, None)]
+    groups = overlapping_groups(clips, max_parts=10, max_duration=600)
+    assert [[row['path'] for row, _ in group] for group in groups] == [['a.mkv', 'b.mkv']]
+
+def test_remuxed_clip_keeps_the_save_time(tmp_path):
+    source = tmp_path / "Replay 1.mkv"
+    source.write_bytes(b"clip")
+    os.utime(source, (1000000000, 1000000000))
+    pipeline = ClipPipeline(str(tmp_path), remux_to='mp4', remuxer=lambda src, dst: shutil.copy(src, dst) or True)
+    try:
+        final_path = pipeline.process_clip(str(source), 'cs2')
+    finally:
+        pipeline.executor.shutdown()
+    assert final_path.endswith(os.path.join("cs2", "Replay 1.mp4"))
+    assert os.stat(final_path).st_mtime == 1000000000
+
+def copy_remuxer(calls):
+    def remux(src, dst):
+        calls.append((src, dst))
+        shutil.copy(src, dst)
+        return True
+    return remux
+
+def test_game_folder_name():
+    assert game_folder_name('cs2') == 'cs2'
+    assert game_folder_name('Half-Life 2/Episode One') == 'Half-Life 2_Episode One'
+    assert game_folder_name('a\\b') == 'a_b'
+    assert game_folder_name('Portal. ') == 'Portal'
+    for name in (None, '', ' . '):
+        assert game_folder_name(name) == UNSORTED_FOLDER
+
+def test_clip_without_a_game_goes_to_unsorted(tmp_path):
+    source = tmp_path / "Replay 1.mkv"
+    source.write_bytes(b"clip")
+    pipeline = ClipPipeline(str(tmp_path))
+    try:
+        final_path = pipeline.process_clip(str(source), None)
+    finally:
+        pipeline.executor.shutdown()
+    assert final_path == str(tmp_path / UNSORTED_FOLDER / "Replay 1.mkv")
+    assert not source.exists()
+
+def test_watcher_moves_and_remuxes_a_closed_clip(tmp_path):
+    watch_dir = tmp_path / "obs"
+    output_dir = tmp_path / "clips"
+    watch_dir.mkdir()
+    remuxed = []
+    saved = []
+    done = threading.Event()
+
+    def on_clip(path, game, session_id):
+        saved.append((path, game, session_id))
+        done.set()
+
+    pipeline = ClipPipeline(str(watch_dir), output_dir=str(output_dir), remux_to='mp4',
+                            remuxer=copy_remuxer(remuxed), on_clip=on_clip)
+    pipeline.set_session('cs2', 's1')
+    assert pipeline.start()
+    try:
+        # Partial files OBS hides and non-clips are ignored
+        (watch_dir / ".Replay 1.mkv").write_bytes(b"partial")
+        (watch_dir / "notes.txt").write_text("not a clip")
+        with open(watch_dir / "Replay 1.mkv", 'wb') as f:
+            f.write(b"clip")
+        assert done.wait(5)
+    finally:
+        pipeline.stop()
+
+    final_path = str(output_dir / "cs2" / "Replay 1.mp4")
+    assert saved == [(final_path, 'cs2', 's1')]
+    assert remuxed == [(str(watch_dir / "Replay 1.mkv"), final_path)]
+    assert not (watch_dir / "Replay 1.mkv").exists()
+    assert (output_dir / "cs2" / "Replay 1.mp4").read_bytes() == b"clip"
+
+def test_reconcile_skips_a_missing_folder(tmp_path):
+    index = ClipIndex(str(tmp_path / "clips.db"), prober=lambda path: (None, None, None))
+    index.add(str(tmp_path / "clips" / "cs2" / "Replay 1.mkv"), 'cs2',
+              stat=os.stat_result((0, 0, 0, 0, 0, 0, 4, 0, 1000, 0)))
+    index.reconcile(str(tmp_path / "clips"))
+    # The folder may only be unmounted: its rows are kept
+    assert index.count() == 1
+
+def session_clips(tmp_path):
+    """Two overlapping 30 s clips of session s1, in a ClipIndex held in memory."""
+    folder = tmp_path / "cs2"
+    folder.mkdir()
+    index = ClipIndex(':memory:', prober=lambda path: (30.0, 1920, 1080))
+    parts = []
+    for number, saved in ((1, 1000), (2, 1010)):
+        path = folder / f"Replay {number}.mkv"
+        path.write_bytes(f"part {number}".encode())
+        os.utime(path, (saved, saved))
+        index.add(str(path), 'cs2', 's1')
+        parts.append(str(path))
+    return index, parts
+
+def concatenator(calls):
+    def concat(inputs, target_path):
+        calls.append((inputs, target_path))
+        with open(target_path, 'wb') as f:
+            for path, _ in inputs:
+                with open(path, 'rb') as part:
+                    f.write(part.read())
+        return True
+    return concat
+
+def test_merge_replaces_the_parts(tmp_path):
+    index, parts = session_clips(tmp_path)
+    calls = []
+    coalescer = ClipCoalescer(index, str(tmp_path), concatenator=concatenator(calls))
+    target = str(tmp_path / "cs2" / "Replay 1-merged.mkv")
+
+    assert coalescer.coalesce_session('s1') == [target]
+    # The second clip starts 20 s into the first, which covers up to its 30 s
+    assert calls == [([(parts[0], 0.0), (parts[1], 20.0)], target)]
+    assert not any(os.path.exists(path) for path in parts)
+    assert [row['path'] for row in index.session_clips('s1')] == [target]
+    assert os.stat(target).st_mtime == 1010
+    assert os.listdir(coalescer.journal_dir) == []
+
+def test_failed_merge_keeps_the_parts(tmp_path):
+    index, parts = session_clips(tmp_path)
+    coalescer = ClipCoalescer(index, str(tmp_path), concatenator=lambda inputs, target_path: False)
+
+    assert coalescer.coalesce_session('s1') == []
+    assert all(os.path.exists(path) for path in parts)
+    assert [row['path'] for row in index.session_clips('s1')] == parts
+    assert os.listdir(coalescer.journal_dir) == []
+
+def interrupted_merge(tmp_path):
+    index, parts = session_clips(tmp_path)
+    coalescer = ClipCoalescer(index, str(tmp_path), concatenator=concatenator([]))
+    target = tmp_path / "cs2" / "Replay 1-merged.mkv"
+    journal = {'target': str(target), 'parts': parts, 'game': 'cs2', 'session_id': 's1', 'timestamp': 1010}
+    assert coalescer.write_journal(os.path.join(coalescer.journal_dir, "Replay 1.json"), journal)
+    return index, parts, coalescer, target
+
+def test_recover_finishes_a_merge_with_its_target_in_place(tmp_path):
+    index, parts, coalescer, target = interrupted_merge(tmp_path)
+    target.write_bytes(b"merged")
+
+    ClipCoalescer(index, str(tmp_path)).recover()
+    assert not any(os.path.exists(path) for path in parts)
+    assert [row['path'] for row in index.session_clips('s1')] == [str(target)]
+    assert os.stat(target).st_mtime == 1010
+    assert os.listdir(coalescer.journal_dir) == []
+
+def test_recover_rolls_back_a_merge_without_its_target(tmp_path):
+    index, parts, coalescer, target = interrupted_merge(tmp_path)
+    partial = tmp_path / "cs2" / ".Replay 1-merged.partial.mkv"
+    concat_list = tmp_path / "cs2" / ".Replay 1-merged.ffconcat"
+    partial.write_bytes(b"half a merge")
+    concat_list.write_text("ffconcat version 1.0\n")
+
+    ClipCoalescer(index, str(tmp_path)).recover()
+    assert not partial.exists()
+    assert not concat_list.exists()
+    assert not target.exists()
+    assert all(os.path.exists(path) for path in parts)
+    assert [row['path'] for row in index.session_clips('s1')] == parts
+    assert os.listdir(coalescer.journal_dir) == []
+
+def saved_clip(folder, name, saved, data=b"clip"):
+    folder.mkdir(parents=True, exist_ok=True)
+    path = folder / name
+    path.write_bytes(data)
+    os.utime(path, (saved, saved))
+    return str(path)
+
+def recording_prober(probed):
+    def probe(path):
+        probed.append(path)
+        return 30.0, 1920, 1080
+    return probe
+
+def test_reconcile_only_probes_new_and_changed_clips(tmp_path):
+    clips_dir = tmp_path / "clips"
+    first = saved_clip(clips_dir / "cs2", "Replay 1.mkv", 1000)
+    second = saved_clip(clips_dir / "cs2", "Replay 2.mkv", 2000)
+    unsorted = saved_clip(clips_dir / UNSORTED_FOLDER, "Replay 3.mkv", 3000)
+    saved_clip(clips_dir / "cs2", ".Replay 4.partial.mkv", 4000)
+    probed = []
+    index = ClipIndex(':memory:', prober=recording_prober(probed))
+    index.add(first, 'cs2', 's1')
+    probed.clear()
+
+    index.reconcile(str(clips_dir))
+    assert set(probed) == {second, unsorted}
+    assert index.count() == 3
+    assert [row['game'] for row in index.query()] == [None, 'cs2', 'cs2']
+
+    probed.clear()
+    index.reconcile(str(clips_dir))
+    assert probed == []
+
+    # A new mtime or a new size is probed again
+    os.utime(first, (1500, 1500))
+    with open(second, 'ab') as f:
+        f.write(b" and more")
+    os.utime(second, (2000, 2000))
+    index.reconcile(str(clips_dir))
+    assert set(probed) == {first, second}
+    assert [row['path'] for row in index.session_clips('s1')] == [first]
+    assert index.query(game='cs2')[1]['timestamp'] == 1500
+
+def test_reconcile_drops_deleted_clips(tmp_path):
+    clips_dir = tmp_path / "clips"
+    kept = saved_clip(clips_dir / "cs2", "Replay 1.mkv", 1000)
+    deleted = saved_clip(clips_dir / "cs2", "Replay 2.mkv", 2000)
+    index = ClipIndex(':memory:', prober=recording_prober([]))
+    index.reconcile(str(clips_dir))
+    os.remove(deleted)
+
+    index.reconcile(str(clips_dir))
+    assert [row['path'] for row in index.query()] == [kept]
+
+def test_query_filters_and_pages(tmp_path):
+    index = ClipIndex(':memory:', prober=recording_prober([]))
+    for number in range(5):
+        index.add(saved_clip(tmp_path / "cs2", f"cs2 {number}.mkv", 1000 + number * 100), 'cs2')
+        index.add(saved_clip(tmp_path / "dota2", f"dota2 {number}.mkv", 1050 + number * 100), 'dota2')
+
+    assert index.count() == 10
+    assert index.count(game='dota2') == 5
+    assert index.count(since=1200, until=1400) == 4
+    assert index.games() == ['cs2', 'dota2']
+
+    def names(rows):
+        return [os.path.basename(row['path']) for row in rows]
+
+    assert names(index.query(game='cs2', limit=2)) == ["cs2 4.mkv", "cs2 3.mkv"]
+    assert names(index.query(game='cs2', limit=2, offset=2)) == ["cs2 2.mkv", "cs2 1.mkv"]
+    assert names(index.query(game='cs2', limit=2, offset=4)) == ["cs2 0.mkv"]
+    assert names(index.query(since=1200, until=1400)) == ["dota2 3.mkv", "cs2 3.mkv", "dota2 2.mkv", "cs2 2.mkv"]
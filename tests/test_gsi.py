@@ -0,0 +1,153 @@
+import gc
+import http.client
+import json
+import logging
+import os
+
+import gsi
+from gsi import GsiEvents, GsiReceiver
+
+TRACE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "gsi-trace.jsonl")
+
+def post(connection, payload):
+    connection.request('POST', '/', json.dumps(payload).encode(), {'Content-Type': 'application/json'})
+    response = connection.getresponse()
+    response.read()
+    return response.status
+
+def test_non_object_payloads_are_rejected():
+    receiver = GsiReceiver(GsiEvents(), lambda: None)
+    assert receiver.handle_post(b'[1, 2]') == "400 Bad Request"
+    assert receiver.handle_post(b'"state"') == "400 Bad Request"
+    assert receiver.handle_post(b'{}') == "200 OK"
+
+def test_stop_with_an_open_keep_alive_connection(caplog):
+    receiver = GsiReceiver(GsiEvents(), lambda: None, port=0)
+    assert receiver.start()
+    connection = http.client.HTTPConnection(receiver.host, receiver.port, timeout=5)
+    try:
+        assert post(connection, {'provider': {'steamid': '1'}}) == 200
+        assert post(connection, [1, 2]) == 400
+        with caplog.at_level(logging.ERROR, logger='asyncio'):
+            receiver.stop()
+            assert not receiver.thread.is_alive()
+            gc.collect()
+        assert not [record for record in caplog.records if record.name == 'asyncio']
+    finally:
+        connection.close()
+
+def test_malformed_fields_are_rejected():
+    receiver = GsiReceiver(GsiEvents(), lambda: None)
+    assert receiver.handle_post(b'{"player": 1}') == "400 Bad Request"
+    assert receiver.handle_post(b'{"player": {"state": {"round_kills": "3"}}}') == "400 Bad Request"
+    assert receiver.handle_post(b'{"player": {"state": []}}') == "400 Bad Request"
+    assert receiver.handle_post(b'{"round": "over"}') == "400 Bad Request"
+    assert receiver.handle_post(b'{"auth": "token"}') == "400 Bad Request"
+
+def test_malformed_post_keeps_the_connection_open():
+    receiver = GsiReceiver(GsiEvents(), lambda: None, port=0)
+    assert receiver.start()
+    connection = http.client.HTTPConnection(receiver.host, receiver.port, timeout=5)
+    try:
+        assert post(connection, {'player': 1}) == 400
+        assert post(connection, {'provider': {'steamid': '1'}}) == 200
+    finally:
+        connection.close()
+        receiver.stop()
+
+def test_round_win_is_detected_while_spectating():
+    detector = GsiEvents()
+    provider = {'steamid': '1'}
+    assert detector.feed({'provider': provider, 'player': {'steamid': '1', 'team': 'CT'},
+                          'round': {'phase': 'live'}}) == []
+    # Dead: the player section now describes the teammate being spectated
+    spectating = {'provider': provider, 'player': {'steamid': '2', 'team': 'CT'}}
+    assert detector.feed(dict(spectating, round={'phase': 'live'})) == []
+    assert detector.feed(dict(spectating, round={'phase': 'over', 'win_team': 'CT'})) == [('round_win', 'CT')]
+
+def me(kills, team='CT', phase='live', win_team=None):
+    round_info = {'phase': phase, 'win_team': win_team} if win_team else {'phase': phase}
+    return {'provider': {'steamid': '1'}, 'player': {'steamid': '1', 'team': team, 'state': {'round_kills': kills}},
+            'round': round_info}
+
+def test_multi_kill_is_reported_once_per_threshold_crossing():
+    detector = GsiEvents(multi_kill=3)
+    assert detector.feed(me(1)) == []
+    assert detector.feed(me(2)) == []
+    assert detector.feed(me(3)) == [('multi_kill', "3k")]
+    # Repeated state posts don't repeat the event
+    assert detector.feed(me(3)) == []
+    assert detector.feed(me(5)) == [('multi_kill', "ace")]
+    # Next round starts from zero again
+    assert detector.feed(me(0, phase='freezetime')) == []
+    assert detector.feed(me(3)) == [('multi_kill', "3k")]
+
+def test_round_win_only_for_our_team_and_once_per_round():
+    detector = GsiEvents()
+    assert detector.feed(me(0)) == []
+    assert detector.feed(me(0, phase='over', win_team='CT')) == [('round_win', 'CT')]
+    assert detector.feed(me(0, phase='over', win_team='CT')) == []
+    assert detector.feed(me(0, phase='live')) == []
+    assert detector.feed(me(0, phase='over', win_team='T')) == []
+
+def test_disabled_events_are_not_reported():
+    detector = GsiEvents(events=['round_win'])
+    assert detector.feed(me(4)) == []
+    assert detector.feed(me(4, phase='over', win_team='CT')) == [('round_win', 'CT')]
+
+class FakeLoop:
+    """Runs the receiver's debounce timers on a fake clock."""
+
+    def __init__(self):
+        self.timers = []
+
+    def call_later(self, delay, callback):
+        timer = FakeTimer(delay, callback)
+        self.timers.append(timer)
+        return timer
+
+    def run_in_executor(self, executor, function, *args):
+        function(*args)
+
+class FakeTimer:
+    def __init__(self, delay, callback):
+        self.delay = delay
+        self.callback = callback
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+def test_saves_are_debounced_up_to_max_delay(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(gsi.time, 'monotonic', lambda: now[0])
+    saves = []
+    receiver = GsiReceiver(GsiEvents(), lambda: saves.append(now[0]), save_delay=3.0, max_delay=10.0)
+    receiver.loop = FakeLoop()
+
+    receiver.schedule_save("multi_kill (3k)", now[0])
+    assert receiver.loop.timers[-1].delay == 3.0
+    # Each new event pushes the save back by save_delay...
+    now[0] = 102.0
+    receiver.schedule_save("multi_kill (4k)", now[0])
+    assert receiver.loop.timers[0].cancelled
+    assert receiver.loop.timers[-1].delay == 3.0
+    # ...but never past max_delay after the first one
+    now[0] = 109.0
+    receiver.schedule_save("round_win (CT)", now[0])
+    assert receiver.loop.timers[-1].delay == 1.0
+    assert [timer.cancelled for timer in receiver.loop.timers] == [True, True, False]
+
+    now[0] = 110.0
+    receiver.loop.timers[-1].callback()
+    assert saves == [110.0]
+    assert receiver.latencies == [10.0]
+    assert receiver.pending is None
+
+def test_load_test_replays_the_recorded_trace():
+    # Recorded pacing with a short debounce: the 3k and the round win are 0.5 s apart
+    result = gsi.load_test(TRACE_PATH, speed=1.0, save_delay=0.1)
+    assert result['posts'] == 13
+    assert result['saves'] == 2
+    assert result['save_max_ms'] < 1000
+    assert result['request_max_ms'] < 1000
@@ -0,0 +1,59 @@
+import subprocess
+
+import pytest
+
+import service
+
+@pytest.fixture
+def cgroup_dir(tmp_path):
+    """A directory laid out like a populated cgroup v2, holding one sleeping process."""
+    sleeper = subprocess.Popen(['sleep', '60'])
+    (tmp_path / "cgroup.events").write_text("populated 1\nfrozen 0\n")
+    (tmp_path / "cgroup.procs").write_text(f"{sleeper.pid}\n")
+    yield tmp_path, sleeper
+    sleeper.kill()
+    sleeper.wait()
+
+def test_liveness_follows_cgroup_events(tmp_path):
+    scope = service.ObsScope("cs-obs-test.service", str(tmp_path))
+    # No cgroup directory left at all: the unit is gone
+    assert not scope.is_running()
+    (tmp_path / "cgroup.events").write_text("populated 1\nfrozen 0\n")
+    assert scope.is_running()
+    (tmp_path / "cgroup.events").write_text("populated 0\nfrozen 0\n")
+    assert not scope.is_running()
+    assert scope.wait(0)
+
+def test_pids_come_from_cgroup_procs(tmp_path):
+    scope = service.ObsScope("cs-obs-test.service", str(tmp_path))
+    assert scope.pids() == []
+    (tmp_path / "cgroup.procs").write_text("4242\n4250\n4251\n")
+    assert scope.pids() == [4242, 4250, 4251]
+    (tmp_path / "cgroup.procs").write_text("")
+    assert scope.pids() == []
+    (tmp_path / "cgroup.procs").write_text("4242\nnot a pid\n")
+    assert scope.pids() == []
+
+def test_kill_writes_cgroup_kill(cgroup_dir):
+    path, sleeper = cgroup_dir
+    (path / "cgroup.kill").write_text("")
+    service.ObsScope("cs-obs-test.service", str(path)).kill()
+    assert (path / "cgroup.kill").read_text() == "1"
+    # Writing the file is all it takes on a real cgroup
+    assert sleeper.poll() is None
+
+def test_kill_signals_the_processes_without_cgroup_kill(cgroup_dir):
+    path, sleeper = cgroup_dir
+    # Before Linux 5.14 there is no cgroup.kill to open
+    (path / "cgroup.kill").mkdir()
+    service.ObsScope("cs-obs-test.service", str(path)).kill()
+    assert sleeper.wait(5) == -9
+
+def test_stop_escalates_to_kill(cgroup_dir):
+    path, sleeper = cgroup_dir
+    (path / "cgroup.kill").write_text("")
+    scope = service.ObsScope("cs-obs-test.service", str(path))
+    # SIGTERM goes out first; this cgroup never reports empty, so it is killed after the timeout
+    service.stop_obs_scoped(scope, timeout=0.2)
+    assert sleeper.wait(5) == -15
+    assert (path / "cgroup.kill").read_text() == "1"
@@ -0,0 +1,95 @@
+import pytest
+
+import service
+from obs_websocket import ObsWebSocket, ObsWebSocketError
+from obs_standin import FakeObsServer, RequestFailed
+from timeline import VirtualClock
+
+@pytest.fixture
+def server():
+    server = FakeObsServer(password="secret", handlers={
+        'GetVersion': lambda data: {'obsVersion': "30.0.0"},
+        'SetCurrentProfile': lambda data: {},
+    })
+    yield server
+    server.stop()
+
+def test_handshake_and_authentication(server):
+    obs_ws = ObsWebSocket('127.0.0.1', server.port, "secret")
+    obs_ws.connect()
+    assert obs_ws.is_connected()
+    assert server.identified == 1
+    obs_ws.close()
+
+def test_wrong_or_missing_password_is_rejected(server):
+    with pytest.raises(ObsWebSocketError):
+        ObsWebSocket('127.0.0.1', server.port, "wrong").connect()
+    with pytest.raises(ObsWebSocketError, match="password"):
+        ObsWebSocket('127.0.0.1', server.port).connect()
+    assert server.identified == 0
+
+def test_request_and_response(server):
+    obs_ws = ObsWebSocket('127.0.0.1', server.port, "secret")
+    # Connects on the first request
+    assert obs_ws.request('GetVersion') == {'obsVersion': "30.0.0"}
+    assert obs_ws.request('SaveReplayBuffer') == {}
+    obs_ws.request('SetCurrentProfile', {'profileName': "Light"})
+    assert server.requests == [('GetVersion', {}), ('SaveReplayBuffer', {}),
+                               ('SetCurrentProfile', {'profileName': "Light"})]
+    obs_ws.close()
+
+def test_failed_request_raises(server):
+    def refuse(data):
+        raise RequestFailed("Replay buffer is not active", code=501)
+    server.handlers['SaveReplayBuffer'] = refuse
+    obs_ws = ObsWebSocket('127.0.0.1', server.port, "secret")
+    with pytest.raises(ObsWebSocketError, match="not active"):
+        obs_ws.request('SaveReplayBuffer')
+    # The connection stays usable after a failed request
+    assert obs_ws.request('GetVersion') == {'obsVersion': "30.0.0"}
+    obs_ws.close()
+
+def test_pings_are_answered():
+    server = FakeObsServer(ping=True)
+    try:
+        obs_ws = ObsWebSocket('127.0.0.1', server.port)
+        obs_ws.request('GetVersion')
+        obs_ws.request('GetVersion')
+        # The pong for the first ping reaches the server ahead of the second request
+        assert server.request_types()[:3] == ['GetVersion', 'pong', 'GetVersion']
+        obs_ws.close()
+    finally:
+        server.stop()
+
+def test_load_switcher_rate_limits_profile_switches(server, monkeypatch, tmp_path):
+    monkeypatch.setattr(service, 'LOG_PATH', str(tmp_path / "actions.log"))
+    load = [100.0]
+    monkeypatch.setattr(service.psutil, 'cpu_percent', lambda interval=None: load[0])
+    clock = VirtualClock()
+    obs_ws = ObsWebSocket('127.0.0.1', server.port, "secret")
+    switcher = service.LoadSwitcher({'cpu_threshold': 90, 'sustain_seconds': 30, 'min_switch_interval': 300},
+                                    {'profile': "Normal", 'light_profile': "Light"}, obs_ws, clock)
+
+    def run(seconds):
+        for _ in range(int(seconds // service.POLL_INTERVAL)):
+            switcher.sample()
+            clock.now += service.POLL_INTERVAL
+
+    # Sustained load switches once the condition held for 30 s
+    run(25)
+    assert 'SetCurrentProfile' not in server.request_types()
+    run(10)
+    assert switcher.on_light
+    assert server.requests[-3:] == [('StopReplayBuffer', {}), ('SetCurrentProfile', {'profileName': "Light"}),
+                                    ('StartReplayBuffer', {})]
+
+    # Load drops right away, but switching back waits for min_switch_interval
+    load[0] = 10.0
+    run(200)
+    assert switcher.on_light
+    assert server.request_types().count('SetCurrentProfile') == 1
+    run(150)
+    assert not switcher.on_light
+    assert server.requests[-2] == ('SetCurrentProfile', {'profileName': "Normal"})
+    assert server.request_types().count('SetCurrentProfile') == 2
+    obs_ws.close()
@@ -0,0 +1,25 @@
+import service
+from timeline import ReplayLauncher, VirtualClock
+
+STEAM_LAUNCH = {'pid': 500, 'ppid': 1, 'name': 'reaper',
+                'cmdline': ['reaper', 'SteamLaunch', 'AppId=730', '--', '/games/cs2/cs2']}
+
+def test_disabling_prelaunch_stops_a_speculative_obs():
+    config = {'obs_path': 'obs', 'whitelisted_games': ['cs2'], 'prelaunch': {'enabled': True}}
+    clock = VirtualClock()
+    launcher = ReplayLauncher(clock)
+    processes = [STEAM_LAUNCH]
+    monitor = service.Monitor(config, process_source=lambda: processes, launcher=launcher,
+                              config_path=None, clock=clock, log=lambda message: None, live=False)
+    monitor.tick()
+    assert monitor.speculative_game == 'cs2'
+    assert len(launcher.starts) == 1
+
+    config['prelaunch']['enabled'] = False
+    monitor.configure_prelaunch()
+    processes = []
+    clock.now += service.POLL_INTERVAL
+    monitor.tick()
+    assert monitor.speculative_game is None
+    assert monitor.script_obs_process is None
+    assert len(launcher.sessions) == 1
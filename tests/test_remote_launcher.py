@@ -0,0 +1,91 @@
+import time
+
+import pytest
+
+import service
+from obs_websocket import ObsWebSocket
+from obs_standin import FakeObsServer
+
+class ReplayBufferState:
+    """Handlers making the stand-in track whether its replay buffer is running."""
+
+    def __init__(self):
+        self.active = False
+
+    def handlers(self):
+        return {
+            'StartReplayBuffer': lambda data: self.set(True),
+            'StopReplayBuffer': lambda data: self.set(False),
+            'GetReplayBufferStatus': lambda data: {'outputActive': self.active},
+        }
+
+    def set(self, active):
+        self.active = active
+        return {}
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+@pytest.fixture
+def remote():
+    state = ReplayBufferState()
+    server = FakeObsServer(password="secret", handlers=state.handlers())
+    launcher = service.RemoteObsLauncher(ObsWebSocket('127.0.0.1', server.port, "secret", timeout=1),
+                                         reconnect_interval=0.05)
+    yield server, state, launcher
+    launcher.close()
+    server.stop()
+
+def test_start_and_stop_control_the_remote_replay_buffer(remote):
+    server, state, launcher = remote
+    assert not launcher.running_elsewhere()
+    handle = launcher.start('obs', ['--profile', 'ignored'])
+    assert handle is not None
+    assert state.active
+    assert launcher.is_alive(handle)
+
+    launcher.stop(handle)
+    assert not state.active
+    assert not launcher.is_alive(handle)
+
+def test_replay_buffer_started_by_someone_else(remote):
+    server, state, launcher = remote
+    state.active = True
+    assert launcher.running_elsewhere()
+
+def test_reconnects_after_a_dropped_connection(remote):
+    server, state, launcher = remote
+    launcher.start_connection()
+    assert wait_for(lambda: launcher.connected and server.identified == 1)
+
+    server.drop_connections()
+    # The keep-alive notices the drop and identifies again
+    assert wait_for(lambda: server.identified == 2)
+    assert wait_for(lambda: launcher.connected)
+    assert launcher.start('obs') is not None
+    assert state.active
+
+def test_unreachable_remote_counts_as_alive(remote):
+    server, state, launcher = remote
+    handle = launcher.start('obs')
+    server.stop()
+    assert launcher.is_alive(handle)
+
+def test_adopt_resumes_an_active_session(remote):
+    server, state, launcher = remote
+    handle = launcher.start('obs')
+    identity = launcher.identity(handle)
+    assert identity == {'remote': f"127.0.0.1:{server.port}", 'started': handle.started}
+
+    adopted = launcher.adopt(identity)
+    assert adopted is not None and adopted.started == handle.started
+    # Another endpoint, or a buffer that is no longer running, can't be adopted
+    assert launcher.adopt({'remote': "10.0.0.2:4455", 'started': handle.started}) is None
+    assert launcher.adopt(None) is None
+    launcher.stop(handle)
+    assert launcher.adopt(identity) is None
@@ -0,0 +1,117 @@
+import json
+
+import pytest
+
+import service
+
+@pytest.fixture(autouse=True)
+def action_log(monkeypatch, tmp_path):
+    monkeypatch.setattr(service, 'LOG_PATH', str(tmp_path / "actions.log"))
+
+class FakeProfilesWs:
+    """Stands in for OBS's WebSocket with several profiles, of which one is current."""
+
+    def __init__(self, profiles, current):
+        self.profiles = profiles
+        self.current = current
+        self.requests = []
+
+    def request(self, name, data=None):
+        self.requests.append(name)
+        profile = self.profiles[self.current]
+        if name == 'GetProfileList':
+            return {'currentProfileName': self.current, 'profiles': list(self.profiles)}
+        if name == 'GetProfileParameter':
+            return {'parameterValue': profile.get((data['parameterCategory'], data['parameterName']))}
+        if name == 'SetProfileParameter':
+            profile[(data['parameterCategory'], data['parameterName'])] = data['parameterValue']
+        if name == 'SetCurrentProfile':
+            self.current = data['profileName']
+        return {}
+
+    def close(self):
+        pass
+
+def advanced_profile(size, seconds):
+    return {('Output', 'Mode'): 'Advanced', ('AdvOut', 'RecRBSize'): size, ('AdvOut', 'RecRBTime'): seconds}
+
+def limits(profile):
+    return profile[('AdvOut', 'RecRBSize')], profile[('AdvOut', 'RecRBTime')]
+
+def test_session_end_restores_the_profile_limits():
+    obs_ws = FakeProfilesWs({'Normal': advanced_profile('512', '20')}, 'Normal')
+    budget = service.ReplayBudget({}, obs_ws, lambda: 0.0)
+    budget.read_profile()
+    budget.set_size(1024)
+    assert limits(obs_ws.profiles['Normal']) == ('1024', '120')
+
+    budget.restore()
+    assert limits(obs_ws.profiles['Normal']) == ('512', '20')
+    # A second restore (from end_session after close_obs) changes nothing
+    obs_ws.requests.clear()
+    budget.restore()
+    assert obs_ws.requests == []
+
+def test_load_switching_moves_the_budget_with_the_profile():
+    obs_ws = FakeProfilesWs({'Normal': advanced_profile('512', '20'), 'Light': advanced_profile('300', '30')}, 'Normal')
+    budget = service.ReplayBudget({}, obs_ws, lambda: 0.0)
+    switcher = service.LoadSwitcher({}, {'profile': 'Normal', 'light_profile': 'Light'}, obs_ws, lambda: 0.0, budget)
+    budget.read_profile()
+    budget.set_size(1024)
+
+    assert switcher.switch_profile('Light')
+    assert limits(obs_ws.profiles['Normal']) == ('512', '20')
+    assert limits(obs_ws.profiles['Light']) == ('1024', '120')
+
+    # A shrink lands in the profile in use
+    budget.set_size(512)
+    assert switcher.switch_profile('Normal')
+    assert limits(obs_ws.profiles['Light']) == ('300', '30')
+    assert limits(obs_ws.profiles['Normal']) == ('512', '120')
+
+    budget.restore()
+    assert limits(obs_ws.profiles['Normal']) == ('512', '20')
+    assert limits(obs_ws.profiles['Light']) == ('300', '30')
+
+def test_adopted_session_keeps_the_budget(monkeypatch):
+    obs_ws = FakeProfilesWs({'Normal': advanced_profile('512', '20')}, 'Normal')
+    budget = service.ReplayBudget({}, obs_ws, lambda: 0.0)
+    budget.read_profile()
+    budget.set_size(1024)
+    # Through the state file, as a restarted service would see it
+    state = json.loads(json.dumps(budget.state()))
+
+    adopted = service.ReplayBudget({}, obs_ws, lambda: 0.0)
+    adopted.load_state(state)
+    assert adopted.started
+    assert adopted.size_mb == 1024
+
+    # Pressure shrinking still works for the rest of the session
+    monkeypatch.setattr(service, 'read_memory_pressure', lambda: 50.0)
+    adopted.sample(None)
+    assert adopted.size_mb == 512
+
+    adopted.restore()
+    assert limits(obs_ws.profiles['Normal']) == ('512', '20')
+
+def test_budget_state_is_persisted_with_the_session(tmp_path):
+    obs_ws = FakeProfilesWs({'Normal': advanced_profile('512', '20')}, 'Normal')
+    monitor = service.Monitor({'obs_path': 'obs', 'whitelisted_games': ['cs2']}, process_source=lambda: [],
+                              launcher=service.RemoteObsLauncher(service.ObsWebSocket('127.0.0.1', 1)),
+                              config_path=None, state_path=str(tmp_path / "state.json"),
+                              log=lambda message: None, live=False)
+    monitor.script_obs_process = service.RemoteObsHandle(1.0)
+    monitor.replay_budget = service.ReplayBudget({}, obs_ws, lambda: 0.0)
+    monitor.replay_budget.read_profile()
+    monitor.replay_budget.set_size(1024)
+    monitor.persist_state()
+
+    # Budgeting another profile changes the originals, which has to reach the file too
+    obs_ws.profiles['Light'] = advanced_profile('300', '30')
+    obs_ws.current = 'Light'
+    monitor.replay_budget.profile_changed()
+    monitor.persist_state()
+    saved = service.load_state(str(tmp_path / "state.json"))['replay_budget']
+    assert saved['size_mb'] == 1024
+    assert set(saved['originals']) == {'Normal', 'Light'}
+    assert saved['originals']['Normal']['values'] == {'RecRBSize': '512', 'RecRBTime': '20'}
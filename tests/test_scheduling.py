@@ -0,0 +1,30 @@
+import collections
+import io
+
+import service
+
+Ionice = collections.namedtuple('Ionice', 'ioclass value')
+
+class UnchangedProcess:
+    """psutil.Process stand-in whose I/O class can't be changed."""
+
+    def ionice(self, ioclass=None):
+        if ioclass is None:
+            return Ionice(0, 0)
+        raise PermissionError("not permitted")
+
+def test_slice_still_detaches_obs_when_idle_scheduling_fails(monkeypatch):
+    def fake_open(path, *args):
+        if path == '/proc/self/cgroup':
+            return io.StringIO(f"0::/user.slice/{service.SERVICE_SLICE}/run.scope\n")
+        return open(path, *args)
+
+    monkeypatch.setattr(service, 'open', fake_open, raising=False)
+    monkeypatch.setattr(service.shutil, 'which', lambda name: f"/usr/bin/{name}")
+    monkeypatch.setattr(service.os, 'sched_setscheduler', lambda *args: None)
+    monkeypatch.setattr(service.os, 'sched_getscheduler', lambda pid: service.os.SCHED_OTHER)
+    monkeypatch.setattr(service.psutil, 'Process', UnchangedProcess)
+
+    # Neither SCHED_IDLE nor the idle I/O class applied, but a child would still land in the slice
+    assert service.apply_service_scheduling({'service_slice': True, 'low_priority_service': True})
+    assert not service.apply_service_scheduling({'low_priority_service': True})
@@ -0,0 +1,63 @@
+import glob
+import json
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+
+import service
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def notify_socket(path):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    sock.bind(path)
+    sock.settimeout(10)
+    return sock
+
+def test_sd_notify_sends_to_the_notify_socket(tmp_path, monkeypatch):
+    path = str(tmp_path / "notify")
+    with notify_socket(path) as sock:
+        monkeypatch.setenv('NOTIFY_SOCKET', path)
+        assert service.sd_notify("WATCHDOG=1")
+        assert sock.recv(4096) == b"WATCHDOG=1"
+
+def test_sd_notify_without_systemd(monkeypatch):
+    monkeypatch.delenv('NOTIFY_SOCKET', raising=False)
+    assert not service.sd_notify("READY=1")
+
+def test_watchdog_only_for_the_named_pid(monkeypatch):
+    monkeypatch.setenv('WATCHDOG_USEC', "30000000")
+    monkeypatch.setenv('WATCHDOG_PID', str(os.getpid()))
+    assert service.watchdog_enabled()
+    monkeypatch.setenv('WATCHDOG_PID', str(os.getpid() + 1))
+    assert not service.watchdog_enabled()
+    monkeypatch.delenv('WATCHDOG_USEC')
+    assert not service.watchdog_enabled()
+
+def test_service_reports_ready_and_pings_the_watchdog(tmp_path):
+    # Run a copy so the config, log and databases stay in the temporary directory
+    for module in glob.glob(os.path.join(REPO_DIR, "*.py")):
+        shutil.copy(module, tmp_path)
+    with open(tmp_path / "config.json", 'w') as f:
+        json.dump({'obs_path': 'true', 'whitelisted_games': ['no-such-game']}, f)
+
+    path = str(tmp_path / "notify")
+    with notify_socket(path) as sock:
+        env = dict(os.environ, NOTIFY_SOCKET=path, WATCHDOG_USEC="30000000", XDG_RUNTIME_DIR=str(tmp_path))
+        env.pop('WATCHDOG_PID', None)
+        process = subprocess.Popen([sys.executable, "service.py"], cwd=tmp_path, env=env,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            assert sock.recv(4096).startswith(b"READY=1\nSTATUS=Watching 1 games")
+            assert sock.recv(4096) == b"WATCHDOG=1"
+            process.send_signal(signal.SIGINT)
+            messages = [sock.recv(4096)]
+            while messages[-1] == b"WATCHDOG=1":
+                messages.append(sock.recv(4096))
+            assert messages[-1] == b"STOPPING=1"
+        finally:
+            process.kill()
+            process.wait()
@@ -0,0 +1,40 @@
+import io
+import tracemalloc
+from types import SimpleNamespace
+
+import service
+import soak
+
+def test_short_soak_does_not_grow():
+    out = io.StringIO()
+    result = soak.run_soak(ticks=3000, sample_every=1000, size=50, churn=5, out=out)
+    assert result['sessions'] > 0
+    assert result['passed'], out.getvalue()
+
+class Leaked:
+    pass
+
+class GrowingProcess:
+    def __init__(self):
+        self.rss = 100 * 1048576
+
+    def memory_info(self):
+        self.rss += 64 * 1048576
+        return SimpleNamespace(rss=self.rss)
+
+def test_memory_guard_reports_object_types_on_first_drift(capsys):
+    guard = service.MemoryGuard(growth_warn_mb=32, check_ticks=1)
+    guard.process = GrowingProcess()
+    guard.check()
+    leaked = [Leaked() for _ in range(1000)]
+    try:
+        guard.check()
+        output = capsys.readouterr().out
+        assert "service memory grew" in output
+        assert "Leaked: +1000" in output
+
+        guard.check()
+        assert "Top allocators since the last report:" in capsys.readouterr().out
+    finally:
+        del leaked
+        tracemalloc.stop()
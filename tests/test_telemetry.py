@@ -0,0 +1,103 @@
+import os
+import subprocess
+import time
+
+import psutil
+import pytest
+
+from telemetry import ProcReader, SessionStore, TreeSampler
+
+def burn_cpu(seconds):
+    deadline = time.process_time() + seconds
+    while time.process_time() < deadline:
+        pass
+
+def test_proc_reader_reads_this_process():
+    reader = ProcReader(os.getpid())
+    try:
+        cpu_before, rss_bytes, threads, _ = reader.read()
+        burn_cpu(0.2)
+        cpu_after, _, _, _ = reader.read()
+    finally:
+        reader.close()
+    me = psutil.Process()
+    assert cpu_after - cpu_before == pytest.approx(0.2, abs=0.1)
+    assert rss_bytes == pytest.approx(me.memory_info().rss, rel=0.2)
+    assert threads == me.num_threads()
+
+def test_tree_sampler_rates_and_summary():
+    sampler = TreeSampler()
+    try:
+        sampler.sample([os.getpid()])
+        for _ in range(3):
+            burn_cpu(0.1)
+            sampler.sample([os.getpid()])
+    finally:
+        sampler.close()
+    assert len(sampler.samples['cpu_percent']) == 3
+    # A busy loop keeps one CPU busy, less whatever time other processes took from it
+    assert all(10 < percent <= 110 for percent in sampler.samples['cpu_percent'])
+    rss_mb = psutil.Process().memory_info().rss / 1048576
+    assert all(value == pytest.approx(rss_mb, rel=0.2) for value in sampler.samples['rss_mb'])
+    assert sampler.samples['threads'][-1] == psutil.Process().num_threads()
+
+    summary = sampler.summary()
+    assert set(summary) == {'cpu_percent', 'rss_mb', 'write_mb_s', 'threads'}
+    cpu = summary['cpu_percent']
+    assert cpu['min'] <= cpu['avg'] <= cpu['p95']
+
+def test_summary_statistics():
+    sampler = TreeSampler()
+    sampler.samples['rss_mb'] = [float(value) for value in range(100, 0, -1)]
+    sampler.samples['threads'] = [7]
+    summary = sampler.summary()
+    assert summary['rss_mb'] == {'min': 1.0, 'avg': 50.5, 'p95': 96.0}
+    assert summary['threads'] == {'min': 7, 'avg': 7.0, 'p95': 7}
+    # Metrics without samples are left out
+    assert 'cpu_percent' not in summary
+
+def test_tree_sampler_drops_exited_processes():
+    child = subprocess.Popen(['sleep', '60'])
+    sampler = TreeSampler()
+    try:
+        sampler.sample([os.getpid(), child.pid], 0.0)
+        assert set(sampler.readers) == {os.getpid(), child.pid}
+        child.kill()
+        child.wait()
+        sampler.sample([os.getpid(), child.pid], 1.0)
+        assert set(sampler.readers) == {os.getpid()}
+        assert sampler.samples['threads'] == [psutil.Process().num_threads()]
+    finally:
+        sampler.close()
+
+def session_summary(game_rss_p95, obs_cpu_avg, game_rss_avg):
+    return {
+        'obs': {'cpu_percent': {'min': 0.0, 'avg': obs_cpu_avg, 'p95': obs_cpu_avg * 2}},
+        'game': {'rss_mb': {'min': 100.0, 'avg': game_rss_avg, 'p95': game_rss_p95}},
+    }
+
+def test_session_store_summaries(tmp_path):
+    store = SessionStore(str(tmp_path / "cs_obs.db"))
+    try:
+        store.record('s1', 'cs2', 0.0, 3600.0, session_summary(3000.0, 10.0, 2000.0))
+        store.record('s2', 'cs2', 7200.0, 9000.0, session_summary(3500.0, 20.0, 2500.0))
+        store.record('s3', 'Dota2', 0.0, 1800.0, session_summary(4000.0, 5.0, 3000.0))
+        store.record('s4', 'cs2', 10000.0, 10060.0, {})
+
+        summaries = store.game_summaries()
+        assert [entry['game'] for entry in summaries] == ['cs2', 'Dota2']
+        cs2, dota2 = summaries
+        assert cs2['sessions'] == 3
+        assert cs2['hours'] == pytest.approx(1.0 + 0.5 + 60 / 3600)
+        assert cs2['obs'] == {'cpu_percent': 15.0}
+        assert cs2['game_tree'] == {'rss_mb': 2250.0}
+        assert dota2['sessions'] == 1
+        assert dota2['game_tree'] == {'rss_mb': 3000.0}
+
+        assert store.peak_game_rss('cs2') == 3500.0
+        # Only the most recent sessions count
+        assert store.peak_game_rss('cs2', sessions=1) is None
+        assert store.peak_game_rss('Dota2') == 4000.0
+        assert store.peak_game_rss('quake') is None
+    finally:
+        store.close()
@@ -0,0 +1,23 @@
+import os
+
+import pytest
+
+from timeline import replay
+
+# Steam's reaper launches cs2, which crashes after 12 s; the second launch is played for 90 s
+TRACE = os.path.join(os.path.dirname(__file__), "data", "steam-cs2-crash.jsonl.gz")
+
+def test_replay_of_a_crash_and_relaunch():
+    result = replay(TRACE, ['cs2'], poll_interval=5)
+    assert result['duration'] == 140.0
+    assert result['obs_starts'] == 2
+    assert result['obs_stops'] == 2
+    # The crashed launch only kept OBS up for one poll
+    assert result['false_starts'] == 1
+    # The reaper carries the game path, so detection starts with it at the next poll
+    assert result['detection_delays'] == pytest.approx([2.7, 4.0])
+
+def test_replay_without_a_whitelisted_game():
+    result = replay(TRACE, ['dota2'], poll_interval=5)
+    assert (result['obs_starts'], result['obs_stops'], result['false_starts']) == (0, 0, 0)
+    assert result['detection_delays'] == []
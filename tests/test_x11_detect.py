@@ -0,0 +1,86 @@
+import os
+import shutil
+import subprocess
+import threading
+import time
+
+import pytest
+
+pytest.importorskip('Xlib')
+from Xlib import X, Xatom, display as xdisplay
+
+import service
+from timeline import ReplayLauncher, VirtualClock
+from x11_detect import ActiveWindowWatcher
+
+class BrokenRoot:
+    def get_full_property(self, atom, property_type):
+        raise ConnectionResetError("Connection reset by peer")
+
+def test_lost_connection_falls_back_to_polling():
+    processes = []
+    clock = VirtualClock()
+    monitor = service.Monitor({'obs_path': 'obs', 'whitelisted_games': ['cs2']}, process_source=lambda: processes,
+                              launcher=ReplayLauncher(clock), config_path=None, clock=clock,
+                              log=lambda message: None, live=False)
+    monitor.use_window_events = True
+    watcher = ActiveWindowWatcher(monitor.on_window_pid, monitor.on_window_events_lost)
+    watcher.root = BrokenRoot()
+    watcher.net_active_window = watcher.net_client_list = watcher.net_wm_pid = 0
+    watcher._run()
+    assert not monitor.use_window_events
+    assert monitor.wake_event.is_set()
+
+    processes.append({'pid': 42, 'ppid': 1, 'name': 'cs2', 'cmdline': ['cs2']})
+    monitor.tick()
+    assert monitor.last_running_game == 'cs2'
+
+@pytest.fixture
+def xvfb():
+    if not shutil.which('Xvfb'):
+        pytest.skip("Xvfb is not installed")
+    display_name = ":97"
+    server = subprocess.Popen(['Xvfb', display_name, '-nolisten', 'tcp'],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    old_display = os.environ.get('DISPLAY')
+    os.environ['DISPLAY'] = display_name
+    try:
+        for _ in range(50):
+            try:
+                xdisplay.Display().close()
+                break
+            except Exception:
+                time.sleep(0.1)
+        else:
+            pytest.skip("Xvfb did not start")
+        yield server
+    finally:
+        server.kill()
+        server.wait()
+        if old_display is None:
+            os.environ.pop('DISPLAY', None)
+        else:
+            os.environ['DISPLAY'] = old_display
+
+def test_watcher_reports_windows_and_notices_the_server_going_away(xvfb):
+    pids = []
+    lost = threading.Event()
+    watcher = ActiveWindowWatcher(pids.append, lost.set)
+    assert watcher.start()
+
+    # Play the window manager: create a window and publish it as the active client
+    wm = xdisplay.Display()
+    root = wm.screen().root
+    window = root.create_window(0, 0, 10, 10, 0, X.CopyFromParent)
+    window.change_property(wm.intern_atom('_NET_WM_PID'), Xatom.CARDINAL, 32, [os.getpid()])
+    root.change_property(wm.intern_atom('_NET_CLIENT_LIST'), Xatom.WINDOW, 32, [window.id])
+    root.change_property(wm.intern_atom('_NET_ACTIVE_WINDOW'), Xatom.WINDOW, 32, [window.id])
+    wm.flush()
+
+    deadline = time.monotonic() + 5
+    while os.getpid() not in pids and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert os.getpid() in pids
+
+    xvfb.kill()
+    assert lost.wait(5)
@@ -0,0 +1,208 @@
+"""Records process timelines from a live machine and replays them through the service logic.
+
+    python3 timeline.py record steam-cs2.jsonl.gz --duration 120
+    python3 timeline.py replay steam-cs2.jsonl.gz --games cs2
+
+A timeline is a gzip-compressed JSON-lines file: a header line, then one line per
+snapshot holding only the processes that appeared or exited since the previous one.
+Replays run the real detection loop (service.Monitor) against the recorded process
+table under a virtual clock, so a multi-minute launch sequence replays in milliseconds.
+"""
+import argparse
+import contextlib
+import gzip
+import io
+import json
+import time
+
+import psutil
+
+import service
+
+TIMELINE_VERSION = 1
+
+# OBS sessions shorter than this (in seconds) count as false starts
+FALSE_START_SECONDS = 30
+
+def take_snapshot():
+    """Returns {(pid, create_time): [pid, ppid, name, cmdline, create_time]} for the live process table."""
+    snapshot = {}
+    for proc in psutil.process_iter(['pid', 'ppid', 'name', 'cmdline', 'create_time']):
+        info = proc.info
+        if info['create_time'] is None:
+            continue
+        key = (info['pid'], info['create_time'])
+        snapshot[key] = [info['pid'], info['ppid'], info['name'], info['cmdline'] or [], info['create_time']]
+    return snapshot
+
+def record(path, interval=0.5, duration=None):
+    """Records process table deltas into `path` until `duration` elapses or Ctrl+C."""
+    started = time.monotonic()
+    previous = {}
+    snapshots = 0
+    with gzip.open(path, 'wt') as f:
+        f.write(json.dumps({'version': TIMELINE_VERSION, 'interval': interval, 'started': time.time()}) + "\n")
+        try:
+            while duration is None or time.monotonic() - started < duration:
+                current = take_snapshot()
+                added = [current[key] for key in current.keys() - previous.keys()]
+                removed = [list(key) for key in previous.keys() - current.keys()]
+                if added or removed or not snapshots:
+                    f.write(json.dumps({'t': round(time.monotonic() - started, 3), 'add': added, 'del': removed}) + "\n")
+                previous = current
+                snapshots += 1
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
+    print(f"Recorded {snapshots} snapshots over {time.monotonic() - started:.1f} s to {path}")
+
+def load_timeline(path):
+    """Returns a list of (time, [process info dicts]) with the full process table at each change."""
+    timeline = []
+    table = {}
+    with gzip.open(path, 'rt') as f:
+        header = json.loads(f.readline())
+        if header.get('version') != TIMELINE_VERSION:
+            raise ValueError(f"{path}: unsupported timeline version {header.get('version')}")
+        for line in f:
+            entry = json.loads(line)
+            for pid, create_time in entry['del']:
+                table.pop((pid, create_time), None)
+            for pid, ppid, name, cmdline, create_time in entry['add']:
+                table[(pid, create_time)] = {'pid': pid, 'ppid': ppid, 'name': name, 'cmdline': cmdline}
+            timeline.append((entry['t'], list(table.values())))
+    return timeline
+
+class VirtualClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class FakeObsHandle:
+    pid = None
+
+    def __init__(self, started):
+        self.started = started
+        self.alive = True
+
+class ReplayLauncher:
+    """Stands in for LocalObsLauncher and records when OBS would be started and stopped."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.starts = []
+        self.sessions = []
+
+    def start(self, obs_path, extra_args=()):
+        self.starts.append(self.clock())
+        return FakeObsHandle(self.clock())
+
+    def stop(self, handle):
+        handle.alive = False
+        self.sessions.append((handle.started, self.clock()))
+
+    def is_alive(self, handle):
+        return handle.alive
+
+    def running_elsewhere(self):
+        return False
+
+    def identity(self, handle):
+        return None
+
+    def adopt(self, identity):
+        return None
+
+def game_appearances(timeline, matcher):
+    """Returns the times at which a whitelisted game appears after being absent."""
+    appearances = []
+    present = False
+    for t, processes in timeline:
+        game, _ = matcher.find_running_game(processes)
+        if game and not present:
+            appearances.append(t)
+        present = game is not None
+    return appearances
+
+def replay(path, games, poll_interval=service.POLL_INTERVAL):
+    """Replays a timeline through service.Monitor and returns a metrics dict."""
+    timeline = load_timeline(path)
+    clock = VirtualClock()
+    launcher = ReplayLauncher(clock)
+    snapshot = {'processes': []}
+    config = {'obs_path': 'obs', 'whitelisted_games': list(games)}
+    monitor = service.Monitor(config, process_source=lambda: snapshot['processes'], launcher=launcher,
+                              config_path=None, clock=clock, log=lambda message: None, live=False)
+
+    end = timeline[-1][0] if timeline else 0.0
+    index = 0
+    started = time.perf_counter()
+    # The service's progress output is of no interest here
+    with contextlib.redirect_stdout(io.StringIO()):
+        while clock.now <= end + poll_interval:
+            while index < len(timeline) and timeline[index][0] <= clock.now:
+                snapshot['processes'] = timeline[index][1]
+                index += 1
+            monitor.tick()
+            clock.now += poll_interval
+        monitor.shutdown()
+    elapsed = time.perf_counter() - started
+
+    # Pair each appearance of a game with the first OBS start at or after it
+    delays = []
+    starts = sorted(launcher.starts)
+    appearances = game_appearances(timeline, monitor.matcher)
+    for appeared, next_appeared in zip(appearances, appearances[1:] + [float('inf')]):
+        start = next((s for s in starts if appeared <= s < next_appeared), None)
+        if start is not None:
+            delays.append(start - appeared)
+
+    return {
+        'trace': path,
+        'duration': end,
+        'replay_seconds': elapsed,
+        'obs_starts': len(launcher.starts),
+        'obs_stops': len(launcher.sessions),
+        'false_starts': sum(1 for begin, finish in launcher.sessions if finish - begin < FALSE_START_SECONDS),
+        'detection_delays': delays,
+    }
+
+def print_report(result):
+    delays = result['detection_delays']
+    delay_text = f"max {max(delays):.1f} s, avg {sum(delays) / len(delays):.1f} s" if delays else "no detections"
+    speedup = result['duration'] / result['replay_seconds'] if result['replay_seconds'] else float('inf')
+    print(f"{result['trace']}: {result['duration']:.0f} s replayed in {result['replay_seconds'] * 1000:.0f} ms "
+          f"({speedup:.0f}x)")
+    print(f"  detection delay: {delay_text}")
+    print(f"  OBS starts: {result['obs_starts']}, stops: {result['obs_stops']}, "
+          f"false starts: {result['false_starts']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Record and replay process timelines for CS_OBS.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    record_parser = subparsers.add_parser('record', help="record the live process table")
+    record_parser.add_argument('output')
+    record_parser.add_argument('--interval', type=float, default=0.5, help="seconds between snapshots")
+    record_parser.add_argument('--duration', type=float, help="stop after this many seconds (default: Ctrl+C)")
+
+    replay_parser = subparsers.add_parser('replay', help="replay timelines through the service logic")
+    replay_parser.add_argument('traces', nargs='+')
+    replay_parser.add_argument('--games', nargs='+', help="whitelist to use (default: config.json)")
+    replay_parser.add_argument('--poll', type=float, default=service.POLL_INTERVAL, help="poll interval in seconds")
+
+    args = parser.parse_args()
+    if args.command == 'record':
+        record(args.output, args.interval, args.duration)
+    else:
+        games = args.games
+        if not games:
+            config = service.load_config() or {}
+            games = config.get('whitelisted_games', [])
+        for trace in args.traces:
+            print_report(replay(trace, games, args.poll))
+
+if __name__ == "__main__":
+    main()
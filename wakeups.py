@@ -0,0 +1,130 @@
+"""Counts how often a process wakes up, to check the GUI really sleeps while it is in the tray.
+
+    python3 wakeups.py measure --duration 60 -- python3 cs_obs.py
+    python3 wakeups.py measure --pid 12345 --duration 60
+    python3 wakeups.py eventloop --duration 30
+
+"measure" samples the voluntary and involuntary context switches of every thread of a
+process (from /proc/<pid>/task/*/status) over the measurement window; each time a
+sleeping thread runs again is one voluntary switch. With games in the whitelist the GUI
+starts hidden in the tray, which is the state worth measuring. Run it on two checkouts to
+compare revisions.
+
+"eventloop" needs no display: it runs a bare Tcl event loop in the two ways the GUI
+has used to receive tray actions (polling with after(100) plus the two 2 s status and log
+timers, or waiting on a self-pipe with createfilehandler) and measures both.
+"""
+import argparse
+import glob
+import os
+import subprocess
+import sys
+import time
+
+def thread_switches(pid):
+    """Returns {thread name (tid): voluntary + involuntary context switches} for a process."""
+    switches = {}
+    for status_path in glob.glob(f"/proc/{pid}/task/*/status"):
+        fields = {}
+        try:
+            with open(status_path, 'r') as f:
+                for line in f:
+                    name, _, value = line.partition(':')
+                    fields[name] = value.strip()
+        except OSError:
+            # The thread exited between listing and reading
+            continue
+        tid = status_path.split('/')[-2]
+        switches[f"{fields.get('Name', '?')} ({tid})"] = \
+            int(fields.get('voluntary_ctxt_switches', 0)) + int(fields.get('nonvoluntary_ctxt_switches', 0))
+    return switches
+
+def measure_pid(pid, duration):
+    """Returns {thread: wakeups per minute} for `pid` over `duration` seconds."""
+    before = thread_switches(pid)
+    time.sleep(duration)
+    after = thread_switches(pid)
+    if not after:
+        raise RuntimeError(f"Process {pid} exited during the measurement")
+    return {thread: (count - before.get(thread, 0)) * 60.0 / duration for thread, count in after.items()}
+
+def print_rates(title, rates):
+    print(title)
+    for thread, rate in sorted(rates.items(), key=lambda item: -item[1]):
+        print(f"  {thread:<32} {rate:8.1f} wakeups/min")
+    print(f"  {'total':<32} {sum(rates.values()):8.1f} wakeups/min")
+
+def measure_command(command, duration, settle):
+    process = subprocess.Popen(command)
+    try:
+        time.sleep(settle)
+        if process.poll() is not None:
+            raise RuntimeError(f"{' '.join(command)} exited with status {process.returncode}")
+        return measure_pid(process.pid, duration)
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+def run_eventloop(mode):
+    """Runs a Tcl event loop receiving actions the way the GUI does in `mode`, forever."""
+    import tkinter
+    tcl = tkinter.Tcl()
+    if mode == 'polling':
+        def poll_queue():
+            tcl.after(100, poll_queue)
+
+        def status_timer():
+            tcl.after(2000, status_timer)
+
+        def log_timer():
+            tcl.after(2000, log_timer)
+
+        poll_queue()
+        status_timer()
+        log_timer()
+    else:
+        wakeup_read, _ = os.pipe()
+        tcl.tk.createfilehandler(wakeup_read, tkinter.READABLE, lambda fd, mask: os.read(fd, 512))
+    # mainloop() returns at once without Tk windows; this is the loop it runs with them
+    while True:
+        tcl.dooneevent(0)
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the wakeups per minute of a process.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    measure_parser = subparsers.add_parser('measure', help="measure a running process or a command")
+    measure_parser.add_argument('--pid', type=int)
+    measure_parser.add_argument('--duration', type=float, default=60.0)
+    measure_parser.add_argument('--settle', type=float, default=10.0, help="seconds to let a started command settle")
+    measure_parser.add_argument('cmd', nargs=argparse.REMAINDER, help="command to start, after --")
+    loop_parser = subparsers.add_parser('eventloop', help="compare polling and self-pipe Tcl event loops")
+    loop_parser.add_argument('--duration', type=float, default=30.0)
+    run_parser = subparsers.add_parser('run-eventloop')
+    run_parser.add_argument('mode', choices=('polling', 'filehandler'))
+    args = parser.parse_args()
+
+    if args.command == 'run-eventloop':
+        run_eventloop(args.mode)
+    elif args.command == 'eventloop':
+        for mode in ('polling', 'filehandler'):
+            rates = measure_command([sys.executable, os.path.abspath(__file__), 'run-eventloop', mode],
+                                    args.duration, settle=1.0)
+            print_rates(f"Tcl event loop, {mode}:", rates)
+    else:
+        command = [arg for arg in args.cmd if arg != '--']
+        if args.pid:
+            rates = measure_pid(args.pid, args.duration)
+            title = f"PID {args.pid}:"
+        elif command:
+            rates = measure_command(command, args.duration, args.settle)
+            title = f"{' '.join(command)}:"
+        else:
+            parser.error("give --pid or a command to start")
+        print_rates(title, rates)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import os
+import threading
+
+try:
+    from Xlib import X, display as xdisplay, error as xerror
+except ImportError:  # python-xlib is optional outside X11 sessions
+    X = xdisplay = xerror = None
+
+def x11_available():
+    """Returns True if python-xlib is installed and an X display is configured."""
+    return X is not None and bool(os.environ.get('DISPLAY'))
+
+class ActiveWindowWatcher:
+    """Reports window PIDs as windows appear or gain focus on an X11 desktop.
+
+    Subscribes to PropertyNotify on the root window and reacts to changes of
+    _NET_ACTIVE_WINDOW (focus) and _NET_CLIENT_LIST (new top-level windows), resolving
+    each window to its _NET_WM_PID. `on_pid` is called from the watcher thread, and so is
+    `on_lost` if the connection to the X server is lost and no more events will come.
+    """
+
+    def __init__(self, on_pid, on_lost=None):
+        self.on_pid = on_pid
+        self.on_lost = on_lost
+        self.display = None
+        self.thread = None
+        self.known_clients = set()
+
+    def start(self):
+        """Connects to the X server and starts the watcher thread. Returns False if that fails."""
+        try:
+            self.display = xdisplay.Display()
+            self.root = self.display.screen().root
+            self.net_active_window = self.display.intern_atom('_NET_ACTIVE_WINDOW')
+            self.net_client_list = self.display.intern_atom('_NET_CLIENT_LIST')
+            self.net_wm_pid = self.display.intern_atom('_NET_WM_PID')
+            self.root.change_attributes(event_mask=X.PropertyChangeMask)
+        except Exception as e:
+            print(f"Error: Could not connect to the X server for window events: {e}")
+            return False
+
+        self.thread = threading.Thread(target=self._run, name="x11-watcher", daemon=True)
+        self.thread.start()
+        print("Watching X11 window focus for whitelisted games")
+        return True
+
+    def _run(self):
+        try:
+            # Report what is already open so a game running before the service starts is found
+            self._check_client_list(report_all=True)
+            self._check_active_window()
+            while True:
+                event = self.display.next_event()
+                if event.type != X.PropertyNotify:
+                    continue
+                if event.atom == self.net_active_window:
+                    self._check_active_window()
+                elif event.atom == self.net_client_list:
+                    self._check_client_list()
+        except Exception as e:
+            # Property queries fail with the connection too, not only next_event()
+            print(f"Error: Lost the X11 connection: {e}")
+        if self.on_lost:
+            self.on_lost()
+
+    def _window_property(self, window, atom):
+        try:
+            prop = window.get_full_property(atom, X.AnyPropertyType)
+        except xerror.XError:
+            # The window disappeared between the event and our query
+            return None
+        return prop.value if prop else None
+
+    def _report_window(self, window_id):
+        if not window_id:
+            return
+        window = self.display.create_resource_object('window', window_id)
+        pid = self._window_property(window, self.net_wm_pid)
+        if pid:
+            self.on_pid(int(pid[0]))
+
+    def _check_active_window(self):
+        value = self._window_property(self.root, self.net_active_window)
+        if value:
+            self._report_window(value[0])
+
+    def _check_client_list(self, report_all=False):
+        clients = set(self._window_property(self.root, self.net_client_list) or [])
+        new_clients = clients if report_all else clients - self.known_clients
+        self.known_clients = clients
+        for window_id in new_clients:
+            self._report_window(window_id)